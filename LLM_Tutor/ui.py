@@ -1,6 +1,6 @@
 import pygame
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import threading
 import json
 import requests
@@ -22,6 +22,14 @@ STEP_TIME = 60 / BPM / 4
 target_step_time = STEP_TIME
 
 PATTERN = {r: [0] * 16 for r in ROWS}
+# the HTTP handlers run on server threads: they swap in a new PATTERN /
+# BPM under this lock, and the main loop takes a snapshot once per frame
+STATE_LOCK = threading.Lock()
+
+OLLAMA_URL = "http://localhost:11434"
+KEEP_ALIVE = "30m"
+# pooled connection to Ollama, reused by every generate request
+http = requests.Session()
 
 current_step = 0
 current_hit = "HH"
@@ -47,10 +55,10 @@ def glow_circle(x, y, r, color):
         screen.blit(s, (x - rr, y - rr))
 
 
-def next_note(offset):
+def next_note(pattern, offset):
     step = (current_step + offset + 1) % 16
     for r in ROWS:
-        if PATTERN[r][step] == 1:
+        if pattern[r][step] == 1:
             return r
     return "HH"
 
@@ -92,18 +100,34 @@ def parse_lane_from_text(text):
 
 
 # --------------- HTTP SERVER ----------------
+def set_state(bpm=None, pattern=None):
+    global PATTERN, BPM, target_step_time
+    with STATE_LOCK:
+        if bpm is not None:
+            BPM = bpm
+            target_step_time = 60 / bpm / 4
+        if pattern is not None:
+            PATTERN = pattern
+
+
 class Handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        global PATTERN, BPM, target_step_time
+    # keep-alive, so llm_main's pooled session reuses its connection
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, code, body):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
+    def do_POST(self):
         length = int(self.headers.get("Content-Length"))
         data = json.loads(self.rfile.read(length))
 
         # ---------- 1️⃣ DIRECT CONFIG (like before) ----------
         if "lane" in data or "bpm" in data:
             if "bpm" in data:
-                BPM = int(data["bpm"])
-                target_step_time = 60 / BPM / 4
+                set_state(bpm=int(data["bpm"]))
 
             if "lane" in data:
                 lane = data["lane"]
@@ -111,22 +135,18 @@ class Handler(BaseHTTPRequestHandler):
                 def track(name):
                     return [1 if x == name else 0 for x in lane]
 
-                PATTERN["HH"] = track("HH")
-                PATTERN["SN"] = track("SN")
-                PATTERN["FT"] = track("KD") or track("FT")
-                PATTERN["CR"] = track("CR")
+                set_state(pattern={"HH": track("HH"), "SN": track("SN"),
+                                   "FT": track("KD") or track("FT"), "CR": track("CR")})
 
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(b"UPDATED")
+            self.reply(200, b"UPDATED")
             return
 
         # ---------- 2️⃣ GENERATE USING OLLAMA ----------
         if "song_or_style" in data:
 
             song = data["song_or_style"]
-            BPM = int(data.get("bpm", BPM))
-            target_step_time = 60 / BPM / 4
+            if "bpm" in data:
+                set_state(bpm=int(data["bpm"]))
 
             prompt = f"""
 Create a simple 16-step drum pattern for {song}.
@@ -140,9 +160,10 @@ CR - - - - - - - - - - - - - - - -
 Use HH SN KD CR only. Use - where silent.
 """
 
-            res = requests.post(
-                "http://localhost:11434/api/generate",
-                json={"model": "llama3", "prompt": prompt}
+            res = http.post(
+                f"{OLLAMA_URL}/api/generate",
+                json={"model": "llama3", "prompt": prompt,
+                      "stream": False, "keep_alive": KEEP_ALIVE}
             )
 
             text = res.json()["response"]
@@ -152,23 +173,17 @@ Use HH SN KD CR only. Use - where silent.
             def track(name):
                 return [1 if x == name else 0 for x in lane]
 
-            PATTERN["HH"] = track("HH")
-            PATTERN["SN"] = track("SN")
-            PATTERN["FT"] = track("FT")
-            PATTERN["CR"] = track("CR")
+            set_state(pattern={"HH": track("HH"), "SN": track("SN"),
+                               "FT": track("FT"), "CR": track("CR")})
 
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(b"GENERATED")
+            self.reply(200, b"GENERATED")
             return
 
-        self.send_response(400)
-        self.end_headers()
-        self.wfile.write(b"INVALID REQUEST")
+        self.reply(400, b"INVALID REQUEST")
 
 
 def start_server():
-    HTTPServer(("0.0.0.0", 8000), Handler).serve_forever()
+    ThreadingHTTPServer(("0.0.0.0", 8000), Handler).serve_forever()
 
 
 threading.Thread(target=start_server, daemon=True).start()
@@ -182,7 +197,10 @@ while running:
         if e.type == pygame.QUIT:
             running = False
 
-    STEP_TIME += (target_step_time - STEP_TIME) * 0.15
+    with STATE_LOCK:
+        pattern, bpm, target = PATTERN, BPM, target_step_time
+
+    STEP_TIME += (target - STEP_TIME) * 0.15
 
     now = time.time()
     if now - t0 >= STEP_TIME:
@@ -190,17 +208,17 @@ while running:
         current_step = (current_step + 1) % 16
 
         for r in ROWS:
-            if PATTERN[r][current_step] == 1:
+            if pattern[r][current_step] == 1:
                 current_hit = r
 
     screen.fill((12, 16, 22))
 
-    bpm_text = font_med.render(f"{BPM} BPM", True, (140, 255, 255))
+    bpm_text = font_med.render(f"{bpm} BPM", True, (140, 255, 255))
     screen.blit(bpm_text, (W//2 - 60, 40))
 
     x = W // 2 - 160
     for i in range(4):
-        note = next_note(i)
+        note = next_note(pattern, i)
         c = COLOR[note]
         pygame.draw.rect(screen, c, (x + i * 90, 150, 70, 70), border_radius=18)
 
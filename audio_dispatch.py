@@ -0,0 +1,123 @@
+# -----------------------------
+# AUDIO DISPATCH THREAD
+# -----------------------------
+# The network loop never touches pygame: it calls trigger(), which only
+# puts the event on a queue.SimpleQueue (unbounded, never blocks). A
+# daemon thread takes events off the queue and plays them.
+#
+# Every drum owns a fixed set of reserved mixer channels, so drums never
+# take each other's voices. Within one drum:
+#   - a free channel is used if there is one
+#   - otherwise the voice that started longest ago is cut (stolen)
+# CHOKES lets a drum silence others when it plays (e.g. a closed hi-hat
+# cutting an open one).
+#
+# A HitTrace passed to trigger() gets its t_trigger/t_play stamps here
+# and is handed to on_played (e.g. LatencyTracer.record) on the audio
+# thread.
+
+import queue
+import threading
+from typing import Dict, Iterable, Optional
+
+import pygame
+
+from latency_trace import now
+
+VOICES_PER_DRUM = 2
+CHOKES: Dict[str, Iterable[str]] = {}
+
+_STOP = None
+
+
+class AudioDispatcher:
+    def __init__(self, sounds: Dict[str, "pygame.mixer.Sound"],
+                 voices: Optional[Dict[str, int]] = None,
+                 chokes: Optional[Dict[str, Iterable[str]]] = None, on_played=None):
+        self.sounds = dict(sounds)
+        self.on_played = on_played
+        self.chokes = CHOKES if chokes is None else chokes
+        voices = voices or {}
+
+        counts = [voices.get(name, VOICES_PER_DRUM) for name in self.sounds]
+        total = sum(counts)
+        if pygame.mixer.get_num_channels() < total:
+            pygame.mixer.set_num_channels(total)
+        # reserved channels are never picked by a bare Sound.play()
+        pygame.mixer.set_reserved(total)
+
+        self.channels = {}
+        self._started = {}
+        first = 0
+        for name, n in zip(self.sounds, counts):
+            self.channels[name] = [pygame.mixer.Channel(first + i) for i in range(n)]
+            self._started[name] = [0.0] * n
+            first += n
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.played = 0
+        self.stolen = 0
+        self.unknown = 0
+
+    # -------------------------
+    # producer side (network thread)
+    # -------------------------
+    def trigger(self, drum: str, volume: float = 1.0, trace=None) -> None:
+        if trace is not None:
+            trace.t_trigger = now()
+        self._queue.put((drum, volume, trace))
+
+    # -------------------------
+    # consumer side
+    # -------------------------
+    def start(self) -> "AudioDispatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audio-dispatch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1.0) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                return
+            self.play(*event)
+
+    def play(self, drum: str, volume: float = 1.0, trace=None) -> None:
+        sound = self.sounds.get(drum)
+        if sound is None:
+            self.unknown += 1
+            return
+        for other in self.chokes.get(drum, ()):
+            for ch in self.channels.get(other, ()):
+                ch.stop()
+
+        chans, started = self.channels[drum], self._started[drum]
+        slot = None
+        for i, ch in enumerate(chans):
+            if not ch.get_busy():
+                slot = i
+                break
+        if slot is None:
+            slot = started.index(min(started))
+            self.stolen += 1
+
+        ch = chans[slot]
+        ch.set_volume(volume)
+        ch.play(sound)
+        started[slot] = t = now()
+        self.played += 1
+        if trace is not None:
+            trace.t_play = t
+            if self.on_played is not None:
+                self.on_played(trace)
+
+    def report(self) -> str:
+        return "audio: played=%d stolen=%d unknown=%d" % (self.played, self.stolen, self.unknown)
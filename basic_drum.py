@@ -1,18 +1,40 @@
+import signal
 import socket
 import time
 import pygame
-from collections import deque
 from pathlib import Path
 
+from audio_dispatch import AudioDispatcher
+from clock_sync import ClockSync
+from hit_log import HitLogWriter, session_path
+from imu_protocol import BacklogReader, FrameDecoder, ProtocolError
+from latency_trace import LatencyTracer, now
+from drum_engine import SOUND_FILES, make_pipeline
+from event_log import DEBUG, INFO, EventLog
+from model_ensemble import ENSEMBLE_MODE
+from stick_pipeline import MotionGate
+
 # -----------------------------
 # CONFIG
 # -----------------------------
 UDP_IP = "0.0.0.0"
 UDP_PORT = 5005
 DURATION_SECONDS = 5020
-
-WINDOW_SIZE = 50
-FEATURES_PER_ROW = 6
+REPORT_EVERY_S = 10
+# drain mode: take every datagram that queued up while we were busy, feed
+# it through the windows in one go and classify only the newest window per
+# stick, so a stall never leaves us playing stale hits. False = classic
+# one-datagram-at-a-time loop.
+DRAIN = True
+# event log (event_log.py): console shows INFO and up (hits, warnings);
+# LOG_LEVEL = DEBUG adds every packet's newest row and its variation,
+# sampled, and LOG_FILE keeps everything in a binary .evlog
+LOG_LEVEL = INFO
+LOG_FILE = None
+LOG_SAMPLE = {"row": 10}
+# every hit played is appended to takes/basic_drum_<time>.hits
+# (hit_log.py; `python hit_log.py render <file>` plays the take back as a WAV)
+TAKES_DIR = "takes"
 # -----------------------------
 
 # -----------------------------
@@ -23,23 +45,16 @@ pygame.init()
 
 BASE_DIR = Path(__file__).resolve().parent
 
-CRASH = pygame.mixer.Sound(str(BASE_DIR / "sound" / "crash.mp3"))
-FLOORTOM = pygame.mixer.Sound(str(BASE_DIR / "sound" / "snaredrum.mp3"))
-SNARE = pygame.mixer.Sound(str(BASE_DIR / "sound" / "snare.mpeg"))
-HIHAT = pygame.mixer.Sound(str(BASE_DIR / "sound" / "hihat.mpeg"))
+CRASH = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["crash"]))
+FLOORTOM = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["floortom"]))
+SNARE = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["snare"]))
+HIHAT = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["hihat"]))
 
 SNARE_PATH = BASE_DIR / "sound" / "snare.mpeg"
 
 SNARE = pygame.mixer.Sound(str(SNARE_PATH))
 # -----------------------------
 
-# -----------------------------
-# SLIDING WINDOW
-# -----------------------------
-window_L = deque(maxlen=WINDOW_SIZE)
-window_R = deque(maxlen=WINDOW_SIZE)
-# -----------------------------
-
 # -----------------------------
 # MODEL
 # -----------------------------
@@ -197,44 +212,53 @@ def score_R_2(input):
                 else:
                     var0 = [0.4, 0.6, 0.0]
     return var0
-# -----------------------------
-# AUDIO TRIGGER
-# -----------------------------
-def play_snare():
-    base_dir = Path(__file__).resolve().parent.parent   # project root
-    sound_path = base_dir / "sound" / "snare.wav"
-
-    if not pygame.mixer.get_init():
-        pygame.mixer.pre_init(44100, -16, 2, 256)
-        pygame.init()
-
-    snare = pygame.mixer.Sound(str(sound_path))
-    snare.play()
-    time.sleep(snare.get_length())
-    
 
+# the score_* functions above stay the source of truth; inference runs on
+# the same trees compiled into flat node arrays (drum_engine.MODELS)
 # -----------------------------
 # UDP SOCKET
 # -----------------------------
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.bind((UDP_IP, UDP_PORT))
 # -----------------------------
-def window_variation(window):
-    total_var = 0.0
+# STICK PIPELINES
+# -----------------------------
+# window, motion stats, loss handling and inference per stick.
+# GATE mode "onset" plays once per hit (onset.py, per-stick refractory
+# window); "row" is the original single-frame check, which fires on most
+# samples of a swing, and "window" gates on sliding-window variance.
+GATE = MotionGate(mode="onset")
+
+# drum_engine.STICKS picks the live model per stick; SHADOWS adds its shadow
+# models on the same windows (scored after the hit is played), and
+# ENSEMBLE "vote"/"mean" lets them decide together
+SHADOWS = False
+ENSEMBLE = ENSEMBLE_MODE
+pipelines = (make_pipeline(0, GATE, mode=ENSEMBLE, shadows=SHADOWS),
+             make_pipeline(1, GATE, mode=ENSEMBLE, shadows=SHADOWS))
+SOUNDS = {"snare": SNARE, "hihat": HIHAT, "crash": CRASH, "floortom": FLOORTOM}
 
-    # for each of the 6 features
-    for c in range(6):
-        for t in range(1, len(window)):
-            total_var += abs(window[t][c] - window[t-1][c])
+# per-stage latency histograms; `kill -USR1 <pid>` dumps them
+tracer = LatencyTracer()
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, lambda *_: print(tracer.dump()))
 
-    return total_var
+# plays on its own thread with reserved channels per drum
+audio = AudioDispatcher(SOUNDS, on_played=tracer.record).start()
+# printing happens on the log's thread, not in the receive loop
+log = EventLog(LOG_LEVEL, LOG_FILE, sample=LOG_SAMPLE).start()
+# both sticks' ticks_ms on the laptop clock, so the take has one timeline
+clock = ClockSync()
+take = HitLogWriter(session_path(BASE_DIR / TAKES_DIR, "basic_drum"), "basic_drum.py",
+                    sounds=SOUND_FILES)
 
-def row_variation(row):
-    total_var = 0.0
-    for t in range(1, len(row)):
-        total_var += abs(row[t] - row[t-1])
 
-    return total_var
+def report_loss():
+    for pipe in pipelines:
+        print(pipe.report())
+    if DRAIN:
+        print(reader.report())
+    print(log.report())
 # -----------------------------
 # START
 # -----------------------------
@@ -245,51 +269,69 @@ for i in range(3, 0, -1):
 
 start_time = time.time()
 print("Listening...")
-VARTHRESHOLD=60
+# preallocated receive buffer; binary frames and legacy text both decode here
+decoder = FrameDecoder()
+reader = BacklogReader(decoder)
+last_report = time.time()
+
+
+def play(hits):
+    for hit in hits:
+        hit.host_ms = clock.host_ms(hit.stick, hit.sensor_ms, hit.recv_ms)
+        take.append_hit(hit)
+        audio.trigger(hit.drum, trace=hit)
+        log.info("hit", hit.stick, text=hit.drum)
+
+
 try:
     while (time.time() - start_time) < DURATION_SECONDS:
-        data, _ = sock.recvfrom(1024)
-        decoded = data.decode().strip()
-        mainrow=list(map(float, decoded.split(",")))[1:]
-        row = mainrow[1:]
-        print("row",mainrow)
-        if mainrow[0]==0:
-            window_L.append(row)
-            print("L",row_variation(row))
-            if len(window_L) == WINDOW_SIZE:
-                # flatten 50 x 6 → 300
-                input_vector = [x for r in window_L for x in r]
+        if DRAIN:
+            backlog = reader.read(sock)
+            t_recv, recv_ms = now(), time.time() * 1000.0
+            for stick, frames in backlog.items():
+                stick = 0 if stick == 0 else 1
+                tracer.observe_packet(stick, int(frames[-1][2][-1]), recv_ms)
+                clock.observe(stick, int(frames[-1][2][-1]), recv_ms)
+                play(pipelines[stick].feed_backlog(frames, t_recv, recv_ms))
+                pipelines[stick].run_shadows()
+                if log.enabled(DEBUG):
+                    log.debug("row", stick, (*frames[-1][1][-1], pipelines[stick].stats.row_var))
+            if time.time() - last_report >= REPORT_EVERY_S:
+                last_report = time.time()
+                report_loss()
+            continue
 
-                output_L = score_l_new(input_vector)
-                if row_variation(row) > VARTHRESHOLD:
-                    if output_L[1] == 1.0:
-                        SNARE.play()
-                        print("Played HiHat")
-                    elif output_L[0]==1.0:
-                        HIHAT.play()
-                        print("Played Snare")
-        else:
-            window_R.append(row)
-            print("R",row_variation(row))
-            if len(window_R) == WINDOW_SIZE:
-                # flatten 50 x 6 → 300
-                input_vector = [x for r in window_R for x in r]
+        try:
+            n = decoder.recv(sock)
+        except ProtocolError as e:
+            log.warn("bad_packet", text=str(e))
+            continue
+        t_recv, recv_ms = now(), time.time() * 1000.0
+        stick = 0 if decoder.stick == 0 else 1
+        pipe = pipelines[stick]
+        tracer.observe_packet(stick, int(decoder.ticks_ms[n - 1]), recv_ms)
+        clock.observe(stick, int(decoder.ticks_ms[n - 1]), recv_ms)
+        play(pipe.feed(decoder.seq, decoder.rows[:n], decoder.ticks_ms[:n], t_recv, recv_ms))
+        pipe.run_shadows()
+        if log.enabled(DEBUG):
+            log.debug("row", stick, (*decoder.rows[n - 1], pipe.stats.row_var))
+
+        if time.time() - last_report >= REPORT_EVERY_S:
+            last_report = time.time()
+            report_loss()
 
-                output_R = score_R_new(input_vector)
-                if row_variation(row) > VARTHRESHOLD:
-                    predicted = output_R.index(max(output_R))
-                    if predicted == 0:      # crash
-                        CRASH.play()
-                        print("Played Crash")
-                    elif predicted == 1:    # floortom
-                        FLOORTOM.play()
-                        print("Played FloorTom")
-                    
 
 except KeyboardInterrupt:
     print("Stopped by user.")
 
 finally:
+    log.stop()
+    take.close()
+    print("%d hits saved to %s" % (take.hits, take.path))
+    report_loss()
+    audio.stop()
+    print(audio.report())
+    print(tracer.dump())
     sock.close()
     pygame.quit()
     print("Done.")
\ No newline at end of file
@@ -7,11 +7,17 @@ import pygame
 import time
 from pathlib import Path
 
+from audio_dispatch import AudioDispatcher
+from drum_engine import SOUND_FILES
+from hit_log import HitLogWriter, session_path
+
 # -----------------------------
 # UDP CONFIG
 # -----------------------------
 UDP_IP   = "0.0.0.0"
 UDP_PORT = 5005
+# every trigger is appended to takes/edge_<time>.hits (hit_log.py)
+TAKES_DIR = "takes"
 
 # -----------------------------
 # AUDIO INIT (LOW LATENCY)
@@ -24,13 +30,14 @@ BASE_DIR = Path(__file__).resolve().parent
 # -----------------------------
 # LOAD SOUNDS
 # -----------------------------
-SNARE     = pygame.mixer.Sound(str(BASE_DIR / "sound" / "snare.mpeg"))
-HIHAT     = pygame.mixer.Sound(str(BASE_DIR / "sound" / "hihat.mpeg"))
-CRASH     = pygame.mixer.Sound(str(BASE_DIR / "sound" / "crash.mp3"))
-FLOORTOM  = pygame.mixer.Sound(str(BASE_DIR / "sound" / "kick.mp3"))
+SNARE     = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["snare"]))
+HIHAT     = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["hihat"]))
+CRASH     = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["crash"]))
+FLOORTOM  = pygame.mixer.Sound(str(BASE_DIR / "sound" / SOUND_FILES["floortom"]))
 
-# Optional: dedicated channels (cleaner overlaps)
-pygame.mixer.set_num_channels(4)
+# dedicated channels per drum, played from the audio thread
+audio = AudioDispatcher({"snare": SNARE, "hihat": HIHAT,
+                         "crash": CRASH, "floortom": FLOORTOM}).start()
 
 # -----------------------------
 # UDP SOCKET
@@ -38,6 +45,15 @@ pygame.mixer.set_num_channels(4)
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.bind((UDP_IP, UDP_PORT))
 
+# edge packets carry no sample time or intensity: arrival time, NaN intensity
+take = HitLogWriter(session_path(BASE_DIR / TAKES_DIR, "edge"), "basic_drum_inferencenot.py",
+                    sounds=SOUND_FILES)
+
+
+def play(side, drum):
+    audio.trigger(drum)
+    take.append(side, drum, time.time() * 1000.0)
+
 print("Listening for Nicla triggers on UDP", UDP_PORT)
 
 # -----------------------------
@@ -59,10 +75,10 @@ try:
         if side == 0:
             # class mapping (as per your training)
             if cls == 2:
-                SNARE.play()
+                play(0, "snare")
                 print("LEFT → SNARE")
             elif cls == 0:
-                HIHAT.play()
+                play(0, "hihat")
                 print("LEFT → HIHAT")
 
         # -------------------------
@@ -70,16 +86,19 @@ try:
         # -------------------------
         elif side == 1:
             if cls == 0:
-                CRASH.play()
+                play(1, "crash")
                 print("RIGHT → CRASH")
             elif cls == 2:
-                FLOORTOM.play()
+                play(1, "floortom")
                 print("RIGHT → FLOORTOM")
 
 except KeyboardInterrupt:
     print("\nStopping receiver...")
 
 finally:
+    audio.stop()
+    take.close()
+    print("%d hits saved to %s" % (take.hits, take.path))
     sock.close()
     pygame.quit()
     print("Done.")
@@ -0,0 +1,184 @@
+# -----------------------------
+# STICK CLOCK SYNC + HIT TIMELINE
+# -----------------------------
+# Every Nicla stamps its samples with its own time.ticks_ms(): unknown
+# start, 2^30 ms wrap, and a crystal that runs a little fast or slow
+# against the laptop. StickClock maps a stick's ticks onto the laptop's
+# wall clock (time.time() ms) from packet arrival times alone:
+#
+#   d = recv_ms - ticks          per packet: offset + drift * ticks + delay
+#   block minima                 lowest d per BLOCK_MS of stick time; delay
+#                                is never negative, so the minima trace
+#                                the clock line with the least queueing
+#   drift                        least-squares slope through the last
+#                                BLOCKS minima
+#   offset                       lowered until the line sits under every
+#                                minimum (and the current block)
+#
+# host_ms(ticks) is therefore the moment the sample would have arrived
+# over the fastest path seen, the same reference for both sticks, so left
+# and right hits land on one timeline. A reboot (ticks jumping by more
+# than RESYNC_MS against the estimate) restarts the estimate.
+#
+# HitTimeline merges both sticks' hits in host-time order. A hit is held
+# for REORDER_MS, enough for the other stick's queue to catch up, and
+# hits of different sticks within FLAM_MS of each other are flagged as
+# flams.
+
+import heapq
+from collections import deque
+from typing import Dict, List, Optional
+
+TICKS_PERIOD = 1 << 30      # MicroPython ticks_ms() wraps here
+BLOCK_MS = 1000
+BLOCKS = 60                 # drift fit over the last minute
+RESYNC_MS = 5000
+REORDER_MS = 60
+FLAM_MS = 30
+
+
+class StickClock:
+    def __init__(self, block_ms: int = BLOCK_MS, blocks: int = BLOCKS):
+        self.block_ms = block_ms
+        self.blocks = deque(maxlen=blocks)  # (ticks, min d) per closed block
+        self.resyncs = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.blocks.clear()
+        self._raw = None        # last raw ticks
+        self._ticks = 0         # unwrapped ticks, relative to the first packet
+        self._block_end = self.block_ms
+        self._block_min = None  # (ticks, d) lowest in the open block
+        self.drift = 0.0        # stick ms gained per ms, + = stick clock slow
+        self.offset = None      # d at ticks 0 on the fitted lower line
+        self.packets = 0
+
+    def _unwrap(self, raw: int) -> int:
+        if self._raw is None:
+            self._raw = raw
+            return 0
+        delta = (raw - self._raw) % TICKS_PERIOD
+        if delta >= TICKS_PERIOD // 2:
+            delta -= TICKS_PERIOD       # older than the last packet (reordered)
+        if delta > 0:
+            self._raw = raw
+            self._ticks += delta
+            return self._ticks
+        return self._ticks + delta
+
+    def observe(self, ticks: int, recv_ms: float) -> None:
+        """Feed the newest sample's ticks_ms of a packet and its arrival time."""
+        if self.offset is not None:
+            expected = self.host_ms(ticks)
+            if abs(recv_ms - expected) > RESYNC_MS:
+                self.resyncs += 1
+                self.reset()
+        t = self._unwrap(int(ticks))
+        d = recv_ms - t
+        self.packets += 1
+        if t >= self._block_end and self._block_min is not None:
+            self.blocks.append(self._block_min)
+            self._block_min = None
+            self._block_end = t - t % self.block_ms + self.block_ms
+            self._fit()
+        if self._block_min is None or d < self._block_min[1]:
+            self._block_min = (t, d)
+            if self.offset is None or d < self.offset + self.drift * t:
+                self.offset = d - self.drift * t
+
+    def _fit(self) -> None:
+        pts = list(self.blocks)
+        if len(pts) >= 3:
+            n = len(pts)
+            mt = sum(t for t, _ in pts) / n
+            md = sum(d for _, d in pts) / n
+            var = sum((t - mt) ** 2 for t, _ in pts)
+            if var > 0:
+                self.drift = sum((t - mt) * (d - md) for t, d in pts) / var
+        if self._block_min is not None:
+            pts.append(self._block_min)
+        self.offset = min(d - self.drift * t for t, d in pts)
+
+    def host_ms(self, ticks: int) -> Optional[float]:
+        """Laptop wall-clock ms for a sample stamped `ticks`, None before any packet."""
+        if self.offset is None:
+            return None
+        t = self._unwrap_peek(int(ticks))
+        return t + self.offset + self.drift * t
+
+    def _unwrap_peek(self, raw: int) -> int:
+        delta = (raw - self._raw) % TICKS_PERIOD
+        if delta >= TICKS_PERIOD // 2:
+            delta -= TICKS_PERIOD
+        return self._ticks + delta
+
+    def report(self) -> str:
+        if self.offset is None:
+            return "no packets"
+        return "drift=%+.0f ppm blocks=%d resyncs=%d" % (
+            self.drift * 1e6, len(self.blocks), self.resyncs)
+
+
+class ClockSync:
+    """One StickClock per stick id."""
+
+    def __init__(self):
+        self.clocks: Dict[int, StickClock] = {}
+
+    def observe(self, stick: int, ticks: int, recv_ms: float) -> None:
+        clock = self.clocks.get(stick)
+        if clock is None:
+            clock = self.clocks[stick] = StickClock()
+        clock.observe(ticks, recv_ms)
+
+    def host_ms(self, stick: int, ticks: Optional[int], default: Optional[float] = None):
+        clock = self.clocks.get(stick)
+        if ticks is None or clock is None or clock.offset is None:
+            return default
+        return clock.host_ms(ticks)
+
+    def report(self) -> str:
+        return " ".join("stick %d: %s" % (s, c.report()) for s, c in sorted(self.clocks.items()))
+
+
+# -----------------------------
+# MERGED TIMELINE
+# -----------------------------
+class HitTimeline:
+    """Orders HitTraces from all sticks by host_ms; pop_ready() hands them out in order."""
+
+    def __init__(self, reorder_ms: float = REORDER_MS, flam_ms: float = FLAM_MS):
+        self.reorder_ms = reorder_ms
+        self.flam_ms = flam_ms
+        self._heap = []
+        self._n = 0             # insertion counter, keeps heap entries comparable
+        self._last = None       # last hit handed out
+        self.emitted = 0
+        self.late = 0           # arrived after a newer hit was already handed out
+        self.flams = 0
+
+    def push(self, hit) -> None:
+        heapq.heappush(self._heap, (hit.host_ms, self._n, hit))
+        self._n += 1
+
+    def pop_ready(self, now_ms: Optional[float] = None) -> List:
+        """Hits older than now_ms - reorder_ms, oldest first (everything if now_ms is None)."""
+        out = []
+        while self._heap and (now_ms is None or self._heap[0][0] <= now_ms - self.reorder_ms):
+            _, _, hit = heapq.heappop(self._heap)
+            last = self._last
+            if last is not None:
+                if hit.host_ms < last.host_ms:
+                    self.late += 1
+                elif hit.stick != last.stick and hit.host_ms - last.host_ms <= self.flam_ms:
+                    hit.flam = True
+                    self.flams += 1
+            self._last = hit
+            self.emitted += 1
+            out.append(hit)
+        return out
+
+    def report(self) -> str:
+        return "timeline: %d hits, %d flams, %d late, %d pending" % (
+            self.emitted, self.flams, self.late, len(self._heap))
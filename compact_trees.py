@@ -0,0 +1,96 @@
+# -----------------------------
+# COMPACT-FEATURE TREES (LAPTOP)
+# -----------------------------
+# Generated by train_trees.py, do not edit. Trained on onset-gated windows.
+# input[k] is window_features() feature k:
+#    0 ax_energy
+#    1 ay_energy
+#    2 az_energy
+#    3 gx_energy
+#    4 gy_energy
+#    5 gz_energy
+#    6 ax_min
+#    7 ay_min
+#    8 az_min
+#    9 gx_min
+#   10 gy_min
+#   11 gz_min
+#   12 ax_max
+#   13 ay_max
+#   14 az_max
+#   15 gx_max
+#   16 gy_max
+#   17 gz_max
+#   18 ax_peak
+#   19 ay_peak
+#   20 az_peak
+#   21 gx_peak
+#   22 gy_peak
+#   23 gz_peak
+#   24 ax_jerk
+#   25 ay_jerk
+#   26 az_jerk
+#   27 gx_jerk
+#   28 gy_jerk
+#   29 gz_jerk
+
+
+def score_L_compact(input):
+    if input[12] <= 0.8277585208415985:
+        if input[8] <= -0.2239380031824112:
+            if input[4] <= 673.160888671875:
+                var0 = [0.0, 1.0, 0.0]
+            else:
+                var0 = [0.15, 0.85, 0.0]
+        else:
+            if input[6] <= 0.43383800983428955:
+                var0 = [0.0, 0.0, 1.0]
+            else:
+                var0 = [0.15, 0.0, 0.85]
+    else:
+        if input[11] <= -181.48809814453125:
+            if input[1] <= 0.4835626929998398:
+                var0 = [0.0, 0.0, 1.0]
+            else:
+                if input[1] <= 0.517572671175003:
+                    var0 = [0.7, 0.0, 0.3]
+                else:
+                    var0 = [1.0, 0.0, 0.0]
+        else:
+            if input[11] <= -141.357421875:
+                if input[1] <= 0.3884233385324478:
+                    if input[12] <= 1.2209469676017761:
+                        var0 = [0.25, 0.0, 0.75]
+                    else:
+                        var0 = [0.0, 0.0, 1.0]
+                else:
+                    if input[27] <= 141.66260528564453:
+                        var0 = [1.0, 0.0, 0.0]
+                    else:
+                        var0 = [0.85, 0.0, 0.15]
+            else:
+                if input[14] <= -0.13098149746656418:
+                    var0 = [0.0, 0.9393939393939394, 0.06060606060606061]
+                else:
+                    if input[16] <= 37.017822265625:
+                        var0 = [0.0, 0.5555555555555556, 0.4444444444444444]
+                    else:
+                        var0 = [0.9900887879413587, 0.0008259343382201115, 0.009085277720421227]
+    return var0
+
+
+def score_R_compact(input):
+    if input[0] <= 0.49155180156230927:
+        if input[14] <= 0.4706425070762634:
+            var0 = [0.0, 1.0, 0.0]
+        else:
+            var0 = [0.0, 0.0, 1.0]
+    else:
+        if input[16] <= 28.167728424072266:
+            var0 = [0.0, 1.0, 0.0]
+        else:
+            if input[25] <= 0.11010799929499626:
+                var0 = [0.75, 0.25, 0.0]
+            else:
+                var0 = [1.0, 0.0, 0.0]
+    return var0
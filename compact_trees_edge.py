@@ -0,0 +1,138 @@
+# -----------------------------
+# COMPACT-FEATURE TREES (NICLA, MICROPYTHON)
+# -----------------------------
+# Generated by train_trees.py, do not edit. Trained on row-gated windows.
+# input[k] is window_features() feature k:
+#    0 ax_energy
+#    1 ay_energy
+#    2 az_energy
+#    3 gx_energy
+#    4 gy_energy
+#    5 gz_energy
+#    6 ax_min
+#    7 ay_min
+#    8 az_min
+#    9 gx_min
+#   10 gy_min
+#   11 gz_min
+#   12 ax_max
+#   13 ay_max
+#   14 az_max
+#   15 gx_max
+#   16 gy_max
+#   17 gz_max
+#   18 ax_peak
+#   19 ay_peak
+#   20 az_peak
+#   21 gx_peak
+#   22 gy_peak
+#   23 gz_peak
+#   24 ax_jerk
+#   25 ay_jerk
+#   26 az_jerk
+#   27 gx_jerk
+#   28 gy_jerk
+#   29 gz_jerk
+
+FEATURES = 30
+
+WINDOW = 50
+_best = [0.0] * 6
+
+
+def window_features(buf, start, out):
+    # buf: flat rows of [ax, ay, az, gx, gy, gz], the window's WINDOW rows
+    # contiguous from buf[start] (the firmware's mirrored buffer);
+    # out: list of 30, filled in place
+    c = 0
+    while c < 6:
+        out[c] = 0.0
+        out[6 + c] = 1e30
+        out[12 + c] = -1e30
+        out[18 + c] = 0
+        out[24 + c] = 0.0
+        _best[c] = -1.0
+        c += 1
+    n = 0
+    k = start
+    while n < WINDOW:
+        c = 0
+        while c < 6:
+            v = buf[k + c]
+            out[c] += v * v
+            if v < out[6 + c]:
+                out[6 + c] = v
+            if v > out[12 + c]:
+                out[12 + c] = v
+            a = abs(v)
+            if a > _best[c]:
+                _best[c] = a
+                out[18 + c] = n
+            if n:
+                d = abs(v - buf[k - 6 + c])
+                if d > out[24 + c]:
+                    out[24 + c] = d
+            c += 1
+        k += 6
+        n += 1
+    c = 0
+    while c < 6:
+        out[c] /= WINDOW
+        c += 1
+    return out
+
+
+def score_L_compact(input):
+    if input[12] <= 0.8182979822158813:
+        if input[14] <= 0.5031740069389343:
+            return [0.0, 1.0, 0.0]
+        else:
+            return [0.0, 0.0, 1.0]
+    else:
+        if input[11] <= -181.12188720703125:
+            if input[1] <= 0.4873279631137848:
+                if input[1] <= 0.4619198739528656:
+                    return [0.0, 0.0, 1.0]
+                else:
+                    return [0.05, 0.0, 0.95]
+            else:
+                if input[27] <= 135.65064239501953:
+                    return [1.0, 0.0, 0.0]
+                else:
+                    return [0.4, 0.0, 0.6]
+        else:
+            if input[11] <= -147.5830078125:
+                if input[1] <= 0.40679338574409485:
+                    return [0.0, 0.0, 1.0]
+                else:
+                    if input[7] <= -1.3066405057907104:
+                        return [0.95, 0.0, 0.05]
+                    else:
+                        return [1.0, 0.0, 0.0]
+            else:
+                if input[14] <= -0.10443100333213806:
+                    if input[4] <= 1524.0842895507812:
+                        return [0.0, 1.0, 0.0]
+                    else:
+                        return [0.25, 0.7, 0.05]
+                else:
+                    if input[16] <= 39.4287109375:
+                        return [0.019230769230769232, 0.5192307692307693, 0.46153846153846156]
+                    else:
+                        return [0.9812493065571951, 0.000887606790191945, 0.01786308665261289]
+
+
+def score_R_compact(input):
+    if input[0] <= 0.5386900007724762:
+        if input[14] <= 0.9718019962310791:
+            return [0.0, 1.0, 0.0]
+        else:
+            return [0.0, 0.0, 1.0]
+    else:
+        if input[27] <= 25.5126953125:
+            return [0.0, 1.0, 0.0]
+        else:
+            if input[16] <= 45.07447052001953:
+                return [0.5833333333333334, 0.4166666666666667, 0.0]
+            else:
+                return [1.0, 0.0, 0.0]
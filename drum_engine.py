@@ -0,0 +1,349 @@
+# ------------------------------------
+# UNIFIED DRUM ENGINE (LAPTOP)
+# ------------------------------------
+# One asyncio UDP receiver for every stick and both packet kinds:
+#   - raw IMU (binary frames or legacy text rows) -> laptop inference,
+#     as in basic_drum.py
+#   - "side,cls" class packets from the edge firmware -> direct trigger,
+#     as in basic_drum_inferencenot.py
+#
+# Datagrams are demultiplexed by stick id into per-stick queues, each
+# drained by its own task, so a burst on one stick does not hold up the
+# other. Several ports can be served at once (--port 5005 --port 5006).
+#
+# Hits play as soon as they are detected. Each one is also placed on the
+# laptop clock (clock_sync.py, per-stick offset + drift from packet
+# arrivals) and merged into one time-ordered HitTimeline for both sticks;
+# on_event gets that stream, --timeline writes it out.
+
+import argparse
+import asyncio
+import json
+import signal
+import time
+from pathlib import Path
+
+from clock_sync import REORDER_MS, ClockSync, HitTimeline
+from hit_log import HitLogWriter
+from imu_protocol import MAGIC, FrameDecoder, ProtocolError
+from latency_trace import LatencyTracer, now
+from model_ensemble import ENSEMBLE_MODE, ENSEMBLE_MODES, ModelRegistry, ShadowLog
+from stick_pipeline import GATE_MODE, GATE_MODES, MotionGate, StickPipeline
+from tree_engine import load_trees
+from window_features import load_feature_models
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+UDP_IP = "0.0.0.0"
+UDP_PORT = 5005
+QUEUE_SIZE = 256
+REPORT_EVERY_S = 10
+
+BASE_DIR = Path(__file__).resolve().parent
+# hand-pasted trees, plus the compact-feature trees once train_trees.py has run
+MODELS = dict(load_trees(BASE_DIR / "basic_drum.py"), **load_feature_models())
+
+# model, drum per tree class, drum per edge class id; `shadow` models run
+# on the same windows next to the live one with --shadow (model_ensemble.py,
+# scored after the hit is dispatched)
+STICKS = {
+    0: dict(name="LEFT", model="score_l_new", class_drums=("hihat", "snare"),
+            edge_drums={0: "hihat", 2: "snare"},
+            shadow=("score_L_stick", "score_L_compact")),
+    1: dict(name="RIGHT", model="score_R_new", class_drums=("crash", "floortom"),
+            edge_drums={0: "crash", 2: "floortom"},
+            shadow=("score_R_2", "score_R_compact")),
+}
+
+# model -> (stick side, drum per class). 3-class trees use the edge
+# firmware's order: 0 = hi-hat/crash, 1 = no hit, 2 = snare/floor tom.
+MODEL_SPECS = {
+    "score_L": (0, ("hihat", None, "snare")),
+    "score_L_stick": (0, ("hihat", None, "snare")),
+    "score_R": (1, ("crash", None, "floortom")),
+    "score_R_2": (1, ("crash", None, "floortom")),
+    # train_trees.py output
+    "score_L_compact": (0, ("hihat", None, "snare")),
+    "score_R_compact": (1, ("crash", None, "floortom")),
+}
+# the live models are scored with exactly the mapping the receivers play
+for _stick, _cfg in STICKS.items():
+    MODEL_SPECS[_cfg["model"]] = (_stick, tuple(_cfg["class_drums"]))
+
+REGISTRY = ModelRegistry(MODELS, MODEL_SPECS)
+
+# drum -> file in sound/, shared by every receiver and kept in each take's
+# header for hit_log.py
+SOUND_FILES = {
+    "snare": "snare.mpeg",
+    "hihat": "hihat.mpeg",
+    "crash": "crash.mp3",
+    "floortom": "kick.mp3",
+}
+
+IMU, EDGE = 0, 1
+
+
+def make_pipeline(stick: int, gate=None, models=None, mode: str = ENSEMBLE_MODE,
+                  shadow_log=None, shadows: bool = False) -> StickPipeline:
+    """models: names to run on this stick, active first (default: live, plus shadow if shadows)."""
+    cfg = STICKS[stick]
+    if models is None:
+        models = [cfg["model"]]
+        if shadows:
+            models += [m for m in cfg.get("shadow", ()) if m in REGISTRY.specs]
+    ensemble = REGISTRY.ensemble(stick, models, mode, log=shadow_log)
+    return StickPipeline(stick, ensemble, ensemble.class_drums,
+                         edge_drums=cfg["edge_drums"], gate=gate)
+
+
+def stick_models(names, stick: int):
+    """The --model names that belong to `stick`, or None for the default set."""
+    picked = [n for n in names or () if MODEL_SPECS[n][0] == stick]
+    return picked or None
+
+
+# -----------------------------
+# PER-STICK WORKER
+# -----------------------------
+class StickWorker:
+    def __init__(self, pipeline: StickPipeline, on_hit):
+        self.pipeline = pipeline
+        self.on_hit = on_hit
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.dropped = 0
+
+    def submit(self, item) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self) -> None:
+        stick = self.pipeline.stick
+        while True:
+            kind, seq, payload, ticks, t_recv, recv_ms = await self.queue.get()
+            if kind == IMU:
+                for hit in self.pipeline.feed(seq, payload, ticks, t_recv, recv_ms):
+                    self.on_hit(hit)
+                self.pipeline.run_shadows()
+            else:
+                hit = self.pipeline.edge_class(payload, t_recv)
+                if hit is not None:
+                    hit.recv_ms = recv_ms
+                    self.on_hit(hit)
+            # queue.get() does not yield while items are waiting; give the
+            # other sticks a turn between frames
+            await asyncio.sleep(0)
+
+
+# -----------------------------
+# ENGINE
+# -----------------------------
+class DrumEngine:
+    """
+    on_hit(hit) is called with a latency_trace.HitTrace for every trigger,
+    right away; on_event(hit) gets the same hits later, both sticks merged
+    in host_ms order (flams flagged).
+    """
+
+    def __init__(self, on_hit, gate=None, tracer=None, models=None, mode: str = ENSEMBLE_MODE,
+                 shadow_log=None, on_event=None, shadows: bool = False):
+        self.on_hit = on_hit
+        self.shadows = shadows
+        self.on_event = on_event
+        self.clock = ClockSync()
+        self.timeline = HitTimeline()
+        self.gate = gate
+        self.models = models
+        self.mode = mode
+        self.shadow_log = shadow_log
+        self.tracer = tracer or LatencyTracer()
+        self.decoder = FrameDecoder()
+        self.workers = {}
+        self._tasks = []
+        self.bad_packets = 0
+        self.unknown_sticks = set()
+
+    def worker(self, stick: int):
+        w = self.workers.get(stick)
+        if w is None:
+            if stick not in STICKS:
+                if stick not in self.unknown_sticks:
+                    self.unknown_sticks.add(stick)
+                    print("ignoring unconfigured stick", stick)
+                return None
+            pipe = make_pipeline(stick, self.gate, stick_models(self.models, stick), self.mode,
+                                 self.shadow_log, self.shadows)
+            w = self.workers[stick] = StickWorker(pipe, self._hit)
+            self._tasks.append(asyncio.ensure_future(w.run()))
+        return w
+
+    def _hit(self, hit) -> None:
+        self.on_hit(hit)
+        # edge class packets carry no sample time: use the arrival time
+        hit.host_ms = self.clock.host_ms(hit.stick, hit.sensor_ms, hit.recv_ms)
+        if hit.host_ms is not None:
+            self.timeline.push(hit)
+
+    def drain_timeline(self, final: bool = False) -> None:
+        for hit in self.timeline.pop_ready(None if final else time.time() * 1000.0):
+            if self.on_event is not None:
+                self.on_event(hit)
+
+    async def run_timeline(self) -> None:
+        while True:
+            await asyncio.sleep(REORDER_MS / 2000.0)
+            self.drain_timeline()
+
+    def dispatch(self, data: bytes) -> None:
+        t_recv, recv_ms = now(), time.time() * 1000.0
+        try:
+            if data[:1] != bytes((MAGIC,)) and data.count(b",") == 1:
+                side, cls = map(int, data.split(b","))
+                w = self.worker(side)
+                if w is not None:
+                    w.submit((EDGE, None, cls, None, t_recv, recv_ms))
+                return
+            n = self.decoder.feed(data)
+        except (ProtocolError, ValueError):
+            self.bad_packets += 1
+            return
+        d = self.decoder
+        w = self.worker(d.stick)
+        if w is not None:
+            self.tracer.observe_packet(d.stick, int(d.ticks_ms[n - 1]), recv_ms)
+            self.clock.observe(d.stick, int(d.ticks_ms[n - 1]), recv_ms)
+            # the decoder reuses its arrays on the next datagram
+            w.submit((IMU, d.seq, d.rows[:n].copy(), d.ticks_ms[:n].copy(), t_recv, recv_ms))
+
+    def report(self) -> None:
+        for stick in sorted(self.workers):
+            w = self.workers[stick]
+            print(w.pipeline.report(), "queue=%d dropped=%d" % (w.queue.qsize(), w.dropped))
+        if self.clock.clocks:
+            print("clocks:", self.clock.report())
+        print(self.timeline.report())
+        if self.bad_packets:
+            print("bad packets:", self.bad_packets)
+
+    def close(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self.drain_timeline(final=True)
+
+
+class DrumProtocol(asyncio.DatagramProtocol):
+    def __init__(self, engine: DrumEngine):
+        self.engine = engine
+
+    def datagram_received(self, data, addr):
+        self.engine.dispatch(data)
+
+
+async def serve(engine: DrumEngine, ports, duration=None) -> None:
+    loop = asyncio.get_running_loop()
+    transports = []
+    for port in ports:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: DrumProtocol(engine), local_addr=(UDP_IP, port))
+        transports.append(transport)
+    engine._tasks.append(asyncio.ensure_future(engine.run_timeline()))
+    print("Listening on UDP", ", ".join(map(str, ports)))
+    try:
+        # `kill -USR1 <pid>` dumps the latency histograms
+        loop.add_signal_handler(signal.SIGUSR1, lambda: print(engine.tracer.dump()))
+    except (AttributeError, NotImplementedError):
+        pass
+
+    end = None if duration is None else loop.time() + duration
+    try:
+        while end is None or loop.time() < end:
+            wait = REPORT_EVERY_S if end is None else min(REPORT_EVERY_S, end - loop.time())
+            await asyncio.sleep(wait)
+            engine.report()
+    finally:
+        for t in transports:
+            t.close()
+        engine.close()
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="AirJam drum engine")
+    parser.add_argument("--port", type=int, action="append",
+                        help="UDP port to listen on (repeatable, default %d)" % UDP_PORT)
+    parser.add_argument("--duration", type=float, default=None,
+                        help="stop after this many seconds")
+    parser.add_argument("--gate", choices=GATE_MODES, default=GATE_MODE,
+                        help="trigger: onset detector, single-frame (row) or sliding-window variance gate")
+    parser.add_argument("--model", action="append", choices=REGISTRY.names(),
+                        help="model to run (repeatable, first per stick plays; "
+                             "default: the live model)")
+    parser.add_argument("--shadow", action="store_true",
+                        help="also run each stick's shadow models (STICKS) on the same windows")
+    parser.add_argument("--ensemble", choices=ENSEMBLE_MODES, default=ENSEMBLE_MODE,
+                        help="combine a stick's models: active only, vote or mean probability")
+    parser.add_argument("--shadow-log", default=None,
+                        help="append every model's prediction per window to this JSON-lines file")
+    parser.add_argument("--timeline", default=None,
+                        help="write the merged, time-ordered hits of all sticks to this JSON-lines file")
+    parser.add_argument("--hit-log", default=None,
+                        help="append every hit to this .hits file (hit_log.py render plays it back)")
+    args = parser.parse_args()
+
+    import pygame
+    from audio_dispatch import AudioDispatcher
+
+    # AUDIO INIT (LOW LATENCY)
+    pygame.mixer.pre_init(44100, -16, 2, 256)
+    pygame.init()
+    sounds = {name: pygame.mixer.Sound(str(BASE_DIR / "sound" / f))
+              for name, f in SOUND_FILES.items()}
+    tracer = LatencyTracer()
+    audio = AudioDispatcher(sounds, on_played=tracer.record).start()
+
+    def on_hit(hit):
+        audio.trigger(hit.drum, trace=hit)
+        print(STICKS[hit.stick]["name"], "→", hit.drum.upper())
+
+    timeline = open(args.timeline, "a") if args.timeline else None
+    hit_log = (HitLogWriter(args.hit_log, "drum_engine.py", sounds=SOUND_FILES)
+               if args.hit_log else None)
+
+    def on_event(hit):
+        if hit_log is not None:
+            hit_log.append_hit(hit)
+        if timeline is not None:
+            timeline.write(json.dumps(dict(t_ms=round(hit.host_ms, 1), stick=hit.stick,
+                                           drum=hit.drum, sensor_ms=hit.sensor_ms,
+                                           flam=hit.flam)) + "\n")
+
+    shadow_log = ShadowLog(args.shadow_log) if args.shadow_log else None
+    engine = DrumEngine(on_hit, gate=MotionGate(mode=args.gate), tracer=tracer,
+                        models=args.model, mode=args.ensemble, shadow_log=shadow_log,
+                        on_event=on_event, shadows=args.shadow)
+    try:
+        asyncio.run(serve(engine, args.port or [UDP_PORT], args.duration))
+    except KeyboardInterrupt:
+        print("\nStopping engine...")
+    finally:
+        engine.report()
+        audio.stop()
+        print(audio.report())
+        print(tracer.dump())
+        if shadow_log is not None:
+            shadow_log.close()
+        if timeline is not None:
+            timeline.close()
+        if hit_log is not None:
+            hit_log.close()
+        pygame.quit()
+        print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# ------------------------------------
+# OFFLINE CLASSIFIER EVALUATION
+# ------------------------------------
+# Runs every score_* tree over every 50-sample window of the imu_data/
+# recordings in one batch call per file, and reports what would actually
+# play: tree output AND the motion gate, just like the live receiver.
+#
+#   python evaluate.py                      # all models, all recordings
+#   python evaluate.py --model score_l_new --gate window
+#
+# Windows are stride-trick views over each recording (no copies); the
+# ground truth drum comes from the file name via LABEL_DRUMS.
+#
+# The row/window gates decide per window, so every window is scored (a
+# gated-off window counts as "-"). The onset gate makes one decision per
+# detected hit, so only the windows it fires on are scored: per-hit
+# accuracy, plus how many hits per second it finds in each recording.
+
+import argparse
+from collections import Counter
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from drum_engine import MODELS, REGISTRY
+from imu_dataset import label_side, load_all
+from ring_buffer import WINDOW_SIZE
+from onset import onset_mask
+from stick_pipeline import GATE_MODE, GATE_MODES, VARTHRESHOLD, WINDOW_VARTHRESHOLD
+
+SAMPLE_HZ = 50
+
+# recording label prefix -> drum the gesture should play (None = no hit).
+# The up/down recordings land in the same tree classes as the named ones:
+# left up = hi-hat, left down = snare, right up = crash, right down = floor tom.
+LABEL_DRUMS = {
+    "hihat": "hihat",
+    "snare": "snare",
+    "crash": "crash",
+    "tom": "floortom",
+    "nothing": None,
+    "left_up": "hihat",
+    "left_down": "snare",
+    "right_up": "crash",
+    "right_down": "floortom",
+}
+
+# model -> (stick side, drum per class); compact-feature trees only show
+# up once train_trees.py has been run
+MODEL_SPECS = REGISTRY.specs
+
+
+def label_drum(label: str):
+    for prefix in sorted(LABEL_DRUMS, key=len, reverse=True):
+        if label.startswith(prefix):
+            return LABEL_DRUMS[prefix]
+    raise KeyError(label)
+
+
+# -----------------------------
+# WINDOWS / GATE (vectorised)
+# -----------------------------
+def sliding_windows(rows: np.ndarray, size: int = WINDOW_SIZE) -> np.ndarray:
+    """(n - size + 1, size * 6) view: row k is the flat window ending at sample k + size - 1."""
+    rows = np.ascontiguousarray(rows)
+    n, c = rows.shape
+    flat = rows.reshape(-1)
+    step = flat.strides[0]
+    return as_strided(flat, shape=(n - size + 1, size * c), strides=(c * step, step),
+                      writeable=False)
+
+
+def gate_mask(rows: np.ndarray, mode: str = "row", size: int = WINDOW_SIZE) -> np.ndarray:
+    """Motion gate per window, same rules as stick_pipeline.MotionGate."""
+    if mode == "row":
+        row_var = np.abs(np.diff(rows, axis=1)).sum(axis=1)
+        return row_var[size - 1:] > VARTHRESHOLD
+    if mode == "onset":
+        # stateful, so run sequentially (a few ms per recording)
+        return onset_mask(rows)[size - 1:]
+    # sliding-window variance from cumulative sums, summed over channels
+    cs = np.cumsum(np.vstack([np.zeros((1, rows.shape[1])), rows]), axis=0)
+    cs2 = np.cumsum(np.vstack([np.zeros((1, rows.shape[1])), rows * rows]), axis=0)
+    s = cs[size:] - cs[:-size]
+    s2 = cs2[size:] - cs2[:-size]
+    var = np.maximum(s2 / size - (s / size) ** 2, 0.0)
+    return var.sum(axis=1) > WINDOW_VARTHRESHOLD
+
+
+# -----------------------------
+# EVALUATION
+# -----------------------------
+class ModelReport:
+    def __init__(self, name: str, gate: str = GATE_MODE):
+        self.name = name
+        self.gate = gate
+        self.raw = Counter()        # (truth, predicted) -> windows
+        self.gated = Counter()
+        self.triggers = Counter()   # (file label, drum) -> gated windows
+        self.seconds = Counter()    # file label -> recording length
+
+    def accuracy(self, gated: bool = True) -> float:
+        c = self.gated if gated else self.raw
+        total = sum(c.values())
+        return sum(v for (t, p), v in c.items() if t == p) / total if total else 0.0
+
+
+def evaluate_model(name: str, recordings, gate: str = GATE_MODE) -> ModelReport:
+    side, class_drums = MODEL_SPECS[name]
+    tree = MODELS[name]
+    drums = np.array(class_drums, dtype=object)
+    rep = ModelReport(name, gate)
+    for rec in recordings:
+        if rec.side not in (None, side) or len(rec) < WINDOW_SIZE:
+            continue
+        if label_side(rec.label) not in (None, side):
+            continue            # the other stick's gesture
+        truth = label_drum(rec.label)
+        X = sliding_windows(rec.rows)
+        pred = drums[tree.predict_class_batch(X)]
+        fired = gate_mask(rec.rows, gate)
+        gated = pred[fired] if gate == "onset" else np.where(fired, pred, None)
+        for p, c in zip(*np.unique(pred.astype(str), return_counts=True)):
+            rep.raw[(truth, None if p == "None" else p)] += int(c)
+        for p, c in zip(*np.unique(gated.astype(str), return_counts=True)):
+            p = None if p == "None" else p
+            rep.gated[(truth, p)] += int(c)
+            if p is not None:
+                rep.triggers[(rec.label, p)] += int(c)
+        rep.seconds[rec.label] += len(rec) / SAMPLE_HZ
+    return rep
+
+
+def confusion_table(counts: Counter) -> str:
+    names = sorted({k for pair in counts for k in pair}, key=lambda d: (d is None, d or ""))
+    fmt = lambda d: d or "-"
+    lines = ["%-10s" % "truth\\pred" + "".join("%10s" % fmt(p) for p in names)]
+    for t in names:
+        if not any(counts[(t, p)] for p in names):
+            continue
+        lines.append("%-10s" % fmt(t) + "".join("%10d" % counts[(t, p)] for p in names))
+    return "\n".join(lines)
+
+
+def print_report(rep: ModelReport) -> None:
+    print("=" * 60)
+    onset = rep.gate == "onset"
+    print("%s   raw accuracy %.1f%%   %s accuracy %.1f%%" % (
+        rep.name, 100 * rep.accuracy(False), "per-hit" if onset else "gated",
+        100 * rep.accuracy(True)))
+    print("\nraw tree output")
+    print(confusion_table(rep.raw))
+    print("\nat each onset (what plays)" if onset else "\nafter motion gate (what plays)")
+    print(confusion_table(rep.gated))
+    print("\ntriggers per second")
+    for label in sorted(rep.seconds):
+        rates = ["%s %.1f" % (d, c / rep.seconds[label])
+                 for (l, d), c in sorted(rep.triggers.items()) if l == label]
+        print("  %-26s %s" % (label, ", ".join(rates) or "none"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate score_* trees on imu_data/")
+    parser.add_argument("--model", action="append", choices=sorted(MODEL_SPECS),
+                        help="model to evaluate (repeatable, default all)")
+    parser.add_argument("--gate", choices=GATE_MODES, default=GATE_MODE)
+    parser.add_argument("--data", default=None, help="recordings directory")
+    args = parser.parse_args()
+
+    recordings = load_all(args.data) if args.data else load_all()
+    for name in args.model or sorted(MODEL_SPECS):
+        print_report(evaluate_model(name, recordings, args.gate))
+
+
+if __name__ == "__main__":
+    main()
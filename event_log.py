@@ -0,0 +1,260 @@
+# -----------------------------
+# OFF-THREAD EVENT LOG
+# -----------------------------
+# Leveled, structured records instead of print() in the receive loops.
+# A record is (wall time, level, kind, stick, up to 15 float values,
+# optional short text). log() only checks the level and the sampling
+# counter and appends a tuple to an in-memory ring buffer (the oldest
+# records are overwritten if the writer cannot keep up). A background
+# thread drains the ring every FLUSH_MS: records at or above
+# console_level are printed, records at or above file_level are appended
+# to a compact binary file.
+#
+# High-rate kinds are sampled: sample={"row": 25} keeps every 25th "row"
+# record per stick (the others are only counted).
+#
+# File format (*.evlog):
+#   FILE_MAGIC b"AIRJLOG\n", then records:
+#     u8  level        255 = kind definition: u8 id, u8 len, name (utf-8)
+#     u8  kind id
+#     u8  stick        255 = none
+#     u8  n | 0x80     n float32 values follow; 0x80 = text follows
+#     f64 time.time()
+#     f32 x n
+#     u8 len + utf-8   text, if flagged
+#
+#   python event_log.py dump session/events.evlog [--kind hit] [--level INFO]
+
+import argparse
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+LEVELS = {v: k for k, v in LEVEL_NAMES.items()}
+OFF = 100
+
+FILE_MAGIC = b"AIRJLOG\n"
+RING_SIZE = 8192
+FLUSH_MS = 50
+MAX_VALUES = 15
+NO_STICK = 255
+KIND_DEF = 255
+
+RECORD = struct.Struct("<BBBBd")
+
+
+class EventLog:
+    def __init__(self, console_level: int = INFO, path=None, file_level: int = DEBUG,
+                 sample: Optional[Dict[str, int]] = None, ring_size: int = RING_SIZE,
+                 stream=None):
+        self.console_level = console_level
+        self.file_level = file_level if path else OFF
+        self.level = min(self.console_level, self.file_level)
+        self.sample = dict(sample or {})
+        self.stream = stream or sys.stdout
+        self._ring = [None] * ring_size
+        self._head = 0          # next slot to write
+        self._tail = 0          # next slot to drain
+        self._lock = threading.Lock()
+        self._seen: Dict[tuple, int] = {}     # (kind, stick) -> records so far
+        self._kinds: Dict[str, int] = {}
+        self._file = None
+        if path:
+            self._file = open(path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(FILE_MAGIC)
+        self.records = 0
+        self.sampled_out = 0
+        self.overwritten = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -------------------------
+    # producer side
+    # -------------------------
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, kind: str, stick: Optional[int] = None, values=(),
+            text: Optional[str] = None) -> None:
+        if level < self.level:
+            return
+        every = self.sample.get(kind)
+        if every:
+            key = (kind, stick)
+            n = self._seen.get(key, 0)
+            self._seen[key] = n + 1
+            if n % every:
+                self.sampled_out += 1
+                return
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        rec = (time.time(), level, kind, NO_STICK if stick is None else stick, values, text)
+        with self._lock:
+            ring = self._ring
+            ring[self._head % len(ring)] = rec
+            self._head += 1
+            if self._head - self._tail > len(ring):
+                self._tail = self._head - len(ring)
+                self.overwritten += 1
+            self.records += 1
+
+    def debug(self, kind, stick=None, values=(), text=None):
+        self.log(DEBUG, kind, stick, values, text)
+
+    def info(self, kind, stick=None, values=(), text=None):
+        self.log(INFO, kind, stick, values, text)
+
+    def warn(self, kind, stick=None, values=(), text=None):
+        self.log(WARN, kind, stick, values, text)
+
+    def error(self, kind, stick=None, values=(), text=None):
+        self.log(ERROR, kind, stick, values, text)
+
+    # -------------------------
+    # writer thread
+    # -------------------------
+    def start(self) -> "EventLog":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.drain()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(FLUSH_MS / 1000.0):
+            self.drain()
+
+    def drain(self) -> None:
+        with self._lock:
+            ring = self._ring
+            batch = [ring[i % len(ring)] for i in range(self._tail, self._head)]
+            self._tail = self._head
+        if not batch:
+            return
+        lines = []
+        out = bytearray()
+        for rec in batch:
+            level = rec[1]
+            if level >= self.console_level:
+                lines.append(format_record(*rec))
+            if level >= self.file_level:
+                self._encode(rec, out)
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        if out and self._file is not None:
+            self._file.write(out)
+            self._file.flush()
+
+    def _encode(self, rec, out: bytearray) -> None:
+        t, level, kind, stick, values, text = rec
+        kid = self._kinds.get(kind)
+        if kid is None:
+            kid = self._kinds[kind] = len(self._kinds)
+            name = _clip(kind)
+            out += bytes((KIND_DEF, kid, len(name))) + name
+        values = values[:MAX_VALUES]
+        flags = len(values) | (0x80 if text else 0)
+        out += RECORD.pack(level, kid, stick, flags, t)
+        if values:
+            out += struct.pack("<%df" % len(values), *values)
+        if text:
+            data = _clip(text)
+            out += bytes((len(data),)) + data
+
+    def report(self) -> str:
+        return "log: %d records, %d sampled out, %d overwritten" % (
+            self.records, self.sampled_out, self.overwritten)
+
+
+def _clip(text: str, size: int = 255) -> bytes:
+    """UTF-8, cut to at most `size` bytes on a character boundary."""
+    return text.encode()[:size].decode("utf-8", "ignore").encode()
+
+
+def format_record(t, level, kind, stick, values, text) -> str:
+    parts = [time.strftime("%H:%M:%S", time.localtime(t)) + ".%03d" % (t % 1 * 1000),
+             LEVEL_NAMES.get(level, str(level)), kind]
+    if stick != NO_STICK:
+        parts.append("stick %d" % stick)
+    if text:
+        parts.append(text)
+    if len(values):
+        parts.append(" ".join("%.3f" % v for v in values))
+    return " ".join(parts)
+
+
+# -----------------------------
+# READ
+# -----------------------------
+def read_log(path):
+    """Yields (t, level, kind, stick, values, text) from an .evlog file.
+
+    A file cut off mid-write (crash, kill) ends at its last complete record.
+    """
+    data = open(path, "rb").read()
+    if not data.startswith(FILE_MAGIC):
+        raise ValueError("%s is not an event log" % path)
+    kinds = {}
+    pos = len(FILE_MAGIC)
+    while pos < len(data):
+        if data[pos] == KIND_DEF:
+            if pos + 3 > len(data) or pos + 3 + data[pos + 2] > len(data):
+                break           # cut off mid-record
+            kid, n = data[pos + 1], data[pos + 2]
+            kinds[kid] = data[pos + 3:pos + 3 + n].decode("utf-8", "replace")
+            pos += 3 + n
+            continue
+        if pos + RECORD.size > len(data):
+            break
+        level, kid, stick, flags, t = RECORD.unpack_from(data, pos)
+        end = pos + RECORD.size + 4 * (flags & 0x7F)
+        if flags & 0x80:
+            if end >= len(data):
+                break
+            end += 1 + data[end]
+        if end > len(data):
+            break
+        pos += RECORD.size
+        n = flags & 0x7F
+        values = struct.unpack_from("<%df" % n, data, pos)
+        pos += 4 * n
+        text = None
+        if flags & 0x80:
+            k = data[pos]
+            text = data[pos + 1:pos + 1 + k].decode("utf-8", "replace")
+            pos += 1 + k
+        yield t, level, kinds.get(kid, str(kid)), stick, values, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary event logs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    dump = sub.add_parser("dump", help="print the records of .evlog files")
+    dump.add_argument("files", nargs="+")
+    dump.add_argument("--kind", action="append", help="only these kinds (repeatable)")
+    dump.add_argument("--level", choices=sorted(LEVELS, key=LEVELS.get), default="DEBUG")
+    args = parser.parse_args()
+
+    for p in args.files:
+        for rec in read_log(p):
+            if rec[1] >= LEVELS[args.level] and (not args.kind or rec[2] in args.kind):
+                print(format_record(*rec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# -----------------------------
+# HIT SESSION LOG (*.hits) + OFFLINE RENDER
+# -----------------------------
+# Every trigger the receivers play, as fixed-width records behind the same
+# kind of self-describing header as imu_store.py:
+#
+#   bytes 0..7    HIT_MAGIC b"AIRJHIT\n"
+#   bytes 8..11   u32 little-endian: data offset (multiple of 64)
+#   bytes 12..    JSON: version, columns, drums (drum id -> name), sounds
+#                 (drum -> file in sound/, what the receiver played),
+#                 source, created
+#   data offset   records, HIT_DTYPE (16 bytes):
+#                   f8  t_ms        laptop wall clock, ms (clock_sync host
+#                                   time when the receiver has it)
+#                   u1  stick
+#                   u1  drum        index into "drums"
+#                   u2  flags       FLAG_FLAM
+#                   f4  intensity   largest |gyro| axis over the classified
+#                                   window, dps; NaN if unknown (edge classes)
+#
+# render() mixes the sound/ samples at the logged times into a WAV, with
+# the live mixer's rules: VOICES_PER_DRUM voices per drum (the oldest is
+# cut when a new hit needs one) and CHOKES. Each hit is one vectorised
+# slice add into a float32 buffer, so a take renders orders of magnitude
+# faster than real time.
+#
+#   python hit_log.py info takes/*.hits
+#   python hit_log.py render takes/basic_drum_20260110_201500.hits -o take.wav --dynamics
+
+import argparse
+import json
+import os
+import time
+import wave
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+HIT_MAGIC = b"AIRJHIT\n"
+HIT_VERSION = 1
+ALIGN = 64
+FLUSH_HITS = 32
+
+HIT_DTYPE = np.dtype([
+    ("t_ms", "<f8"),
+    ("stick", "u1"),
+    ("drum", "u1"),
+    ("flags", "<u2"),
+    ("intensity", "<f4"),
+])
+FLAG_FLAM = 1
+
+DRUMS = ("hihat", "snare", "crash", "floortom")
+
+SAMPLE_RATE = 44100
+# intensity (dps) that plays at full volume with --dynamics, about the 90th
+# percentile of the onset windows in imu_data/; softer hits scale down
+# linearly to MIN_GAIN
+INTENSITY_FULL = 270.0
+MIN_GAIN = 0.3
+
+
+class HitLogError(ValueError):
+    pass
+
+
+# -----------------------------
+# WRITE
+# -----------------------------
+class HitLogWriter:
+    def __init__(self, path, source: str = "", drums: Sequence[str] = DRUMS,
+                 sounds: Optional[Dict[str, str]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.drums = list(drums)
+        self._ids = {d: i for i, d in enumerate(self.drums)}
+        meta = dict(version=HIT_VERSION,
+                    columns=[[n, HIT_DTYPE[n].str, []] for n in HIT_DTYPE.names],
+                    drums=self.drums, sounds=dict(sounds or {}), source=source,
+                    created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        schema = json.dumps(meta).encode()
+        offset = -(-(len(HIT_MAGIC) + 4 + len(schema)) // ALIGN) * ALIGN
+        self._f = open(self.path, "wb")
+        self._f.write((HIT_MAGIC + offset.to_bytes(4, "little") + schema).ljust(offset, b" "))
+        self._rec = np.zeros(1, dtype=HIT_DTYPE)
+        self.hits = 0
+        self.unknown = 0
+
+    def append(self, stick: int, drum: str, t_ms: float, intensity: Optional[float] = None,
+               flam: bool = False) -> None:
+        d = self._ids.get(drum)
+        if d is None:
+            self.unknown += 1
+            return
+        r = self._rec
+        r["t_ms"] = t_ms
+        r["stick"] = stick
+        r["drum"] = d
+        r["flags"] = FLAG_FLAM if flam else 0
+        r["intensity"] = np.nan if intensity is None else intensity
+        self._f.write(r.tobytes())
+        self.hits += 1
+        if self.hits % FLUSH_HITS == 0:
+            self._f.flush()
+
+    def append_hit(self, hit, t_ms: Optional[float] = None) -> None:
+        """From a latency_trace.HitTrace; t_ms defaults to host_ms, then recv_ms, then now."""
+        if t_ms is None:
+            t_ms = hit.host_ms if hit.host_ms is not None else hit.recv_ms
+        if t_ms is None:
+            t_ms = time.time() * 1000.0
+        self.append(hit.stick, hit.drum, t_ms, hit.intensity, hit.flam)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "HitLogWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def session_path(directory, source: str) -> Path:
+    return Path(directory) / time.strftime(source + "_%Y%m%d_%H%M%S.hits")
+
+
+# -----------------------------
+# READ
+# -----------------------------
+class HitLog:
+    """meta (header dict) + records (HIT_DTYPE array, sorted by t_ms)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        data = self.path.read_bytes()
+        if not data.startswith(HIT_MAGIC):
+            raise HitLogError("%s is not a hit log" % self.path)
+        offset = int.from_bytes(data[len(HIT_MAGIC):len(HIT_MAGIC) + 4], "little")
+        self.meta = json.loads(data[len(HIT_MAGIC) + 4:offset].decode())
+        if self.meta.get("version") != HIT_VERSION:
+            raise HitLogError("unsupported hit log version %r" % self.meta.get("version"))
+        count = (len(data) - offset) // HIT_DTYPE.itemsize
+        records = np.frombuffer(data, dtype=HIT_DTYPE, count=count, offset=offset)
+        self.records = records[np.argsort(records["t_ms"], kind="stable")]
+        self.drums = self.meta["drums"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def duration_s(self) -> float:
+        t = self.records["t_ms"]
+        return (t[-1] - t[0]) / 1000.0 if len(t) else 0.0
+
+
+# -----------------------------
+# RENDER
+# -----------------------------
+def load_samples(sound_files, sound_dir, rate: int = SAMPLE_RATE):
+    """drum -> (n, 2) float32 in [-1, 1], decoded by pygame (no audio device needed)."""
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+
+    pygame.mixer.init(rate, -16, 2)
+    try:
+        return {drum: pygame.sndarray.array(pygame.mixer.Sound(str(Path(sound_dir) / f)))
+                .astype(np.float32) / 32768.0
+                for drum, f in sound_files.items()}
+    finally:
+        pygame.mixer.quit()
+
+
+def render(log: HitLog, samples, rate: int = SAMPLE_RATE, dynamics: bool = False,
+           voices: int = None, chokes=None, tail_s: float = 1.0) -> np.ndarray:
+    """(n, 2) float32 mix of the take; t = 0 is the first hit."""
+    from audio_dispatch import CHOKES, VOICES_PER_DRUM
+
+    voices = VOICES_PER_DRUM if voices is None else voices
+    chokes = CHOKES if chokes is None else chokes
+    rec = log.records
+    if not len(rec):
+        return np.zeros((0, 2), dtype=np.float32)
+    start = np.round((rec["t_ms"] - rec["t_ms"][0]) * rate / 1000.0).astype(np.int64)
+    if dynamics:
+        gain = np.clip(rec["intensity"] / INTENSITY_FULL, MIN_GAIN, 1.0)
+        gain = np.where(np.isnan(gain), 1.0, gain).astype(np.float32)
+    else:
+        gain = np.ones(len(rec), dtype=np.float32)
+    longest = max(len(s) for s in samples.values())
+    out = np.zeros((int(start[-1]) + longest + int(tail_s * rate), 2), dtype=np.float32)
+
+    names = log.drums
+    for d, drum in enumerate(names):
+        sample = samples.get(drum)
+        idx = np.flatnonzero(rec["drum"] == d)
+        if sample is None or not len(idx):
+            continue
+        s = start[idx]
+        end = s + len(sample)
+        # voice stealing: hit i loses its voice when hit i + voices starts
+        if voices and len(s) > voices:
+            end[:-voices] = np.minimum(end[:-voices], s[voices:])
+        # chokes: cut at the next hit of any drum that chokes this one
+        chokers = [names.index(o) for o, cut in chokes.items() if drum in cut and o in names]
+        if chokers:
+            cut_at = np.sort(start[np.isin(rec["drum"], chokers)])
+            k = np.searchsorted(cut_at, s, side="right")
+            has = k < len(cut_at)
+            end[has] = np.minimum(end[has], cut_at[k[has]])
+        for a, b, g in zip(s.tolist(), end.tolist(), gain[idx].tolist()):
+            out[a:b] += g * sample[:b - a]
+    return out
+
+
+def write_wav(path, audio: np.ndarray, rate: int = SAMPLE_RATE) -> float:
+    """16-bit stereo WAV; the mix is scaled down if it would clip. Returns the gain used."""
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    scale = 1.0 if peak <= 1.0 else 1.0 / peak
+    pcm = np.clip(audio * (scale * 32767.0), -32768, 32767).astype("<i2")
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return scale
+
+
+def main():
+    from drum_engine import BASE_DIR, SOUND_FILES
+
+    parser = argparse.ArgumentParser(description="Hit session logs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    info = sub.add_parser("info", help="summarise hit logs")
+    info.add_argument("files", nargs="+")
+    rend = sub.add_parser("render", help="mix a hit log into a WAV")
+    rend.add_argument("file")
+    rend.add_argument("-o", "--out", default=None, help="output WAV (default: next to the log)")
+    rend.add_argument("--dynamics", action="store_true",
+                      help="scale each hit by its intensity (live playback is flat)")
+    rend.add_argument("--sounds", default=str(BASE_DIR / "sound"))
+    args = parser.parse_args()
+
+    if args.cmd == "info":
+        for p in args.files:
+            log = HitLog(p)
+            counts = np.bincount(log.records["drum"], minlength=len(log.drums))
+            print("%s: %d hits in %.1f s (%s), %s" % (
+                p, len(log), log.duration_s(), log.meta.get("source"),
+                ", ".join("%s %d" % (d, c) for d, c in zip(log.drums, counts))))
+        return
+
+    log = HitLog(args.file)
+    # the receiver's own drum -> file map; older logs fall back to drum_engine's
+    samples = load_samples(log.meta.get("sounds") or SOUND_FILES, args.sounds)
+    t = time.perf_counter()
+    audio = render(log, samples, dynamics=args.dynamics)
+    took = time.perf_counter() - t
+    out = Path(args.out) if args.out else log.path.with_suffix(".wav")
+    scale = write_wav(out, audio)
+    seconds = len(audio) / SAMPLE_RATE
+    print("%s: %d hits, %.1f s of audio mixed in %.3f s (%.0fx real time)%s" % (
+        out, len(log), seconds, took, seconds / max(took, 1e-9),
+        "" if scale == 1.0 else ", scaled by %.2f to avoid clipping" % scale))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# -----------------------------
+# IMU RECORDINGS (imu_data/*.csv)
+# -----------------------------
+# receive_data.py has written two row layouts over time:
+#   timestamp, ax, ay, az, gx, gy, gz, activity
+#   timestamp, side, ax, ay, az, gx, gy, gz, activity   (side not in the header)
+# load_recording() accepts both, and the binary .imu files written by
+# imu_store.py, and returns plain arrays. Capture sessions from
+# receive_data.py (a directory with one .imu per stick and a
+# manifest.json of labelled segments) are split by load_session(): a
+# segment only yields the stick its label belongs to (label_side()), the
+# other stick's samples from that stretch are not labelled data.
+
+import csv
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parent / "imu_data"
+
+# label prefix -> stick that plays it (left: hi-hat/snare, right: crash/floor tom)
+LABEL_SIDES = {"hihat": 0, "snare": 0, "crash": 1, "floortom": 1, "tom": 1}
+
+
+class Recording:
+    def __init__(self, path: Path, label: str, ticks_ms: np.ndarray, rows: np.ndarray,
+                 side: Optional[int]):
+        self.path = path
+        self.label = label
+        self.ticks_ms = ticks_ms    # (n,) int64 Nicla time.ticks_ms()
+        self.rows = rows            # (n, 6) float64 ax, ay, az, gx, gy, gz
+        self.side = side            # 0 left / 1 right, from the data or the file name
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return "<Recording %s: %d samples, label=%s, side=%s>" % (
+            self.path.name, len(self), self.label, self.side)
+
+
+def side_from_name(name: str) -> Optional[int]:
+    name = name.lower()
+    if "left" in name:
+        return 0
+    if "right" in name:
+        return 1
+    return None
+
+
+def label_side(label: str) -> Optional[int]:
+    """Stick a label belongs to: left/right in the name, else its drum; None = either."""
+    side = side_from_name(label)
+    if side is not None:
+        return side
+    label = label.lower()
+    for prefix, s in LABEL_SIDES.items():
+        if label.startswith(prefix):
+            return s
+    return None
+
+
+def load_recording(path) -> Recording:
+    path = Path(path)
+    if path.suffix == ".imu":
+        from imu_store import StoredRecording
+
+        stored = StoredRecording(path)
+        return Recording(path, stored.label, stored.ticks_ms.astype(np.int64),
+                         stored.rows(), stored.side)
+    ticks, rows, sides = [], [], []
+    label = path.stem.rsplit("_", 2)[0]
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for rec in reader:
+            if len(rec) == 9:
+                sides.append(int(float(rec[1])))
+                values = rec[2:8]
+            elif len(rec) == 8:
+                values = rec[1:7]
+            else:
+                continue
+            ticks.append(int(float(rec[0])))
+            rows.append([float(v) for v in values])
+            label = rec[-1].strip()
+    side = sides[0] if sides else side_from_name(path.name)
+    return Recording(path, label,
+                     np.array(ticks, dtype=np.int64),
+                     np.array(rows, dtype=np.float64).reshape(-1, 6),
+                     side)
+
+
+def recording_paths(data_dir=DATA_DIR) -> List[Path]:
+    """*.imu and *.csv in `data_dir`; a converted csv is taken from its .imu."""
+    paths = {p.stem: p for p in Path(data_dir).glob("*.csv")}
+    paths.update((p.stem, p) for p in Path(data_dir).glob("*.imu"))
+    return [paths[stem] for stem in sorted(paths)]
+
+
+def load_session(session_dir) -> List[Recording]:
+    """One Recording per labelled segment and stick the label belongs to."""
+    from imu_store import StoredRecording
+
+    session_dir = Path(session_dir)
+    manifest = json.loads((session_dir / "manifest.json").read_text())
+    streams = {stick: StoredRecording(session_dir / name)
+               for stick, name in manifest["sticks"].items()}
+    recs = []
+    for seg in manifest["segments"]:
+        side = seg.get("stick", label_side(seg["label"]))
+        for stick, (first, end) in seg["records"].items():
+            stored = streams[stick]
+            if end <= first or side not in (None, int(stick)):
+                continue
+            recs.append(Recording(stored.path, seg["label"],
+                                  stored.ticks_ms[first:end].astype(np.int64),
+                                  stored.raw[first:end] * stored.scale, int(stick)))
+    return recs
+
+
+def load_all(data_dir=DATA_DIR, min_samples: int = 1) -> List[Recording]:
+    """Every non-empty recording in `data_dir`, sorted by file name, then capture sessions."""
+    recs = [load_recording(p) for p in recording_paths(data_dir)]
+    for manifest in sorted(Path(data_dir).glob("*/manifest.json")):
+        recs += load_session(manifest.parent)
+    return [r for r in recs if len(r) >= min_samples]
@@ -0,0 +1,204 @@
+# -----------------------------
+# IMU WIRE PROTOCOL (NICLA -> LAPTOP)
+# -----------------------------
+# Binary, versioned, batched UDP frame. All fields little-endian.
+#
+#   header (10 bytes)
+#     u8   magic      0xAD (never an ASCII digit, so text packets are told apart)
+#     u8   version    1
+#     u8   stick      0 = left, 1 = right
+#     u8   count      samples in this frame (1..MAX_SAMPLES)
+#     u16  seq        running sample counter of the first sample (wraps at 65536)
+#     u32  t0_ms      time.ticks_ms() of the first sample
+#
+#   sample (14 bytes) x count
+#     u16  dt_ms      offset from t0_ms
+#     i16  ax, ay, az raw LSM6DSOX counts, ACCEL_SCALE g per LSB
+#     i16  gx, gy, gz raw LSM6DSOX counts, GYRO_SCALE dps per LSB
+#
+# The legacy text packet "ts, side, ax, ay, az, gx, gy, gz" is still
+# accepted by FrameDecoder so older firmware keeps working.
+
+import struct
+
+import numpy as np
+
+MAGIC = 0xAD
+VERSION = 1
+MAX_SAMPLES = 32
+
+HEADER = struct.Struct("<BBBBHI")
+SAMPLE = struct.Struct("<H6h")
+MAX_FRAME = HEADER.size + MAX_SAMPLES * SAMPLE.size
+
+# lsm6dsox driver defaults: accel_scale=4 g, gyro_scale=2000 dps, 16-bit
+ACCEL_SCALE = 4 / 32768
+GYRO_SCALE = 2000 / 32768
+SCALE = np.array([ACCEL_SCALE] * 3 + [GYRO_SCALE] * 3)
+
+SAMPLE_DTYPE = np.dtype([("dt", "<u2"), ("raw", "<i2", (6,))])
+assert SAMPLE_DTYPE.itemsize == SAMPLE.size
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+# -----------------------------
+# ENCODE (replay tools / tests)
+# -----------------------------
+def to_counts(row):
+    """Physical (g, dps) row -> int16 raw counts."""
+    counts = np.rint(np.asarray(row, dtype=np.float64) / SCALE)
+    return np.clip(counts, -32768, 32767).astype(np.int16)
+
+
+def encode_frame(stick: int, seq: int, t0_ms: int, dts, counts) -> bytes:
+    """Pack `counts` ((n, 6) int16) with per-sample offsets `dts` into one frame."""
+    n = len(dts)
+    if not 1 <= n <= MAX_SAMPLES:
+        raise ProtocolError("frame must carry 1..%d samples, got %d" % (MAX_SAMPLES, n))
+    out = bytearray(HEADER.size + n * SAMPLE.size)
+    HEADER.pack_into(out, 0, MAGIC, VERSION, stick, n, seq & 0xFFFF, t0_ms & 0xFFFFFFFF)
+    samples = np.frombuffer(out, dtype=SAMPLE_DTYPE, count=n, offset=HEADER.size)
+    samples["dt"] = dts
+    samples["raw"] = counts
+    return bytes(out)
+
+
+# -----------------------------
+# DECODE (receiver)
+# -----------------------------
+class FrameDecoder:
+    """Receives and decodes frames into preallocated arrays.
+
+    After recv()/decode() returns n, the frame's samples are in
+    rows[:n] (g / dps floats) and ticks_ms[:n]; stick, seq and t0_ms
+    describe the frame. seq is None for legacy text packets.
+    """
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.buf = bytearray(HEADER.size + max_samples * SAMPLE.size)
+        # structured view over the receive buffer: recvfrom_into refills it in place
+        self._samples = np.frombuffer(self.buf, dtype=SAMPLE_DTYPE,
+                                      count=max_samples, offset=HEADER.size)
+        self.rows = np.zeros((max_samples, 6), dtype=np.float64)
+        self.ticks_ms = np.zeros(max_samples, dtype=np.int64)
+        self.stick = 0
+        self.seq = None
+        self.t0_ms = 0
+        self.count = 0
+        self.addr = None
+
+    def recv(self, sock) -> int:
+        nbytes, self.addr = sock.recvfrom_into(self.buf)
+        return self.decode(nbytes)
+
+    def feed(self, data: bytes) -> int:
+        """Decode a datagram that was already received (e.g. by asyncio)."""
+        nbytes = len(data)
+        if nbytes > len(self.buf):
+            raise ProtocolError("datagram of %d bytes exceeds the frame buffer" % nbytes)
+        self.buf[:nbytes] = data
+        return self.decode(nbytes)
+
+    def decode(self, nbytes: int) -> int:
+        if nbytes >= HEADER.size and self.buf[0] == MAGIC:
+            return self._decode_binary(nbytes)
+        return self._decode_text(nbytes)
+
+    def _decode_binary(self, nbytes: int) -> int:
+        _, version, stick, n, seq, t0 = HEADER.unpack_from(self.buf, 0)
+        if version != VERSION:
+            raise ProtocolError("unsupported frame version %d" % version)
+        if n > self.max_samples or nbytes < HEADER.size + n * SAMPLE.size:
+            raise ProtocolError("truncated frame: %d samples in %d bytes" % (n, nbytes))
+        s = self._samples[:n]
+        np.multiply(s["raw"], SCALE, out=self.rows[:n])
+        ticks = self.ticks_ms[:n]
+        ticks[:] = s["dt"]
+        ticks += t0
+        self.stick, self.seq, self.t0_ms, self.count = stick, seq, t0, n
+        return n
+
+    def _decode_text(self, nbytes: int) -> int:
+        try:
+            values = [float(v) for v in bytes(self.buf[:nbytes]).decode().split(",")]
+        except ValueError:
+            raise ProtocolError("malformed text packet") from None
+        if len(values) != 8:
+            raise ProtocolError("text packet has %d fields, expected 8" % len(values))
+        self.rows[0] = values[2:]
+        self.ticks_ms[0] = int(values[0])
+        self.stick, self.seq, self.t0_ms, self.count = int(values[1]), None, int(values[0]), 1
+        return 1
+
+
+# -----------------------------
+# BACKLOG DRAIN (receiver)
+# -----------------------------
+MAX_DRAIN = 256
+
+
+class BacklogReader:
+    """Waits for one datagram, then takes every datagram already queued.
+
+    read() returns {stick: [(seq, rows, ticks), ...]} oldest first, with
+    rows/ticks copied out of the decoder. A receiver that stalled (console,
+    audio, GC) catches up in one call instead of working through stale
+    frames one at a time. Backlog is counted per stick (one fresh frame
+    from each of two sticks is not a backlog). Counters: reads, how many
+    found more than one frame queued for some stick, deepest backlog
+    (frames for one stick) and furthest behind (samples queued for one
+    stick ahead of its newest frame, 50 per second of lag).
+    """
+
+    def __init__(self, decoder: FrameDecoder, max_datagrams: int = MAX_DRAIN):
+        self.decoder = decoder
+        self.max_datagrams = max_datagrams
+        self.reads = 0
+        self.behind = 0
+        self.datagrams = 0
+        self.max_depth = 0
+        self.max_behind = 0
+        self.bad_packets = 0
+
+    def read(self, sock):
+        """Blocks like sock.recvfrom (socket.timeout propagates) for the first datagram."""
+        d = self.decoder
+        frames = {}
+        depth = 0
+        timeout = sock.gettimeout()
+        try:
+            while depth < self.max_datagrams:
+                try:
+                    n = d.recv(sock)
+                except BlockingIOError:
+                    break
+                except ProtocolError:
+                    self.bad_packets += 1
+                    n = 0
+                depth += 1
+                if depth == 1:
+                    sock.setblocking(False)
+                if n:
+                    frames.setdefault(d.stick, []).append(
+                        (d.seq, d.rows[:n].copy(), d.ticks_ms[:n].copy()))
+        finally:
+            sock.settimeout(timeout)
+        self.reads += 1
+        self.datagrams += depth
+        stick_depth = max((len(f) for f in frames.values()), default=0)
+        if stick_depth > 1:
+            self.behind += 1
+            self.max_depth = max(self.max_depth, stick_depth)
+            for stick_frames in frames.values():
+                queued = sum(len(f[1]) for f in stick_frames[:-1])
+                self.max_behind = max(self.max_behind, queued)
+        return frames
+
+    def report(self) -> str:
+        return "drain: %d reads, %d behind (%.1f%%), max %d frames / %d samples behind, bad=%d" % (
+            self.reads, self.behind, 100.0 * self.behind / max(self.reads, 1),
+            self.max_depth, self.max_behind, self.bad_packets)
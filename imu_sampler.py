@@ -0,0 +1,175 @@
+# -------------------------------------------------
+# LSM6DSOX FIFO SAMPLING (NICLA, MICROPYTHON SAFE)
+# -------------------------------------------------
+# The sample clock is the IMU's own output data rate, not
+# time.sleep_ms(20): the sensor writes gyro + accel words into its
+# hardware FIFO at a fixed ODR and the firmware only drains whatever has
+# accumulated. Formatting, Wi-Fi sends or inference no longer stretch the
+# sample spacing; they only change how many samples come out per read.
+#
+#   sampler = FifoSampler(lsm, odr=52)
+#   raw = array("h", [0] * 6 * 16)
+#   n, t_last = sampler.wait(raw, 2, 16)  # raw[6*k:6*k+6] = ax, ay, az, gx, gy, gz
+#
+# Samples are raw int16 counts (scales as in imu_protocol.py). t_last is
+# ticks_ms() of the newest sample; sample k of n is
+# (n - 1 - k) * period_ms older. `decimate` keeps every Nth sample on the
+# board, e.g. odr=104, decimate=2.
+#
+# The ODR steps are fixed by the chip (12.5, 26, 52, 104, 208, 417, 833
+# Hz); 52 Hz is the nearest to the 50 Hz the trees were trained on.
+#
+# Needs only _read_reg_into/_write_reg/_read_reg from the lsm6dsox driver,
+# so lsm6dsox_mock.MockLSM6DSOX runs it unchanged on Linux.
+
+try:
+    from time import ticks_ms, ticks_add, sleep_ms
+except ImportError:
+    # CPython (tests against the mock driver)
+    import time
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000) & 0x3FFFFFFF
+
+    def ticks_add(a, delta):
+        return (a + delta) & 0x3FFFFFFF
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+# registers
+FIFO_CTRL1 = 0x07
+FIFO_CTRL2 = 0x08
+FIFO_CTRL3 = 0x09
+FIFO_CTRL4 = 0x0A
+CTRL1_XL = 0x10
+CTRL2_G = 0x11
+CTRL3_C = 0x12
+FIFO_STATUS1 = 0x3A
+FIFO_STATUS2 = 0x3B
+FIFO_DATA_OUT_TAG = 0x78
+
+# ODR_XL / ODR_G / BDR_XL / BDR_GY share one code table
+ODR_CODES = {12.5: 0x1, 26: 0x2, 52: 0x3, 104: 0x4, 208: 0x5, 417: 0x6, 833: 0x7}
+FIFO_MODE_BYPASS = 0x0
+FIFO_MODE_CONTINUOUS = 0x6
+TAG_GYRO = 0x01
+TAG_ACCEL = 0x02
+STATUS_OVERRUN = 0x40
+
+
+class FifoSampler:
+    def __init__(self, lsm, odr=52, decimate=1):
+        if odr not in ODR_CODES:
+            raise ValueError("ODR must be one of %s" % sorted(ODR_CODES))
+        self.lsm = lsm
+        self.odr = odr
+        self.decimate = decimate
+        self.rate = odr / decimate
+        self.period_ms = 1000.0 / self.rate
+        self._status = bytearray(2)
+        self._word = bytearray(7)
+        self._gyro = [0, 0, 0]
+        self._accel = [0, 0, 0]
+        self._have = 0          # bit 1: gyro, bit 2: accel
+        self._phase = 0         # decimation counter
+        self.samples = 0
+        self.overruns = 0
+        self.configure()
+
+    def configure(self):
+        code = ODR_CODES[self.odr]
+        lsm = self.lsm
+        # block data update + register auto-increment
+        lsm._write_reg(CTRL3_C, lsm._read_reg(CTRL3_C) | 0x44)
+        # sensor ODRs (keep the full-scale bits the driver set)
+        lsm._write_reg(CTRL1_XL, (lsm._read_reg(CTRL1_XL) & 0x0F) | (code << 4))
+        lsm._write_reg(CTRL2_G, (lsm._read_reg(CTRL2_G) & 0x0F) | (code << 4))
+        # batch both sensors at the ODR, no timestamp / temperature words
+        lsm._write_reg(FIFO_CTRL1, 0)
+        lsm._write_reg(FIFO_CTRL2, 0)
+        lsm._write_reg(FIFO_CTRL3, (code << 4) | code)
+        # bypass first to empty the FIFO, then continuous (oldest overwritten)
+        lsm._write_reg(FIFO_CTRL4, FIFO_MODE_BYPASS)
+        lsm._write_reg(FIFO_CTRL4, FIFO_MODE_CONTINUOUS)
+        self._have = 0
+        self._phase = 0
+
+    def pending_words(self):
+        self.lsm._read_reg_into(FIFO_STATUS1, self._status)
+        if self._status[1] & STATUS_OVERRUN:
+            self.overruns += 1
+        return self._status[0] | ((self._status[1] & 0x03) << 8)
+
+    def read(self, out, max_samples):
+        """Drain up to max_samples samples into `out` (array("h"), 6 per sample).
+
+        Returns (n, ticks_ms of the newest sample). Words beyond
+        max_samples stay in the FIFO for the next call.
+        """
+        words = self.pending_words()
+        t = ticks_ms()
+        n = 0
+        word = self._word
+        while words > 0 and n < max_samples:
+            self.lsm._read_reg_into(FIFO_DATA_OUT_TAG, word)
+            words -= 1
+            tag = word[0] >> 3
+            if tag == TAG_GYRO:
+                dst = self._gyro
+                self._have |= 1
+            elif tag == TAG_ACCEL:
+                dst = self._accel
+                self._have |= 2
+            else:
+                continue
+            dst[0] = _i16(word[1], word[2])
+            dst[1] = _i16(word[3], word[4])
+            dst[2] = _i16(word[5], word[6])
+            if self._have != 3:
+                continue
+            self._have = 0
+            self._phase += 1
+            if self._phase < self.decimate:
+                continue
+            self._phase = 0
+            k = 6 * n
+            out[k] = self._accel[0]
+            out[k + 1] = self._accel[1]
+            out[k + 2] = self._accel[2]
+            out[k + 3] = self._gyro[0]
+            out[k + 4] = self._gyro[1]
+            out[k + 5] = self._gyro[2]
+            n += 1
+        self.samples += n
+        if words > 1:
+            # stopped early: the newest sample taken is older than the read
+            t = ticks_add(t, -int((words >> 1) * 1000 / self.odr))
+        return n, t
+
+    def wait(self, out, count, max_count=None, poll_ms=2):
+        """Block until at least `count` samples are read, taking up to max_count.
+
+        Returns (n, ticks_ms of the newest sample). A caller that fell
+        behind gets everything that piled up in one go instead of
+        draining the backlog `count` samples at a time.
+        """
+        max_count = max_count or count
+        n = 0
+        t = ticks_ms()
+        view = memoryview(out)
+        while True:
+            got, t = self.read(view[6 * n:], max_count - n)
+            n += got
+            if n >= count:
+                return n, t
+            sleep_ms(poll_ms)
+
+    def offset_ms(self, k, n):
+        """Age of sample k of an n-sample read relative to the newest one."""
+        return int((n - 1 - k) * self.period_ms + 0.5)
+
+
+def _i16(lo, hi):
+    v = lo | (hi << 8)
+    return v - 65536 if v & 0x8000 else v
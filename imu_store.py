@@ -0,0 +1,277 @@
+# -----------------------------
+# BINARY IMU RECORDINGS (*.imu)
+# -----------------------------
+# Fixed-width records behind a self-describing header, so a recording is
+# opened with one np.memmap instead of a text parse.
+#
+#   bytes 0..7    FILE_MAGIC b"AIRJIMU\n"
+#   bytes 8..11   u32 little-endian: data offset (header size, multiple of 64)
+#   bytes 12..    JSON schema, space padded: version, columns (name, dtype,
+#                 shape), scale, label, side, created
+#   data offset   records, RECORD_DTYPE (20 bytes):
+#                   u32 t_ms    Nicla time.ticks_ms()
+#                   u16 seq     wire sample counter (or running index)
+#                   u8  side    0 left / 1 right
+#                   u8  flags   reserved
+#                   i16 raw[6]  ax, ay, az, gx, gy, gz in LSM6DSOX counts
+#
+# Raw counts are what the boards send (imu_protocol.py), so nothing is
+# lost; rows in g / dps are raw * scale. Records are appended one chunk
+# (CHUNK_RECORDS) at a time; a capture that dies mid-write is still
+# readable up to the last whole record. With a FlushThread the chunk
+# writes happen on a background thread instead of the receive loop.
+#
+#   python imu_store.py convert imu_data/*.csv   # write .imu next to each csv
+#   python imu_store.py info imu_data/*.imu
+
+import argparse
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from imu_protocol import SCALE, to_counts
+
+FILE_MAGIC = b"AIRJIMU\n"
+STORE_VERSION = 1
+ALIGN = 64
+CHUNK_RECORDS = 1024
+
+RECORD_DTYPE = np.dtype([
+    ("t_ms", "<u4"),
+    ("seq", "<u2"),
+    ("side", "u1"),
+    ("flags", "u1"),
+    ("raw", "<i2", (6,)),
+])
+
+NO_SIDE = 255
+
+
+class StoreError(ValueError):
+    pass
+
+
+def _columns(dtype: np.dtype):
+    return [[name, dtype[name].base.str, list(dtype[name].shape)] for name in dtype.names]
+
+
+def _dtype(columns) -> np.dtype:
+    return np.dtype([(name, base, tuple(shape)) for name, base, shape in columns])
+
+
+# -----------------------------
+# WRITE
+# -----------------------------
+class FlushThread:
+    """Writes full chunks for any number of RecordingWriters off the caller's thread."""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.chunks = 0
+        self.bytes = 0
+
+    def start(self) -> "FlushThread":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="imu-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, writer: "RecordingWriter", chunk: np.ndarray, n: int, close: bool = False) -> None:
+        self._queue.put((writer, chunk, n, close))
+
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            writer, chunk, n, close = item
+            writer._write(chunk, n)
+            if close:
+                writer._f.close()
+            self.chunks += 1
+            self.bytes += n * chunk.itemsize
+
+
+class RecordingWriter:
+    """Append-only writer; records are buffered and written a chunk at a time."""
+
+    def __init__(self, path, label: str, side: Optional[int] = None,
+                 chunk_records: int = CHUNK_RECORDS, flusher: Optional[FlushThread] = None):
+        self.path = Path(path)
+        self.label = label
+        self.side = side
+        self.flusher = flusher
+        meta = dict(version=STORE_VERSION, columns=_columns(RECORD_DTYPE),
+                    scale=[float(s) for s in SCALE], label=label, side=side,
+                    created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        schema = json.dumps(meta).encode()
+        offset = -(-(len(FILE_MAGIC) + 4 + len(schema)) // ALIGN) * ALIGN
+        header = FILE_MAGIC + offset.to_bytes(4, "little") + schema
+        self._f = open(self.path, "wb")
+        self._f.write(header.ljust(offset, b" "))
+        self._chunk_records = chunk_records
+        self._chunk = np.zeros(chunk_records, dtype=RECORD_DTYPE)
+        self._fill = 0
+        # chunks handed back by the flush thread, reused instead of reallocated
+        self._free = queue.SimpleQueue()
+        self.records = 0
+        self._closed = False
+
+    def append(self, ticks_ms, raw, seq=None, side: Optional[int] = None) -> None:
+        """ticks_ms (n,), raw (n, 6) int16 counts; seq is the first sample's counter."""
+        n = len(raw)
+        if seq is None:
+            seq = self.records
+        side = self.side if side is None else side
+        done = 0
+        while done < n:
+            k = min(n - done, len(self._chunk) - self._fill)
+            dst = self._chunk[self._fill:self._fill + k]
+            dst["t_ms"] = np.asarray(ticks_ms[done:done + k]) & 0xFFFFFFFF
+            dst["seq"] = (seq + done + np.arange(k)) & 0xFFFF
+            dst["side"] = NO_SIDE if side is None else side
+            dst["raw"] = raw[done:done + k]
+            self._fill += k
+            done += k
+            if self._fill == len(self._chunk):
+                self.flush()
+        self.records += n
+
+    def append_rows(self, ticks_ms, rows, seq=None, side: Optional[int] = None) -> None:
+        """Same as append() for rows in g / dps."""
+        self.append(ticks_ms, to_counts(rows), seq, side)
+
+    def flush(self, close: bool = False) -> None:
+        if self.flusher is None:
+            self._write(self._chunk, self._fill)
+            if close:
+                self._f.close()
+        else:
+            # hand the chunk over and keep filling a different one
+            self.flusher.submit(self, self._chunk, self._fill, close)
+            try:
+                self._chunk = self._free.get_nowait()
+            except queue.Empty:
+                self._chunk = np.zeros(self._chunk_records, dtype=RECORD_DTYPE)
+        self._fill = 0
+
+    def _write(self, chunk: np.ndarray, n: int) -> None:
+        if n:
+            self._f.write(chunk[:n])
+        self._f.flush()
+        if self.flusher is not None:
+            self._free.put(chunk)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self.flush(close=True)
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# -----------------------------
+# READ
+# -----------------------------
+class StoredRecording:
+    """meta (schema dict) + records (read-only memmap, zero records if empty)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            head = f.read(len(FILE_MAGIC) + 4)
+            if head[:len(FILE_MAGIC)] != FILE_MAGIC:
+                raise StoreError("%s is not an .imu recording" % self.path)
+            offset = int.from_bytes(head[len(FILE_MAGIC):], "little")
+            self.meta = json.loads(f.read(offset - len(head)).decode())
+        if self.meta.get("version") != STORE_VERSION:
+            raise StoreError("unsupported .imu version %r" % self.meta.get("version"))
+        dtype = _dtype(self.meta["columns"])
+        count = (self.path.stat().st_size - offset) // dtype.itemsize
+        if count:
+            self.records = np.memmap(self.path, dtype=dtype, mode="r", offset=offset,
+                                     shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+        self.scale = np.asarray(self.meta["scale"])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def label(self) -> str:
+        return self.meta["label"]
+
+    @property
+    def side(self) -> Optional[int]:
+        return self.meta["side"]
+
+    @property
+    def ticks_ms(self) -> np.ndarray:
+        return self.records["t_ms"]
+
+    @property
+    def raw(self) -> np.ndarray:
+        return self.records["raw"]
+
+    def rows(self) -> np.ndarray:
+        """(n, 6) float64 in g / dps (computed, not a view)."""
+        return self.raw * self.scale
+
+
+# -----------------------------
+# CSV CONVERSION
+# -----------------------------
+def convert_csv(csv_path, out_path=None) -> Path:
+    from imu_dataset import load_recording
+
+    rec = load_recording(csv_path)
+    out_path = Path(out_path) if out_path else rec.path.with_suffix(".imu")
+    with RecordingWriter(out_path, rec.label, rec.side) as w:
+        w.append_rows(rec.ticks_ms, rec.rows)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary .imu recordings")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="write a .imu next to each CSV recording")
+    conv.add_argument("files", nargs="+")
+    info = sub.add_parser("info", help="print the header and size of .imu files")
+    info.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    for p in args.files:
+        if args.cmd == "convert":
+            out = convert_csv(p)
+            print("%s -> %s (%d bytes, was %d)" % (p, out.name, out.stat().st_size,
+                                                  Path(p).stat().st_size))
+        else:
+            rec = StoredRecording(p)
+            t = rec.ticks_ms
+            span = (int(t[-1]) - int(t[0])) / 1000.0 if len(rec) else 0.0
+            print("%s: %d records, %.1f s, label=%s side=%s created=%s" % (
+                p, len(rec), span, rec.label, rec.side, rec.meta.get("created")))
+
+
+if __name__ == "__main__":
+    main()
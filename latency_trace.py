@@ -0,0 +1,123 @@
+# -----------------------------
+# PER-HIT LATENCY TRACING
+# -----------------------------
+# Every hit carries a HitTrace from the packet that caused it to the
+# mixer call. When the audio thread has played it, the tracer turns the
+# timestamps into per-stage durations and adds them to log-bucketed
+# histograms:
+#
+#   network    Nicla ticks_ms of the sample -> laptop receive, above the
+#              lowest delay seen so far on that stick (the two clocks are
+#              not synchronised, so this is delay beyond the best case:
+#              batching, Wi-Fi queueing, jitter)
+#   window     receive -> sample in ring buffer and motion stats
+#   gate       motion gate decision
+#   inference  tree evaluation
+#   dispatch   inference done -> audio thread picks it up -> play() returned
+#   total      receive -> play() returned
+#
+# dump() prints p50/p95/p99/max per stage; receivers call it on SIGUSR1
+# and on exit.
+
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+STAGES = ("network", "window", "gate", "inference", "dispatch", "total")
+
+BUCKETS_PER_DECADE = 20
+MIN_MS = 0.001          # first bucket edge; 7 decades up to 10 s
+N_BUCKETS = 7 * BUCKETS_PER_DECADE + 1
+
+
+def now() -> float:
+    return time.perf_counter()
+
+
+class HitTrace:
+    __slots__ = ("stick", "drum", "sensor_ms", "recv_ms", "host_ms", "flam", "intensity",
+                 "t_recv", "t_window", "t_gate", "t_infer", "t_trigger", "t_play")
+
+    def __init__(self, stick: int, drum: str, t_recv: float,
+                 sensor_ms: Optional[int] = None, recv_ms: Optional[float] = None):
+        self.stick = stick
+        self.drum = drum
+        self.sensor_ms = sensor_ms      # Nicla time.ticks_ms() of the sample
+        self.recv_ms = recv_ms          # laptop wall clock at receive, ms
+        self.host_ms = None             # sensor_ms on the laptop clock (clock_sync.py)
+        self.flam = False               # other stick hit within FLAM_MS
+        self.intensity = None           # largest |gyro| axis over the classified window, dps
+        self.t_recv = t_recv            # perf_counter() stamps from here on
+        self.t_window = None
+        self.t_gate = None
+        self.t_infer = None
+        self.t_trigger = None
+        self.t_play = None
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.n = 0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        if ms <= MIN_MS:
+            b = 0
+        else:
+            b = min(int(math.log10(ms / MIN_MS) * BUCKETS_PER_DECADE) + 1, N_BUCKETS - 1)
+        self.counts[b] += 1
+        self.n += 1
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p: float) -> float:
+        """Upper edge of the bucket holding the p-th percentile, in ms."""
+        if not self.n:
+            return 0.0
+        target = p / 100.0 * self.n
+        seen = 0
+        for b, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(MIN_MS * 10 ** (b / BUCKETS_PER_DECADE), self.max)
+        return self.max
+
+
+class LatencyTracer:
+    def __init__(self):
+        self.hist: Dict[str, LatencyHistogram] = {s: LatencyHistogram() for s in STAGES}
+        self._base_offset: Dict[int, float] = {}    # min(recv_ms - sensor_ms) per stick
+        self._lock = threading.Lock()
+
+    def observe_packet(self, stick: int, sensor_ms: int, recv_ms: float) -> None:
+        """Track the best-case clock offset from every packet, not only hits."""
+        off = recv_ms - sensor_ms
+        base = self._base_offset.get(stick)
+        if base is None or off < base:
+            self._base_offset[stick] = off
+
+    def record(self, tr: HitTrace) -> None:
+        with self._lock:
+            if tr.sensor_ms is not None and tr.recv_ms is not None:
+                base = self._base_offset.get(tr.stick)
+                if base is not None:
+                    self.hist["network"].add(tr.recv_ms - tr.sensor_ms - base)
+            last = tr.t_recv
+            for stage, t in (("window", tr.t_window), ("gate", tr.t_gate),
+                             ("inference", tr.t_infer), ("dispatch", tr.t_play)):
+                if t is not None:
+                    self.hist[stage].add((t - last) * 1000.0)
+                    last = t
+            if tr.t_play is not None:
+                self.hist["total"].add((tr.t_play - tr.t_recv) * 1000.0)
+
+    def dump(self) -> str:
+        lines = ["%-10s %7s %9s %9s %9s %9s" % ("stage", "n", "p50 ms", "p95 ms", "p99 ms", "max ms")]
+        with self._lock:
+            for stage in STAGES:
+                h = self.hist[stage]
+                lines.append("%-10s %7d %9.3f %9.3f %9.3f %9.3f" % (
+                    stage, h.n, h.percentile(50), h.percentile(95), h.percentile(99), h.max))
+        return "\n".join(lines)
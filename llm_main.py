@@ -1,11 +1,18 @@
+import hashlib
+import json
+import statistics
+import re
+import sqlite3
 import time
 import threading
-from typing import List, Literal, Optional
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple, get_args
 
 import instructor
 from openai import OpenAI
-from pydantic import BaseModel, conint
+from pydantic import BaseModel, ValidationError, conint
 import requests
+from requests.adapters import HTTPAdapter
 
 
 # -----------------------------
@@ -13,6 +20,15 @@ import requests
 # -----------------------------
 SELECTED_MODEL = "llama3.2:latest"
 OLLAMA_API_URL = "http://localhost:11434/v1"
+OLLAMA_NATIVE_URL = OLLAMA_API_URL.rsplit("/v1", 1)[0]
+# how long Ollama keeps the model loaded after each request; the keep-alive
+# thread re-arms it every KEEP_ALIVE_PING_S in case something resets it
+KEEP_ALIVE = "30m"
+KEEP_ALIVE_PING_S = 240
+TEMPERATURE = 0.2
+# stream the reply and start playing once STREAM_MIN_STEPS of the lane are in
+STREAM = True
+STREAM_MIN_STEPS = 4
 
 UI_ENDPOINT = "http://localhost:8000"
 
@@ -23,6 +39,7 @@ MAIN_LOOP_SLEEP = 0.005
 # 2) OUTPUT SCHEMA
 # -----------------------------
 Hit = Literal["HH", "SN", "KD", "CR", "-"]
+HITS = get_args(Hit)
 
 
 class DrumPattern(BaseModel):
@@ -47,6 +64,8 @@ class DrumPattern(BaseModel):
 # -----------------------------
 # 3) PROMPT
 # -----------------------------
+SYSTEM_PROMPT = "Return ONLY valid JSON."
+
 TASK_PROMPT = (
     "You are an offline drum tutor for a MONOPHONIC air-drum.\n"
     "User has ONLY 4 drum sounds: HH, SN, KD, CR.\n"
@@ -64,10 +83,82 @@ TASK_PROMPT = (
 # -----------------------------
 # 4) CLIENT SETUP
 # -----------------------------
-client = instructor.patch(
-    OpenAI(base_url=OLLAMA_API_URL, api_key="ollama"),
-    mode=instructor.Mode.JSON,
-)
+# One pooled connection per local server: the OpenAI client (httpx) keeps
+# its own connections to Ollama, `http` (requests) is used for the native
+# Ollama API and the UI.
+raw_client = OpenAI(base_url=OLLAMA_API_URL, api_key="ollama")
+client = instructor.patch(raw_client, mode=instructor.Mode.JSON)
+
+http = requests.Session()
+http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+
+class LatencyLog:
+    """Seconds per kind of request; the first one of each kind is the cold one."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, kind: str, seconds: float) -> None:
+        self.samples.setdefault(kind, []).append(seconds)
+
+    def report(self) -> str:
+        lines = []
+        for kind, xs in self.samples.items():
+            line = f"  {kind}: cold {xs[0] * 1000:.0f} ms"
+            if len(xs) > 1:
+                line += (f", warm median {statistics.median(xs[1:]) * 1000:.0f} ms"
+                         f" (n={len(xs) - 1})")
+            lines.append(line)
+        return "\n".join(lines) or "  no requests yet"
+
+
+latency = LatencyLog()
+
+
+# Model preload + keep-alive. Ollama loads a model on its first request
+# and unloads it after the keep_alive period, so the first 'gen' after a
+# launch (or a coffee break) paid for the load. preload_model() runs at
+# startup: it loads the model with KEEP_ALIVE and evaluates the system
+# prompt once, so Ollama's prompt cache already holds the shared prefix.
+# keep_alive_loop() then re-arms the keep_alive with an empty (load-only)
+# request every KEEP_ALIVE_PING_S.
+model_ready = threading.Event()
+
+
+def preload_model() -> None:
+    t0 = time.time()
+    try:
+        r = http.post(f"{OLLAMA_NATIVE_URL}/api/chat", json={
+            "model": SELECTED_MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT + STREAM_SCHEMA_PROMPT.format(
+                    schema=json.dumps(DrumPattern.model_json_schema()))},
+                {"role": "user", "content": "ping"},
+            ],
+            "stream": False,
+            "keep_alive": KEEP_ALIVE,
+            "options": {"num_predict": 1},
+        }, timeout=300)
+        r.raise_for_status()
+        load_s = r.json().get("load_duration", 0) / 1e9
+        took = time.time() - t0
+        latency.add("preload", took)
+        print(f"\n(model ready in {took:.1f} s, {load_s:.1f} s of it loading)")
+    except Exception as e:
+        print("\nWARNING: could not preload the model:", e)
+    finally:
+        model_ready.set()
+
+
+def keep_alive_loop() -> None:
+    while not state["quit"]:
+        time.sleep(KEEP_ALIVE_PING_S)
+        try:
+            http.post(f"{OLLAMA_NATIVE_URL}/api/generate",
+                      json={"model": SELECTED_MODEL, "keep_alive": KEEP_ALIVE}, timeout=300)
+        except Exception:
+            pass
 
 
 def generate_pattern(user_text: str) -> DrumPattern:
@@ -75,11 +166,12 @@ def generate_pattern(user_text: str) -> DrumPattern:
     return client.chat.completions.create(
         model=SELECTED_MODEL,
         messages=[
-            {"role": "system", "content": "Return ONLY valid JSON."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
         response_model=DrumPattern,
-        temperature=0.2,
+        temperature=TEMPERATURE,
+        extra_body={"keep_alive": KEEP_ALIVE},
     )
 
 
@@ -104,8 +196,273 @@ def step_delay_seconds(bpm: int) -> float:
     return 60.0 / (float(bpm) * 4.0)
 
 
+def apply_overrides(pat: DrumPattern) -> DrumPattern:
+    """Tutor overrides and auto-fixes (no validation)."""
+    # --- FORCE BPM = 60 ALWAYS ---
+    pat.bpm = 60
+    pat.bpm_source = "user_provided"
+    pat.confidence = 100
+
+    # --- FORCE CORRECT STEPS ---
+    pat.steps = EXPECTED_STEPS_16
+
+    # --- AUTO-FIX LANE TO 16 ---
+    if len(pat.lane) < 16:
+        pat.lane += ["-"] * (16 - len(pat.lane))
+    elif len(pat.lane) > 16:
+        pat.lane = pat.lane[:16]
+    return pat
+
+
+def finalize_pattern(pat: DrumPattern) -> DrumPattern:
+    """apply_overrides(), then validate (raises ValueError)."""
+    validate_pattern(apply_overrides(pat))
+    return pat
+
+
 # -----------------------------
-# 6) STATE
+# 6) STREAMING GENERATION
+# -----------------------------
+# stream_pattern() asks for the same JSON as generate_pattern(), but
+# without instructor and with stream=True, and LaneParser picks each
+# `lane` step out of the reply as soon as its closing quote arrives.
+# Once STREAM_MIN_STEPS are in, on_partial() gets a DrumPattern whose lane
+# holds the steps so far and "-" for the rest; the missing steps are then
+# written into that same list as they arrive, so the player (which reads
+# pat.lane[step] every step) picks them up without a restart. The tips
+# come last; the full reply is validated like generate_pattern()'s.
+STREAM_SCHEMA_PROMPT = (
+    "\nThe JSON must be an instance of this JSON schema (not the schema itself):\n"
+    "{schema}\n"
+)
+LANE_START = re.compile(r'"lane"\s*:\s*\[')
+LANE_ITEM = re.compile(r'\s*"([^"]*)"\s*([,\]])')
+STYLE_FIELD = re.compile(r'"song_or_style"\s*:\s*"([^"]*)"')
+
+
+class LaneParser:
+    """Incremental scan of a streamed DrumPattern JSON for its lane steps."""
+
+    def __init__(self):
+        self.text = ""
+        self.pos = None         # where the next lane item starts, once "lane": [ is seen
+        self.lane: List[str] = []
+        self.done = False
+
+    def feed(self, chunk: str) -> int:
+        """Add streamed text; returns how many lane steps it completed."""
+        self.text += chunk
+        if self.pos is None:
+            m = LANE_START.search(self.text)
+            if m is None:
+                return 0
+            self.pos = m.end()
+        before = len(self.lane)
+        while not self.done:
+            m = LANE_ITEM.match(self.text, self.pos)
+            if m is None:
+                break
+            hit = m.group(1).strip().upper()
+            self.lane.append(hit if hit in HITS else "-")
+            self.pos = m.end()
+            if m.group(2) == "]" or len(self.lane) == 16:
+                self.done = True
+        return len(self.lane) - before
+
+    def partial(self, user_text: str) -> DrumPattern:
+        m = STYLE_FIELD.search(self.text)
+        style = m.group(1) if m else user_text.strip()
+        pat = DrumPattern.model_construct(
+            title=style, song_or_style=style, bpm=0, steps=[],
+            lane=self.lane[:16] + ["-"] * (16 - len(self.lane)),
+            sections=[], tips=[],
+        )
+        return apply_overrides(pat)
+
+
+def stream_pattern(user_text: str, on_partial=None) -> DrumPattern:
+    """Streams the reply; on_partial(pattern) is called once, when the lane is usable."""
+    prompt = TASK_PROMPT.format(input_text=user_text.strip())
+    schema = json.dumps(DrumPattern.model_json_schema())
+    stream = raw_client.chat.completions.create(
+        model=SELECTED_MODEL,
+        messages=[
+            {"role": "system",
+             "content": SYSTEM_PROMPT + STREAM_SCHEMA_PROMPT.format(schema=schema)},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=TEMPERATURE,
+        response_format={"type": "json_object"},
+        stream=True,
+        extra_body={"keep_alive": KEEP_ALIVE},
+    )
+    parser = LaneParser()
+    partial = None
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta or not parser.feed(delta):
+            continue
+        if partial is not None:
+            n = min(len(parser.lane), 16)
+            partial.lane[:n] = parser.lane[:n]
+        elif on_partial is not None and (len(parser.lane) >= STREAM_MIN_STEPS or parser.done):
+            partial = parser.partial(user_text)
+            on_partial(partial)
+
+    pat = DrumPattern.model_validate_json(parser.text)
+    finalize_pattern(pat)
+    if partial is not None:
+        partial.lane[:] = pat.lane
+    return pat
+
+
+# -----------------------------
+# 7) PATTERN CACHE (DISK, LRU)
+# -----------------------------
+# Finished patterns are kept in a SQLite file next to this script, keyed
+# by the normalised request, model, temperature and PROMPT_VERSION, so a
+# style asked for before comes back in milliseconds, across restarts.
+# PROMPT_VERSION hashes the prompts (the streaming one included) and the
+# output schema: editing any of them starts a fresh set of keys. Past CACHE_MAX_ENTRIES / CACHE_MAX_BYTES
+# the least recently used patterns are dropped. 'warm' pre-generates
+# WARM_STYLES; 'regen' asks the model again and replaces the entry.
+CACHE_PATH = Path(__file__).resolve().with_name("pattern_cache.sqlite3")
+CACHE_MAX_ENTRIES = 500
+CACHE_MAX_BYTES = 2 << 20
+
+PROMPT_VERSION = hashlib.sha1(
+    (SYSTEM_PROMPT + TASK_PROMPT + STREAM_SCHEMA_PROMPT
+     + json.dumps(DrumPattern.model_json_schema(), sort_keys=True)).encode()
+).hexdigest()[:12]
+
+WARM_STYLES = [
+    "basic rock", "funk", "disco", "hip hop", "reggae", "punk",
+    "bossa nova", "shuffle", "jazz swing", "metal", "pop ballad", "house",
+]
+
+
+def normalize_request(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" .!?")
+
+
+class PatternCache:
+    def __init__(self, path=CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS patterns ("
+            " key TEXT PRIMARY KEY, request TEXT, model TEXT, temperature REAL,"
+            " prompt_version TEXT, pattern TEXT, created REAL, last_used REAL,"
+            " uses INTEGER)"
+        )
+        self.db.commit()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, model: str = SELECTED_MODEL, temperature: float = TEMPERATURE) -> str:
+        ident = [normalize_request(text), model, temperature, PROMPT_VERSION]
+        return hashlib.sha256(json.dumps(ident).encode()).hexdigest()
+
+    def get(self, text: str, model: str = SELECTED_MODEL,
+            temperature: float = TEMPERATURE) -> Optional[DrumPattern]:
+        k = self.key(text, model, temperature)
+        row = self.db.execute("SELECT pattern FROM patterns WHERE key = ?", (k,)).fetchone()
+        if row is not None:
+            try:
+                pat = DrumPattern.model_validate_json(row[0])
+            except ValidationError:
+                self.db.execute("DELETE FROM patterns WHERE key = ?", (k,))
+                pat = None
+            else:
+                self.db.execute("UPDATE patterns SET last_used = ?, uses = uses + 1 WHERE key = ?",
+                                (time.time(), k))
+            self.db.commit()
+            if pat is not None:
+                self.hits += 1
+                return pat
+        self.misses += 1
+        return None
+
+    def put(self, text: str, pat: DrumPattern, model: str = SELECTED_MODEL,
+            temperature: float = TEMPERATURE) -> None:
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO patterns VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (self.key(text, model, temperature), normalize_request(text), model,
+             temperature, PROMPT_VERSION, pat.model_dump_json(), now, now),
+        )
+        self._evict()
+        self.db.commit()
+
+    def _evict(self) -> None:
+        count, size = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(pattern)), 0) FROM patterns").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        drop = []
+        for k, n in self.db.execute(
+                "SELECT key, LENGTH(pattern) FROM patterns ORDER BY last_used ASC"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            drop.append((k,))
+            count -= 1
+            size -= n
+        self.db.executemany("DELETE FROM patterns WHERE key = ?", drop)
+
+    def clear(self) -> None:
+        self.db.execute("DELETE FROM patterns")
+        self.db.commit()
+
+    def stats(self) -> str:
+        count, size = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(pattern)), 0) FROM patterns").fetchone()
+        return "cache: %d patterns, %.1f KB, prompt %s, %d hits / %d misses this run" % (
+            count, size / 1024.0, PROMPT_VERSION, self.hits, self.misses)
+
+
+# opened by main(), so importing this module touches no files
+cache: Optional[PatternCache] = None
+
+
+def get_pattern(user_text: str, refresh: bool = False,
+                on_partial=None) -> Tuple[DrumPattern, bool]:
+    """Finished pattern for a request, and whether it came from the cache.
+
+    With on_partial (and STREAM on) a cache miss is streamed, see stream_pattern().
+    """
+    if not refresh and cache is not None:
+        pat = cache.get(user_text)
+        if pat is not None:
+            return pat, True
+    if STREAM and on_partial is not None:
+        pat = stream_pattern(user_text, on_partial)
+    else:
+        pat = finalize_pattern(generate_pattern(user_text))
+    if cache is not None:
+        cache.put(user_text, pat)
+    return pat, False
+
+
+def warm_cache(styles=WARM_STYLES) -> None:
+    for style in styles:
+        if cache.get(style) is not None:
+            print(f"  {style}: cached")
+            continue
+        t0 = time.time()
+        try:
+            get_pattern(style, refresh=True)
+            print(f"  {style}: generated in {time.time() - t0:.1f} s")
+        except Exception as e:
+            print(f"  {style}: failed ({e})")
+
+
+# -----------------------------
+# 8) STATE
 # -----------------------------
 state = {
     "pattern": None,
@@ -137,7 +494,7 @@ def stop_play():
 
 
 # -----------------------------
-# 7) PLAYER LOOP
+# 9) PLAYER LOOP
 # -----------------------------
 def player_loop():
     while not state["quit"]:
@@ -165,76 +522,98 @@ def player_loop():
 
 
 # -----------------------------
-# 8) SEND TO UI
+# 10) SEND TO UI
 # -----------------------------
 def send_to_ui(p: DrumPattern):
     try:
         payload = {"bpm": p.bpm, "lane": p.lane}
         print("Sending pattern to UI...")
-        r = requests.post(UI_ENDPOINT, json=payload, timeout=5)
+        t0 = time.time()
+        r = http.post(UI_ENDPOINT, json=payload, timeout=5)
+        latency.add("ui", time.time() - t0)
         print("UI response:", r.text)
     except Exception as e:
         print("WARNING: Could not send to UI:", e)
 
 
 # -----------------------------
-# 9) CLI
+# 11) CLI
 # -----------------------------
 HELP_TEXT = """
 Commands:
   gen
+  regen     (gen, skipping the pattern cache)
+  warm      (pre-generate common styles into the cache)
+  cache     (cache stats; 'cache clear' empties it)
   start
   stop
   reset
   show
+  latency   (cold vs warm request times)
   quit
 """
 
 
 def main():
+    global cache
+    cache = PatternCache()
+
     print("Edge LLM Drum Teacher")
     print(f"Model: {SELECTED_MODEL}")
     print(HELP_TEXT)
 
     threading.Thread(target=player_loop, daemon=True).start()
+    print("Loading the model...")
+    threading.Thread(target=preload_model, daemon=True).start()
+    threading.Thread(target=keep_alive_loop, daemon=True).start()
 
     while True:
         cmd = input("> ").strip().lower()
 
-        if cmd == "gen":
+        if cmd in ("gen", "regen"):
             user_text = input("Enter song name OR style:\n> ").strip()
             if not user_text:
                 print("Empty input.")
                 continue
 
+            if not model_ready.is_set():
+                print("Waiting for the model to load...")
+                model_ready.wait()
             print("Generating pattern...")
 
-            try:
-                pat = generate_pattern(user_text)
-
-                # --- FORCE BPM = 60 ALWAYS ---
-                pat.bpm = 60
-                pat.bpm_source = "user_provided"
-                pat.confidence = 100
-
-                # --- FORCE CORRECT STEPS ---
-                pat.steps = EXPECTED_STEPS_16
-
-                # --- AUTO-FIX LANE TO 16 ---
-                if len(pat.lane) < 16:
-                    pat.lane += ["-"] * (16 - len(pat.lane))
-                elif len(pat.lane) > 16:
-                    pat.lane = pat.lane[:16]
+            t0 = time.time()
+            prev = state["pattern"]
+            first_beat = []
 
-                validate_pattern(pat)
+            def on_partial(partial):
+                first_beat.append(time.time() - t0)
+                latency.add("first beat", first_beat[0])
+                state["pattern"] = partial
+                start_play()
+                print(f"(first beat after {first_beat[0]:.1f} s, "
+                      "playing while the rest streams in)")
+                send_to_ui(partial)
 
+            try:
+                pat, cached = get_pattern(user_text, refresh=(cmd == "regen"),
+                                          on_partial=on_partial)
             except Exception as e:
                 print("LLM/Validation error:", e)
+                if first_beat:
+                    stop_play()
+                    state["pattern"] = prev
                 continue
+            took = time.time() - t0
+            latency.add("cache hit" if cached else "pattern", took)
+            print(f"(from cache in {took * 1000:.0f} ms)" if cached
+                  else f"(generated in {took:.1f} s)")
 
+            # a streamed pattern is already playing: swap in the finished
+            # one without moving the playhead
             state["pattern"] = pat
-            stop_play()
-            reset_playhead()
+            if not first_beat:
+                stop_play()
+                reset_playhead()
 
             print("\nPattern ready:")
             print(f"Song/Style: {pat.song_or_style}")
@@ -244,7 +623,20 @@ def main():
 
             send_to_ui(pat)
 
-            print("Type 'start' to begin.\n")
+            if not first_beat:
+                print("Type 'start' to begin.\n")
+
+        elif cmd == "warm":
+            print(f"Warming the pattern cache ({len(WARM_STYLES)} styles)...")
+            warm_cache()
+            print(cache.stats())
+
+        elif cmd == "cache":
+            print(cache.stats())
+
+        elif cmd == "cache clear":
+            cache.clear()
+            print(cache.stats())
 
         elif cmd == "start":
             start_play()
@@ -261,10 +653,14 @@ def main():
             else:
                 print("No pattern loaded.")
 
+        elif cmd == "latency":
+            print(latency.report())
+
         elif cmd == "quit":
             state["quit"] = True
             stop_play()
             time.sleep(0.2)
+            print(latency.report())
             print("Bye.")
             break
 
@@ -0,0 +1,150 @@
+# -----------------------------
+# MOCK LSM6DSOX (LINUX)
+# -----------------------------
+# Register-level stand-in for the Nicla's lsm6dsox driver, enough to run
+# imu_sampler.FifoSampler (and the older direct OUTX_L_G burst read) on a
+# laptop. The FIFO fills in real time from time.monotonic()
+# at the configured batch rate, overwrites its oldest words when full
+# like the chip in continuous mode, and serves samples from a list of
+# raw count rows (ax, ay, az, gx, gy, gz), e.g. an imu_data recording.
+#
+#   python lsm6dsox_mock.py                      # 10 s drain demo with stalls
+#   python lsm6dsox_mock.py --stall-ms 150 imu_data/left_up_*.csv
+
+import argparse
+import math
+import random
+import struct
+import time
+from collections import deque
+
+from imu_sampler import (CTRL3_C, FIFO_CTRL3, FIFO_CTRL4, FIFO_DATA_OUT_TAG, FIFO_MODE_BYPASS,
+                         FIFO_MODE_CONTINUOUS, FIFO_STATUS1, ODR_CODES, STATUS_OVERRUN, TAG_ACCEL,
+                         TAG_GYRO, FifoSampler)
+
+OUTX_L_G = 0x22
+FIFO_WORDS = 512
+RATES = {code: hz for hz, code in ODR_CODES.items()}
+
+
+def synthetic_rows(n: int = 500):
+    """Slow swing on every axis, in raw counts."""
+    return [tuple(int(4000 * math.sin(2 * math.pi * (i / 50.0) + c)) for c in range(6))
+            for i in range(n)]
+
+
+class MockLSM6DSOX:
+    def __init__(self, rows=None):
+        self.rows = rows or synthetic_rows()
+        self.regs = bytearray(256)
+        self.regs[CTRL3_C] = 0x04
+        self.fifo = deque()
+        self.overrun = False
+        self._start = None
+        self._made = 0
+        self._next_row = 0
+
+    @classmethod
+    def from_recording(cls, path) -> "MockLSM6DSOX":
+        from imu_dataset import load_recording
+        from imu_protocol import to_counts
+
+        return cls([tuple(int(v) for v in r) for r in to_counts(load_recording(path).rows)])
+
+    # -------------------------
+    # driver interface
+    # -------------------------
+    def _read_reg(self, reg: int, size: int = 1) -> int:
+        return self.regs[reg]
+
+    def _write_reg(self, reg: int, val: int) -> None:
+        self.regs[reg] = val & 0xFF
+        if reg == FIFO_CTRL4:
+            mode = val & 0x07
+            if mode == FIFO_MODE_BYPASS:
+                self.fifo.clear()
+                self.overrun = False
+                self._start = None
+            elif mode == FIFO_MODE_CONTINUOUS:
+                self._start = time.monotonic()
+                self._made = 0
+
+    def _read_reg_into(self, reg: int, buf) -> None:
+        out = memoryview(buf).cast("B")
+        if reg == FIFO_STATUS1:
+            self._fill()
+            n = len(self.fifo)
+            out[0] = n & 0xFF
+            out[1] = ((n >> 8) & 0x03) | (STATUS_OVERRUN if self.overrun else 0)
+            self.overrun = False
+        elif reg == FIFO_DATA_OUT_TAG:
+            tag, values = self.fifo.popleft() if self.fifo else (0, (0, 0, 0))
+            out[0] = tag << 3
+            struct.pack_into("<3h", out, 1, *values)
+        elif reg == OUTX_L_G:
+            ax, ay, az, gx, gy, gz = self._row()
+            struct.pack_into("<6h", out, 0, gx, gy, gz, ax, ay, az)
+        else:
+            out[:] = self.regs[reg:reg + len(out)]
+
+    # -------------------------
+    # FIFO model
+    # -------------------------
+    def _row(self):
+        row = self.rows[self._next_row % len(self.rows)]
+        self._next_row += 1
+        return row
+
+    def _fill(self) -> None:
+        if self._start is None:
+            return
+        rate = RATES.get(self.regs[FIFO_CTRL3] & 0x0F)
+        if not rate:
+            return
+        due = int((time.monotonic() - self._start) * rate)
+        while self._made < due:
+            ax, ay, az, gx, gy, gz = self._row()
+            for word in ((TAG_GYRO, (gx, gy, gz)), (TAG_ACCEL, (ax, ay, az))):
+                if len(self.fifo) == FIFO_WORDS:
+                    self.fifo.popleft()
+                    self.overrun = True
+                self.fifo.append(word)
+            self._made += 1
+
+
+# -----------------------------
+# DEMO: drain under load
+# -----------------------------
+def main():
+    from array import array
+
+    parser = argparse.ArgumentParser(description="Run FifoSampler against the mock IMU")
+    parser.add_argument("recording", nargs="?", help="CSV/.imu recording to serve (default: synthetic)")
+    parser.add_argument("--odr", type=float, default=52)
+    parser.add_argument("--decimate", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=2, help="samples to wait for per read")
+    parser.add_argument("--max-batch", type=int, default=16, help="samples taken per read at most")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--stall-ms", type=int, default=60,
+                        help="worst-case extra work per loop (Wi-Fi send, inference)")
+    args = parser.parse_args()
+
+    lsm = MockLSM6DSOX.from_recording(args.recording) if args.recording else MockLSM6DSOX()
+    odr = int(args.odr) if args.odr == int(args.odr) else args.odr
+    sampler = FifoSampler(lsm, odr, args.decimate)
+    raw = array("h", [0] * 6 * args.max_batch)
+    start = time.monotonic()
+    loops = 0
+    while time.monotonic() - start < args.seconds:
+        sampler.wait(raw, args.batch, args.max_batch)
+        loops += 1
+        time.sleep(random.uniform(0, args.stall_ms) / 1000.0)
+    elapsed = time.monotonic() - start
+    expected = elapsed * sampler.rate
+    print("%.1f s: %d samples in %d reads, expected %.0f at %.1f Hz (%.1f%%), overruns %d" % (
+        elapsed, sampler.samples, loops, expected, sampler.rate,
+        100.0 * sampler.samples / expected, sampler.overruns))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@
 import network, time, socket
 from machine import Pin, SPI, LED
 from lsm6dsox import LSM6DSOX
-from collections import deque
+from array import array
+from imu_sampler import FifoSampler
 
 # -----------------------------
 # WIFI CONFIG
@@ -25,6 +26,37 @@ FEATURES      = 6
 VAR_THRESHOLD = 60
 COOLDOWN_MS   = 80
 
+# FIFO sampling (imu_sampler.py): the IMU paces the samples, the loop
+# takes whatever has arrived, up to MAX_BATCH at a time
+ODR_HZ      = 52
+DECIMATE    = 1
+MAX_BATCH   = 8
+ACCEL_SCALE = 4 / 32768       # lsm6dsox driver defaults: 4 g, 2000 dps
+GYRO_SCALE  = 2000 / 32768
+
+# -----------------------------
+# INFERENCE SCHEDULE
+# -----------------------------
+# "every":  tree on every sample, gate checked afterwards (original)
+# "gated":  gate first, tree only on moving samples
+# "stride": gated, and at most once every INFER_STRIDE samples
+# "burst":  tree on the first BURST_SAMPLES moving samples of each
+#           motion, then idle until the stick has been still again
+INFER_MODE    = "gated"
+INFER_STRIDE  = 3
+BURST_SAMPLES = 8
+STATS_EVERY   = 500     # samples between "infer x / y" prints
+
+# "stick":   the raw-window tree below, reading the buffer in place
+# "compact": score_L_compact from compact_trees_edge.py (train_trees.py;
+#            copy it to the board), on 30 features computed from the same
+#            buffer. Same classes as score_L_stick. train_trees.py fits the
+#            edge trees on row-gated windows (EDGE_GATE), this firmware's gate.
+MODEL = "stick"
+if MODEL == "compact":
+    from compact_trees_edge import FEATURES as COMPACT_FEATURES
+    from compact_trees_edge import window_features, score_L_compact
+
 # -----------------------------
 # LEDS
 # -----------------------------
@@ -63,23 +95,23 @@ def row_variation(row):
 # -----------------------------
 # DECISION TREE (LEFT)
 # -----------------------------
-def score_L_stick(input):
-    if input[278] <= -0.1757199987769127:
-        if input[188] <= 0.15112300217151642:
+def score_L_stick(input, b=0):
+    if input[b + 278] <= -0.1757199987769127:
+        if input[b + 188] <= 0.15112300217151642:
             return [0.0, 1.0, 0.0]
         else:
             return [1.0, 0.0, 0.0]
     else:
-        if input[108] <= 0.6574095189571381:
-            if input[80] <= 0.08630399778485298:
+        if input[b + 108] <= 0.6574095189571381:
+            if input[b + 80] <= 0.08630399778485298:
                 return [0.0, 0.4, 0.6]
             else:
                 return [0.0, 0.0, 1.0]
         else:
-            if input[12] <= 0.6967165172100067:
+            if input[b + 12] <= 0.6967165172100067:
                 return [0.0, 0.2857142857142857, 0.7142857142857143]
             else:
-                if input[67] <= -0.3919675052165985:
+                if input[b + 67] <= -0.3919675052165985:
                     return [0.4, 0.6, 0.0]
                 else:
                     return [1.0, 0.0, 0.0]
@@ -93,56 +125,100 @@ def imu_data():
     spi = SPI(5)
     cs  = Pin("PF6", Pin.OUT_PP, Pin.PULL_UP)
     lsm = LSM6DSOX(spi, cs)
-
-    window = deque([], WINDOW_SIZE)
-
-    # Preallocate flat input vector (300)
-    input_vector = [0.0] * (WINDOW_SIZE * FEATURES)
+    sampler = FifoSampler(lsm, ODR_HZ, DECIMATE)
+    raw = array("h", [0] * 6 * MAX_BATCH)
+
+    # Mirrored flat window (2 x 300): sample i is stored at row i and at
+    # row i + WINDOW_SIZE, so the newest 50 rows always start at
+    # buf[head * FEATURES] and the tree reads its few cells in place -
+    # no per-sample flatten of 300 values.
+    buf = [0.0] * (2 * WINDOW_SIZE * FEATURES)
+    mirror = WINDOW_SIZE * FEATURES
+    head = 0
+    count = 0
 
     last_sent = 0
 
+    # scheduler state
+    since_infer = INFER_STRIDE
+    burst_left = BURST_SAMPLES
+    samples = 0
+    inferences = 0
+    feats = [0.0] * COMPACT_FEATURES if MODEL == "compact" else None
+
     while True:
-        ax, ay, az = lsm.accel()
-        gx, gy, gz = lsm.gyro()
-        row = [ax, ay, az, gx, gy, gz]
-
-        window.append(row)
-
-        # Only proceed once window is full
-        if len(window) == WINDOW_SIZE:
-
-            # ---- flatten 50 x 6 → 300 ----
-            k = 0
-            for r in window:
-                for v in r:
-                    input_vector[k] = v
-                    k += 1
-
-            # ---- model inference ----
-            output = score_L_stick(input_vector)
-
-            # ---- motion gate AFTER inference ----
-            if row_variation(row) > VAR_THRESHOLD:
-
-                # argmax (MicroPython-safe)
-                predicted = 0
-                best = output[0]
-                i = 1
-                while i < 3:
-                    if output[i] > best:
-                        best = output[i]
-                        predicted = i
-                    i += 1
-
-                # cooldown gate
-                now = time.ticks_ms()
-                if time.ticks_diff(now, last_sent) > COOLDOWN_MS:
-                    packet = "0,%d" % predicted
-                    client.sendto(packet.encode(), (PC_IP, PORT))
-                    last_sent = now
-                    print("Sent:", packet)
-
-        time.sleep_ms(20)
+        n, t_last = sampler.wait(raw, 1, MAX_BATCH)
+        s = 0
+        while s < n:
+            i = 6 * s
+            s += 1
+            row = [raw[i] * ACCEL_SCALE, raw[i + 1] * ACCEL_SCALE, raw[i + 2] * ACCEL_SCALE,
+                   raw[i + 3] * GYRO_SCALE, raw[i + 4] * GYRO_SCALE, raw[i + 5] * GYRO_SCALE]
+
+            k = head * FEATURES
+            i = 0
+            while i < FEATURES:
+                buf[k + i] = row[i]
+                buf[k + mirror + i] = row[i]
+                i += 1
+            head += 1
+            if head == WINDOW_SIZE:
+                head = 0
+            if count < WINDOW_SIZE:
+                count += 1
+
+            samples += 1
+            since_infer += 1
+
+            # Only proceed once window is full
+            if count == WINDOW_SIZE:
+
+                # ---- gate + schedule BEFORE inference ----
+                moving = row_variation(row) > VAR_THRESHOLD
+                if INFER_MODE == "every":
+                    run = True
+                elif not moving:
+                    run = False
+                    burst_left = BURST_SAMPLES
+                elif INFER_MODE == "stride":
+                    run = since_infer >= INFER_STRIDE
+                elif INFER_MODE == "burst":
+                    run = burst_left > 0
+                    burst_left -= 1
+                else:
+                    run = True
+
+                if run:
+                    # ---- model inference (oldest row is at `head`) ----
+                    if MODEL == "compact":
+                        output = score_L_compact(window_features(buf, head * FEATURES, feats))
+                    else:
+                        output = score_L_stick(buf, head * FEATURES)
+                    since_infer = 0
+                    inferences += 1
+
+                if run and moving:
+
+                    # argmax (MicroPython-safe)
+                    predicted = 0
+                    best = output[0]
+                    i = 1
+                    while i < 3:
+                        if output[i] > best:
+                            best = output[i]
+                            predicted = i
+                        i += 1
+
+                    # cooldown gate
+                    now = time.ticks_ms()
+                    if time.ticks_diff(now, last_sent) > COOLDOWN_MS:
+                        packet = "0,%d" % predicted
+                        client.sendto(packet.encode(), (PC_IP, PORT))
+                        last_sent = now
+                        print("Sent:", packet)
+
+            if samples % STATS_EVERY == 0:
+                print("infer %d / %d samples (%s, %s)" % (inferences, samples, INFER_MODE, MODEL))
 # -----------------------------
 # WIFI CHECK (ORIGINAL STYLE)
 # -----------------------------
@@ -7,9 +7,11 @@
 # This example shows how to connect to a WiFi network.
 # and sends the imu data to the host network
 
-import network, time, socket
+import network, time, socket, struct
+from array import array
 from machine import Pin, SPI, LED
 from lsm6dsox import LSM6DSOX
+from imu_sampler import FifoSampler
 
 SSID = "Galaxy"  # Network SSID
 KEY = "bhavik115"  # Network key
@@ -30,28 +32,56 @@ client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 PC_IP = "10.216.155.96"
 PORT = 5005
 
+# Binary frame, see imu_protocol.py on the laptop side
+STICK = 1        # 0 = left, 1 = right
+MAGIC = 0xAD
+VERSION = 1
+HEADER_FMT = "<BBBBHI"   # magic, version, stick, count, seq, t0_ms
+SAMPLE_FMT = "<H6h"      # dt_ms, ax, ay, az, gx, gy, gz (raw counts)
+HEADER_SIZE = 10
+SAMPLE_SIZE = 14
+# samples per datagram: fewer packets on air, but the first sample of a
+# batch waits (BATCH - 1) sample periods before it is sent
+BATCH = 2
+# a loop that ran late sends everything the FIFO collected, up to this many
+MAX_BATCH = 8
+# sampling is paced by the IMU's FIFO at this ODR (imu_sampler.py), not
+# by sleep_ms; 52 Hz is the chip's nearest step to 50 Hz
+ODR_HZ = 52
+DECIMATE = 1
+
 def imu_data():
     print('Now collecting the IMU data')
     spi = SPI(5)
     cs = Pin("PF6", Pin.OUT_PP, Pin.PULL_UP)
     lsm = LSM6DSOX(spi, cs)
 
-    print("Timestamp,Ax,Ay,Az,Gx,Gy,Gz")
-
-    while(True):
-        a = lsm.accel()  # Returns (x, y, z)
-        g = lsm.gyro()   # Returns (x, y, z)
-        ts = time.ticks_ms()
+    sampler = FifoSampler(lsm, ODR_HZ, DECIMATE)
 
-        # Format for terminal/Excel
-        data = "%d, %f, %f, %f, %f, %f, %f, %f" % (ts,1,
-        a[0], a[1], a[2],
-        g[0], g[1], g[2])
+    raw = array("h", [0] * 6 * MAX_BATCH)   # ax, ay, az, gx, gy, gz per sample
+    frame = bytearray(HEADER_SIZE + MAX_BATCH * SAMPLE_SIZE)
+    seq = 0
 
-        print(data)
+    while(True):
+        # blocks until BATCH samples are in the FIFO; the IMU keeps sampling
+        # at ODR_HZ while we format and send
+        n, t_last = sampler.wait(raw, BATCH, MAX_BATCH)
+        t0 = time.ticks_add(t_last, -sampler.offset_ms(0, n))
 
-        client.sendto(data.encode(), (PC_IP, PORT))
-        time.sleep_ms(20)
+        for k in range(n):
+            i = 6 * k
+            struct.pack_into(SAMPLE_FMT, frame, HEADER_SIZE + k * SAMPLE_SIZE,
+                             int(k * sampler.period_ms + 0.5),
+                             raw[i], raw[i + 1], raw[i + 2], raw[i + 3], raw[i + 4], raw[i + 5])
+        struct.pack_into(HEADER_FMT, frame, 0,
+                         MAGIC, VERSION, STICK, n, seq & 0xFFFF, t0)
+        try:
+            client.sendto(memoryview(frame)[:HEADER_SIZE + n * SAMPLE_SIZE], (PC_IP, PORT))
+        except OSError:
+            pass    # Wi-Fi buffer full: the receiver sees it as a seq gap
+        # seq counts samples taken, not samples sent, so drops on the
+        # board show up as gaps on the laptop too
+        seq += n
 
 if wlan.isconnected() == False:
     print('Failed to connect to Wi-Fi')
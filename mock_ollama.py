@@ -0,0 +1,202 @@
+# -----------------------------
+# MOCK OLLAMA (OpenAI-compatible)
+# -----------------------------
+# A stand-in for `ollama serve` to test the tutor without a GPU:
+# POST /v1/chat/completions answers with a canned DrumPattern for the
+# requested style, either as one JSON reply or, with "stream": true, as
+# server-sent events, one token every TOKEN_S after FIRST_TOKEN_S of
+# "prompt evaluation". That is enough to compare time-to-first-beat of
+# llm_main.py's streaming and blocking paths.
+#
+# It also plays Ollama's model residency: the first request, or the first
+# after the model's keep_alive ran out (default 5m, or the request's
+# "keep_alive"), waits LOAD_S for the "model load". The native
+# /api/generate and /api/chat (non-streaming) are there for the tutor's
+# preload and keep-alive requests.
+#
+#   python mock_ollama.py --port 11434 --token-s 0.03 --load-s 3
+#   python llm_main.py        # gen -> "basic rock"
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIRST_TOKEN_S = 0.4
+TOKEN_S = 0.03
+LOAD_S = 3.0
+KEEP_ALIVE_S = 300.0
+
+LANE = ["KD", "-", "HH", "-", "SN", "-", "HH", "-",
+        "KD", "-", "KD", "HH", "SN", "-", "HH", "-"]
+STEPS = ["1", "e", "&", "a", "2", "e", "&", "a", "3", "e", "&", "a", "4", "e", "&", "a"]
+# roughly what a llama tokenizer does to JSON: words, numbers, punctuation
+TOKEN = re.compile(r'\s*(?:\w+|[^\w\s]+)')
+
+
+def canned_pattern(user_text: str) -> dict:
+    style = user_text.rsplit("User request:", 1)[-1].strip() or "basic rock"
+    return dict(
+        title=style.title() + " Groove", song_or_style=style, bpm=100,
+        bpm_source="default", confidence=60, time_signature="4/4", resolution="16th",
+        steps=STEPS, lane=LANE, loop_bars=1, sections=["groove"],
+        tips=["Keep the hi-hat even.", "Land the snare on 2 and 4.",
+              "Start slow, then speed up."],
+    )
+
+
+def tokens(text: str):
+    return TOKEN.findall(text)
+
+
+def parse_keep_alive(value, default: float = KEEP_ALIVE_S) -> float:
+    """Ollama's keep_alive: seconds, or "30s" / "5m" / "1h"; negative = forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        m = re.fullmatch(r"\s*(-?[\d.]+)\s*([smh]?)\s*", str(value))
+        if m is None:
+            return default
+        seconds = float(m.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[m.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+class Residency:
+    """When the mock model was last used and how long it stays loaded."""
+
+    def __init__(self, load_s: float = LOAD_S):
+        self.load_s = load_s
+        self.expires = 0.0
+        self.loads = 0
+        self._lock = threading.Lock()
+
+    def use(self, keep_alive) -> float:
+        """Waits for a load if the model is not resident; returns the load time."""
+        with self._lock:
+            now = time.time()
+            load = 0.0
+            if now >= self.expires:
+                time.sleep(self.load_s)
+                load = self.load_s
+                self.loads += 1
+            self.expires = time.time() + parse_keep_alive(keep_alive)
+            return load
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    first_token_s = FIRST_TOKEN_S
+    token_s = TOKEN_S
+    residency = Residency()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, code: int, obj) -> None:
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": "llama3.2:latest",
+                                                         "object": "model"}]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = req.get("model", "llama3.2:latest")
+        if path in ("/api/generate", "/api/chat"):
+            self._native(path, req, model)
+            return
+        if path != "/v1/chat/completions":
+            self._json(404, {"error": "not found"})
+            return
+        user = next((m["content"] for m in reversed(req.get("messages", []))
+                     if m.get("role") == "user"), "")
+        text = json.dumps(canned_pattern(user), indent=2)
+        rid = "chatcmpl-" + uuid.uuid4().hex[:12]
+        self.residency.use(req.get("keep_alive"))
+        time.sleep(self.first_token_s)
+
+        if not req.get("stream"):
+            time.sleep(self.token_s * len(tokens(text)))
+            self._json(200, {
+                "id": rid, "object": "chat.completion", "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(delta, finish=None):
+            chunk = {"id": rid, "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for tok in tokens(text):
+            event({"content": tok})
+            time.sleep(self.token_s)
+        event({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _native(self, path: str, req, model: str) -> None:
+        """Non-streaming /api/generate and /api/chat; an empty prompt only loads."""
+        load = self.residency.use(req.get("keep_alive"))
+        empty = path == "/api/generate" and not req.get("prompt")
+        if not empty:
+            time.sleep(self.first_token_s)
+        out = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+               "done": True, "load_duration": int(load * 1e9)}
+        if path == "/api/chat":
+            out["message"] = {"role": "assistant", "content": "" if empty else "{}"}
+        else:
+            out["response"] = "" if empty else "{}"
+        self._json(200, out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama (OpenAI API) for the LLM tutor")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--first-token-s", type=float, default=FIRST_TOKEN_S)
+    parser.add_argument("--token-s", type=float, default=TOKEN_S)
+    parser.add_argument("--load-s", type=float, default=LOAD_S,
+                        help="model load time when the model is not resident")
+    args = parser.parse_args()
+
+    Handler.first_token_s = args.first_token_s
+    Handler.token_s = args.token_s
+    Handler.residency = Residency(args.load_s)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print("mock ollama on http://%s:%d/v1 (load %.1f s, first token %.2f s, %.0f ms/token)" % (
+        args.host, args.port, args.load_s, args.first_token_s, args.token_s * 1000))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# -----------------------------
+# MODEL REGISTRY / ENSEMBLE
+# -----------------------------
+# Several candidate trees per stick, evaluated on the same window in one
+# pass. The gate still runs once per sample, and a window that passes it
+# is read by every member straight from the ring buffer (sparse reads for
+# raw-window trees; the compact features are computed once and shared by
+# all feature trees). The members are then combined:
+#
+#   active   play the first (active) member, the rest run in shadow
+#            after the hit: predict_class_from() evaluates only the active
+#            tree and keeps a copy of the window; run_shadows() (called by
+#            the receiver once the sound is dispatched) scores the others
+#   vote     weighted vote over each member's drum
+#   mean     weighted average of the class distributions, per drum
+#
+# Members can have different class sets (score_l_new has 2 classes,
+# score_L 3), so everything is combined in drum space: ModelEnsemble's
+# own classes are the union of the members' drums, and it plugs into
+# StickPipeline like a single tree (predict_class_from + class_drums).
+# Ties go to the active member's drum.
+#
+# Every evaluation can go to a ShadowLog (one JSON line: time, stick,
+# what played, what each member said), and report() prints how often
+# each member agreed with what played.
+
+import json
+import time
+from collections import deque
+from typing import Dict, Optional, Sequence, Tuple
+
+from ring_buffer import WINDOW_SIZE, FEATURES_PER_ROW
+from window_features import FeatureModel, window_features
+
+ENSEMBLE_MODES = ("active", "vote", "mean")
+ENSEMBLE_MODE = "active"
+SHADOW_PENDING = 64         # windows waiting for run_shadows(); older ones are dropped
+WINDOW_CELLS = WINDOW_SIZE * FEATURES_PER_ROW
+
+
+class ShadowLog:
+    """Appends one JSON line per ensemble evaluation."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a", buffering=1 << 16)
+        self.lines = 0
+
+    def write(self, stick: int, played, members: Dict[str, Optional[str]]) -> None:
+        self._f.write(json.dumps(dict(t=round(time.time(), 3), stick=stick,
+                                      played=played, models=members)) + "\n")
+        self.lines += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ModelRegistry:
+    """models: name -> tree; specs: name -> (stick, drum per class)."""
+
+    def __init__(self, models, specs: Dict[str, Tuple[int, Sequence[Optional[str]]]]):
+        self.models = {k: v for k, v in models.items() if k in specs}
+        self.specs = {k: v for k, v in specs.items() if k in self.models}
+
+    def names(self, stick: Optional[int] = None):
+        return sorted(k for k, (s, _) in self.specs.items() if stick is None or s == stick)
+
+    def ensemble(self, stick: int, names: Sequence[str], mode: str = ENSEMBLE_MODE,
+                 weights: Optional[Sequence[float]] = None,
+                 log: Optional[ShadowLog] = None) -> "ModelEnsemble":
+        for name in names:
+            if self.specs.get(name, (None,))[0] != stick:
+                raise KeyError("%s is not a model for stick %d" % (name, stick))
+        members = [(name, self.models[name], self.specs[name][1]) for name in names]
+        return ModelEnsemble(stick, members, mode, weights, log)
+
+
+class ModelEnsemble:
+    """members: (name, tree, drum per class), active member first."""
+
+    def __init__(self, stick: int, members, mode: str = ENSEMBLE_MODE,
+                 weights: Optional[Sequence[float]] = None, log: Optional[ShadowLog] = None):
+        if mode not in ENSEMBLE_MODES:
+            raise ValueError("unknown ensemble mode %r" % mode)
+        if not members:
+            raise ValueError("an ensemble needs at least one model")
+        self.stick = stick
+        self.mode = mode
+        self.log = log
+        self.names = [name for name, _, _ in members]
+        self.weights = list(weights) if weights is not None else [1.0] * len(members)
+
+        drums = []
+        for _, _, class_drums in members:
+            for d in class_drums:
+                if d not in drums:
+                    drums.append(d)
+        self.class_drums = tuple(drums)
+        # per member: is it a feature tree, the tree itself, class -> drum index
+        self._members = [
+            (isinstance(model, FeatureModel), getattr(model, "tree", model),
+             [drums.index(d) for d in class_drums])
+            for _, model, class_drums in members
+        ]
+        self._pairs = list(zip(self._members, self.weights))
+        self.deferred = mode == "active" and len(members) > 1
+        self._pending = deque(maxlen=SHADOW_PENDING)   # (window copy, played index)
+        self.shadow_dropped = 0
+        self.evaluations = 0
+        self.agree = [0] * len(members)
+
+    def __repr__(self) -> str:
+        return "<ModelEnsemble stick %d %s: %s>" % (self.stick, self.mode, ", ".join(self.names))
+
+    def _picks(self, pairs, buf, base: int):
+        """Each member's drum index, and the vote/mean scores, for buf[base:]."""
+        picks = []
+        scores = [0.0] * len(self.class_drums)
+        feats = None
+        for (is_feature, tree, drum_index), w in pairs:
+            if is_feature:
+                if feats is None:
+                    feats = window_features(buf[base:base + WINDOW_CELLS])[0]
+                dist = tree.predict(feats)
+            else:
+                dist = tree.predict_from(buf, base)
+            pick = drum_index[dist.index(max(dist))]
+            picks.append(pick)
+            if self.mode == "mean":
+                for c, p in enumerate(dist):
+                    scores[drum_index[c]] += w * p
+            elif self.mode == "vote":
+                scores[pick] += w
+        return picks, scores
+
+    def predict_class_from(self, buf, base: int) -> int:
+        """Index into class_drums for the window at buf[base:]."""
+        if self.deferred:
+            out = self._picks(self._pairs[:1], buf, base)[0][0]
+            if len(self._pending) == SHADOW_PENDING:
+                self.shadow_dropped += 1
+            self._pending.append((buf[base:base + WINDOW_CELLS].copy(), out))
+            return out
+
+        picks, scores = self._picks(self._pairs, buf, base)
+        out = picks[0]
+        if self.mode != "active":
+            best = max(scores)
+            if scores[out] < best:
+                out = scores.index(best)
+        self._record(picks, out)
+        return out
+
+    def run_shadows(self) -> None:
+        """Score the shadow members on the windows the active one already played."""
+        while self._pending:
+            window, out = self._pending.popleft()
+            self._record([out] + self._picks(self._pairs[1:], window, 0)[0], out)
+
+    def _record(self, picks, out: int) -> None:
+        self.evaluations += 1
+        for i, pick in enumerate(picks):
+            if pick == out:
+                self.agree[i] += 1
+        if self.log is not None:
+            drums = self.class_drums
+            self.log.write(self.stick, drums[out],
+                           {name: drums[p] for name, p in zip(self.names, picks)})
+
+    def report(self) -> str:
+        if len(self.names) == 1 or not self.evaluations:
+            return ""
+        dropped = " (%d shadow windows dropped)" % self.shadow_dropped if self.shadow_dropped else ""
+        return "%s %s%s" % (self.mode, " ".join(
+            "%s=%.0f%%" % (name, 100.0 * a / self.evaluations)
+            for name, a in zip(self.names, self.agree)), dropped)
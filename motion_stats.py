@@ -0,0 +1,148 @@
+# -----------------------------
+# STREAMING MOTION STATISTICS
+# -----------------------------
+# O(1)-per-sample replacement for window_variation()/row_variation().
+#
+# For each channel the window keeps running totals that are updated as a
+# sample enters and the oldest one leaves:
+#   - sum of |x[t] - x[t-1]| over the window  (window_variation)
+#   - sum and sum of squares                   (sliding-window variance)
+#   - peak |x| via a monotonic queue           (amortised O(1))
+# row_variation of the newest sample is computed once per push and cached.
+#
+# Running float sums drift slowly, so every RESYNC_WRAPS trips around the
+# ring the totals are rebuilt from the stored samples.
+
+from collections import deque
+from typing import List
+
+WINDOW_SIZE = 50
+FEATURES_PER_ROW = 6
+RESYNC_WRAPS = 20
+
+
+def row_variation(row) -> float:
+    total = 0.0
+    prev = row[0]
+    for i in range(1, len(row)):
+        v = row[i]
+        total += abs(v - prev)
+        prev = v
+    return total
+
+
+class MotionStats:
+    def __init__(self, size: int = WINDOW_SIZE, channels: int = FEATURES_PER_ROW):
+        self.size = size
+        self.channels = channels
+        self._values = [[0.0] * channels for _ in range(size)]
+        self._diffs = [[0.0] * channels for _ in range(size)]
+        self._peaks = [deque() for _ in range(channels)]
+        self.clear()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def clear(self) -> None:
+        c = self.channels
+        self.count = 0
+        self._head = 0
+        self._n = 0          # samples pushed since clear, used to expire peaks
+        self._wraps = 0
+        self._last = None
+        self.sum = [0.0] * c
+        self.sumsq = [0.0] * c
+        self.absdiff = [0.0] * c
+        self.row_var = 0.0
+        for q in self._peaks:
+            q.clear()
+
+    # -------------------------
+    # update
+    # -------------------------
+    def push(self, row) -> None:
+        size, h = self.size, self._head
+        old = self._values[h]
+        old_d = self._diffs[h]
+        full = self.count == size
+        # when the oldest sample leaves, the diff that linked it to the
+        # next one leaves too; that diff is stored on the next slot
+        nxt_d = self._diffs[h + 1 if h + 1 < size else 0] if full else None
+
+        s, sq, ad = self.sum, self.sumsq, self.absdiff
+        last = self._last
+        for c in range(self.channels):
+            v = float(row[c])
+            if full:
+                o = old[c]
+                s[c] -= o
+                sq[c] -= o * o
+                ad[c] -= nxt_d[c]
+            d = abs(v - last[c]) if last is not None else 0.0
+            s[c] += v
+            sq[c] += v * v
+            ad[c] += d
+            old[c] = v
+            old_d[c] = d
+
+        if full:
+            # slot h+1 is now the oldest; it no longer has a predecessor
+            for c in range(self.channels):
+                nxt_d[c] = 0.0
+        else:
+            self.count += 1
+
+        # peaks: drop dominated tail entries, expire the head
+        n = self._n
+        for c in range(self.channels):
+            q = self._peaks[c]
+            a = abs(old[c])
+            while q and q[-1][1] <= a:
+                q.pop()
+            q.append((n, a))
+            if q[0][0] <= n - size:
+                q.popleft()
+        self._n = n + 1
+
+        self._last = old
+        self.row_var = row_variation(old)
+
+        h += 1
+        if h == size:
+            h = 0
+            self._wraps += 1
+            if self._wraps % RESYNC_WRAPS == 0:
+                self._resync()
+        self._head = h
+
+    def _resync(self) -> None:
+        c_range = range(self.channels)
+        self.sum = [sum(r[c] for r in self._values) for c in c_range]
+        self.sumsq = [sum(r[c] * r[c] for r in self._values) for c in c_range]
+        self.absdiff = [sum(r[c] for r in self._diffs) for c in c_range]
+
+    # -------------------------
+    # queries
+    # -------------------------
+    def window_variation(self) -> float:
+        """Same value as basic_drum.window_variation() on the current window."""
+        return sum(self.absdiff)
+
+    def mean(self) -> List[float]:
+        n = self.count or 1
+        return [x / n for x in self.sum]
+
+    def variance(self) -> List[float]:
+        n = self.count or 1
+        return [max(sq / n - (s / n) ** 2, 0.0) for s, sq in zip(self.sum, self.sumsq)]
+
+    def total_variance(self) -> float:
+        return sum(self.variance())
+
+    def peak(self) -> List[float]:
+        """Largest |x| per channel inside the window."""
+        return [q[0][1] if q else 0.0 for q in self._peaks]
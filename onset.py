@@ -0,0 +1,89 @@
+# -----------------------------
+# STREAMING ONSET DETECTOR
+# -----------------------------
+# The row gate is true for most samples of a swing, so one physical hit
+# used to play several times in a row. OnsetDetector fires once per hit:
+#
+#   signal      sum over the 6 channels of |row - previous row|
+#   threshold   max(floor, mean + k * deviation); mean/deviation are EMAs
+#               of the signal, updated only while it is below threshold so
+#               a burst does not raise its own bar
+#   fire        on the first sample above threshold (rising edge, not the
+#               peak), if armed and the refractory period has passed
+#   re-arm      once the signal falls back under mean + release * deviation
+#
+# One detector per stick; times are in samples (50 Hz).
+
+import numpy as np
+
+from ring_buffer import FEATURES_PER_ROW
+
+ONSET_ALPHA = 0.02          # baseline EMA rate, ~1 s
+ONSET_K = 3.0
+ONSET_FLOOR = 40.0
+ONSET_RELEASE = 0.5
+REFRACTORY_SAMPLES = 8      # 160 ms
+
+
+class OnsetDetector:
+    def __init__(self, k: float = ONSET_K, floor: float = ONSET_FLOOR,
+                 refractory: int = REFRACTORY_SAMPLES, alpha: float = ONSET_ALPHA,
+                 release: float = ONSET_RELEASE, channels: int = FEATURES_PER_ROW):
+        self.k = k
+        self.floor = floor
+        self.refractory = refractory
+        self.alpha = alpha
+        self.release = release
+        self._prev = np.zeros(channels)
+        self._diff = np.zeros(channels)
+        self.mean = 0.0
+        self.dev = 0.0
+        self.onsets = 0
+        self.suppressed = 0     # samples over threshold that did not fire
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the previous sample (e.g. after a window reset); keeps the baseline."""
+        self._primed = False
+        self._armed = True
+        self._since = self.refractory
+
+    def threshold(self) -> float:
+        return max(self.floor, self.mean + self.k * self.dev)
+
+    def update(self, row) -> bool:
+        """Feed one sample; True if a hit starts on it."""
+        if not self._primed:
+            self._prev[:] = row
+            self._primed = True
+            return False
+        np.subtract(row, self._prev, out=self._diff)
+        np.abs(self._diff, out=self._diff)
+        value = float(self._diff.sum())
+        self._prev[:] = row
+        self._since += 1
+
+        thr = self.threshold()
+        if value > thr:
+            if self._armed and self._since >= self.refractory:
+                self._armed = False
+                self._since = 0
+                self.onsets += 1
+                return True
+            self.suppressed += 1
+            return False
+        if not self._armed and value < self.mean + self.release * self.dev:
+            self._armed = True
+        self.mean += self.alpha * (value - self.mean)
+        self.dev += self.alpha * (abs(value - self.mean) - self.dev)
+        return False
+
+    def report(self) -> str:
+        return "onsets=%d suppressed=%d threshold=%.0f" % (
+            self.onsets, self.suppressed, self.threshold())
+
+
+def onset_mask(rows, **kwargs) -> np.ndarray:
+    """Run a fresh detector over a whole recording; True at each onset sample."""
+    det = OnsetDetector(**kwargs)
+    return np.fromiter((det.update(r) for r in rows), dtype=bool, count=len(rows))
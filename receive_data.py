@@ -1,49 +1,222 @@
+import argparse
+import json
+import queue
 import socket
-import csv
-import os
-from datetime import datetime
+import sys
+import threading
 import time
- 
+from datetime import datetime
+from pathlib import Path
+
+from event_log import LEVELS, EventLog
+from imu_dataset import label_side
+from imu_protocol import FrameDecoder, ProtocolError
+from imu_store import FlushThread, RecordingWriter
+
 # -----------------------------
 # CONFIG
 # -----------------------------
 UDP_IP = "0.0.0.0"
 UDP_PORT = 5005
 DATA_DIR = "imu_data"
+RCVBUF_BYTES = 4 << 20
+STATUS_EVERY_S = 2
+LOG_SAMPLE = {"row": 25}
+# -----------------------------
+
+# One run records every stick that sends into a session directory:
+#
+#   imu_data/session_YYYYmmdd_HHMMSS/
+#     stick0.imu, stick1.imu    one binary stream per stick (imu_store.py)
+#     manifest.json             labelled segments: label, the stick it is
+#                               for (null = both), wall-clock start/end,
+#                               [first, end) record range per stick
+#
+# Type a label + Enter to start a segment, an empty line to pause (data is
+# still stored, just not labelled), "q" to stop. --plan runs a fixed
+# label schedule instead. Chunk writes happen on a background thread and
+# the console only gets a status line every STATUS_EVERY_S. Status, label
+# and bad-packet events (plus sampled rows with --log-level DEBUG) go
+# through event_log.py: printed off the receive thread and kept in the
+# session's events.evlog.
+# imu_dataset.load_all() picks sessions up for training and evaluation.
+
+
+class CaptureSession:
+    def __init__(self, root, flusher: FlushThread):
+        self.dir = Path(root) / datetime.now().strftime("session_%Y%m%d_%H%M%S")
+        self.dir.mkdir(parents=True)
+        self.flusher = flusher
+        self.writers = {}       # stick -> RecordingWriter
+        self.segments = []
+        self.current = None     # open segment dict, or None while paused
+        self.created = time.time()
+        self.bad_packets = 0
+
+    def writer(self, stick: int) -> RecordingWriter:
+        w = self.writers.get(stick)
+        if w is None:
+            w = RecordingWriter(self.dir / ("stick%d.imu" % stick), "session", stick,
+                                flusher=self.flusher)
+            self.writers[stick] = w
+            if self.current is not None:
+                self.current["records"][str(stick)] = [0, 0]
+            self.write_manifest()
+        return w
+
+    def set_label(self, label) -> None:
+        """Close the open segment and start a new one (label None = pause)."""
+        now = time.time()
+        if self.current is not None:
+            self.current["end"] = now
+            for stick, span in self.current["records"].items():
+                span[1] = self.writers[int(stick)].records
+        self.current = None
+        if label:
+            self.current = dict(label=label, stick=label_side(label), start=now, end=None,
+                                records={str(s): [w.records, w.records]
+                                         for s, w in self.writers.items()})
+            self.segments.append(self.current)
+        self.write_manifest()
+
+    def write(self, decoder: FrameDecoder, n: int) -> None:
+        self.writer(decoder.stick).append_rows(decoder.ticks_ms[:n], decoder.rows[:n],
+                                               decoder.seq, decoder.stick)
+
+    def write_manifest(self) -> None:
+        manifest = dict(version=1, created=self.created,
+                        sticks={str(s): w.path.name for s, w in sorted(self.writers.items())},
+                        segments=self.segments)
+        tmp = self.dir / "manifest.json.tmp"
+        tmp.write_text(json.dumps(manifest, indent=1))
+        tmp.replace(self.dir / "manifest.json")
+
+    def close(self) -> None:
+        self.set_label(None)
+        for w in self.writers.values():
+            w.close()
+
+    def status(self) -> str:
+        label = self.current["label"] if self.current else "(paused)"
+        if self.current and self.current["stick"] is not None:
+            label += " (stick %d)" % self.current["stick"]
+        counts = ", ".join("stick %d: %d" % (s, w.records) for s, w in sorted(self.writers.items()))
+        return "[%s] %s  bad=%d flush backlog=%d" % (
+            label, counts or "no data yet", self.bad_packets, self.flusher.backlog())
+
+
+# -----------------------------
+# LABEL CONTROL (stdin / plan)
+# -----------------------------
+STOP = object()
+
+
+def read_labels(commands: "queue.SimpleQueue") -> None:
+    for line in sys.stdin:
+        line = line.strip()
+        if line in ("q", "quit"):
+            break
+        commands.put(line or None)
+    commands.put(STOP)
+
+
+def run_plan(commands: "queue.SimpleQueue", plan) -> None:
+    for label, seconds in plan:
+        print("next: %s for %d s" % (label, seconds))
+        for i in range(3, 0, -1):
+            print(i)
+            time.sleep(1)
+        commands.put(label)
+        time.sleep(seconds)
+        commands.put(None)
+    commands.put(STOP)
+
+
+def apply_commands(session: CaptureSession, commands: "queue.SimpleQueue", log: EventLog) -> bool:
+    """Apply pending label changes; False once the controller asked to stop."""
+    while True:
+        try:
+            cmd = commands.get_nowait()
+        except queue.Empty:
+            return True
+        if cmd is STOP:
+            return False
+        session.set_label(cmd)
+        log.info("label", text=cmd or "(paused)")
+        log.info("status", text=session.status())
+
+
+def parse_plan(items):
+    plan = []
+    for item in items:
+        label, _, seconds = item.rpartition(":")
+        plan.append((label, int(seconds)))
+    return plan
+
+
+# -----------------------------
+# MAIN
 # -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Record IMU streams from all sticks")
+    parser.add_argument("--port", type=int, default=UDP_PORT)
+    parser.add_argument("--data", default=DATA_DIR, help="directory for session folders")
+    parser.add_argument("--plan", nargs="+", metavar="LABEL:SECONDS",
+                        help="record these labels in order instead of reading stdin")
+    parser.add_argument("--log-level", choices=sorted(LEVELS, key=LEVELS.get), default="INFO",
+                        help="console level; DEBUG adds sampled rows")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+    sock.bind((UDP_IP, args.port))
+    sock.settimeout(0.2)
+
+    flusher = FlushThread().start()
+    session = CaptureSession(args.data, flusher)
+    log = EventLog(LEVELS[args.log_level], session.dir / "events.evlog",
+                   sample=LOG_SAMPLE).start()
+    commands = queue.SimpleQueue()
+    if args.plan:
+        target, targs = run_plan, (commands, parse_plan(args.plan))
+    else:
+        target, targs = read_labels, (commands,)
+        print("type a label + Enter to start recording it, Enter to pause, q to stop")
+    threading.Thread(target=target, args=targs, daemon=True).start()
+
+    print(f"Listening on UDP port {args.port}")
+    print(f"Saving to {session.dir}")
+
+    decoder = FrameDecoder()
+    next_status = time.monotonic() + STATUS_EVERY_S
+    try:
+        while True:
+            # label changes land between packets, so segment ranges are exact
+            if not apply_commands(session, commands, log):
+                break
+
+            try:
+                n = decoder.recv(sock)
+                session.write(decoder, n)
+                log.debug("row", decoder.stick, decoder.rows[n - 1])
+            except socket.timeout:
+                pass
+            except ProtocolError as e:
+                session.bad_packets += 1
+                log.warn("bad_packet", text=str(e))
+
+            if time.monotonic() >= next_status:
+                log.info("status", text=session.status())
+                next_status += STATUS_EVERY_S
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        session.close()
+        flusher.stop()
+        log.stop()
+    print("\nStopped. %d segments saved to %s" % (len(session.segments), session.dir))
+
 
-os.makedirs(DATA_DIR, exist_ok=True)
-activity = input("Enter activity label (e.g., sitting, walking, jogging, jumping, wrist curl): ")
-filename = f"{activity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-filepath = os.path.join(DATA_DIR, filename)
- 
-f = open(filepath, "w", newline="")
-writer = csv.writer(f)
-writer.writerow(["timestamp", "ax", "ay", "az", "gx", "gy", "gz", "activity"])
-duration_seconds = 120
-print('recording will start in 5 seconds')
-for i in range(5):
-    print(i)
-    time.sleep(1)
-start_time = time.time() 
-
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.bind((UDP_IP, UDP_PORT))
- 
-print(f"Listening on UDP port {UDP_PORT}")
-print(f"Saving to {filepath}")
-
-print('recording start')
-
-try:
-    while (time.time() - start_time) < duration_seconds:
-        data, addr = sock.recvfrom(1024)
-        decoded = data.decode().strip()
-        row = decoded.split(",")
-        row.append(activity)
-        writer.writerow(row)
-        print(row)
-except KeyboardInterrupt:
-    print("\nStopped. File saved.")
- 
-sock.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# ------------------------------------
+# IMU REPLAY / RECEIVER BENCHMARK
+# ------------------------------------
+# Streams imu_data/ recordings as Nicla frames over local UDP, so the
+# receiver can be exercised without boards or Wi-Fi.
+#
+#   python replay.py                          # bench: all recordings, max speed
+#   python replay.py --realtime imu_data/snare_stick_left_*.csv
+#   python replay.py --send --port 5005 ...   # feed a running drum_engine.py / basic_drum.py
+#
+# Bench mode runs the receiver loop of basic_drum.py in-process
+# (FrameDecoder.recv + StickPipeline.feed, no audio) and reports
+# throughput, per-packet processing time, loss and triggers per drum.
+
+import argparse
+import socket
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from drum_engine import REGISTRY, STICKS, make_pipeline, stick_models
+from imu_dataset import load_recording, recording_paths
+from imu_protocol import BacklogReader, FrameDecoder, ProtocolError, encode_frame, to_counts
+from latency_trace import LatencyHistogram, now
+from model_ensemble import ENSEMBLE_MODE, ENSEMBLE_MODES, ShadowLog
+from stick_pipeline import GATE_MODE, GATE_MODES, MotionGate
+
+UDP_IP = "127.0.0.1"
+BENCH_PORT = 0           # any free port
+BATCH = 2
+SAMPLE_MS = 20
+MAX_IN_FLIGHT = 64
+
+
+# -----------------------------
+# SENDER
+# -----------------------------
+def concat_recordings(recs, loops: int = 1):
+    """Back-to-back recordings for one stick on one continuous ticks_ms clock."""
+    rows, ticks = [], []
+    cursor = 0
+    for _ in range(loops):
+        for rec in recs:
+            rel = rec.ticks_ms - rec.ticks_ms[0] + cursor
+            rows.append(rec.rows)
+            ticks.append(rel)
+            cursor = int(rel[-1]) + SAMPLE_MS
+    return np.concatenate(rows), np.concatenate(ticks)
+
+
+def build_frames(rows, ticks, stick: int, batch: int = BATCH, text: bool = False):
+    """(send_offset_s, datagram) pairs, offsets from the first sample."""
+    counts = to_counts(rows)
+    t0 = int(ticks[0])
+    frames = []
+    for i in range(0, len(rows), batch):
+        tb = ticks[i:i + batch]
+        # the board sends once the last sample of the batch is taken
+        offset = (int(tb[-1]) - t0) / 1000.0
+        if text:
+            for t, row in zip(tb, rows[i:i + batch]):
+                msg = "%d, %f, %f, %f, %f, %f, %f, %f" % ((int(t), stick) + tuple(row))
+                frames.append((offset, msg.encode()))
+        else:
+            frames.append((offset, encode_frame(stick, i, int(tb[0]), tb - tb[0],
+                                                counts[i:i + batch])))
+    return frames
+
+
+def merge_streams(streams):
+    """Interleave several sticks' frames by send time, as two boards would."""
+    merged = [f for frames in streams for f in frames]
+    merged.sort(key=lambda f: f[0])
+    return merged
+
+
+def send(frames, addr, realtime: bool, sock=None, acked=None, max_in_flight: int = 0) -> float:
+    """
+    acked/max_in_flight: in bench mode, wait while more than max_in_flight
+    frames are unread (acked() returns how many the receiver has read), so
+    "as fast as possible" means as fast as the receiver keeps up rather
+    than overflowing the socket buffer.
+    """
+    sock = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    start = time.perf_counter()
+    for sent, (offset, data) in enumerate(frames):
+        if realtime:
+            # absolute schedule: sleep overshoot does not accumulate
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        elif max_in_flight:
+            while sent - acked() > max_in_flight:
+                time.sleep(0)
+        sock.sendto(data, addr)
+    return time.perf_counter() - start
+
+
+# -----------------------------
+# IN-PROCESS BENCH RECEIVER
+# -----------------------------
+def bench(frames, realtime: bool, gate: MotionGate, port: int = BENCH_PORT,
+          max_in_flight: int = MAX_IN_FLIGHT, models=None, mode: str = ENSEMBLE_MODE,
+          shadow_log=None, drain: bool = False, shadows: bool = False) -> None:
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    rx.bind((UDP_IP, port))
+    rx.settimeout(0.5)
+    addr = rx.getsockname()
+
+    pipelines = {stick: make_pipeline(stick, gate, stick_models(models, stick), mode, shadow_log,
+                                      shadows)
+                 for stick in STICKS}
+    decoder = FrameDecoder()
+    reader = BacklogReader(decoder)
+    per_packet = LatencyHistogram()
+    triggers = Counter()
+    received = [0]
+    samples = 0
+    busy = 0.0
+
+    sender = threading.Thread(target=send, args=(frames, addr, realtime),
+                              kwargs=dict(acked=lambda: received[0], max_in_flight=max_in_flight),
+                              daemon=True)
+    start = time.perf_counter()
+    sender.start()
+    try:
+        while True:
+            if drain:
+                try:
+                    backlog = reader.read(rx)
+                except socket.timeout:
+                    if not sender.is_alive():
+                        break
+                    continue
+                t0 = now()
+                for stick, stick_frames in backlog.items():
+                    pipe = pipelines.get(stick)
+                    if pipe is not None:
+                        for hit in pipe.feed_backlog(stick_frames, t0):
+                            triggers[(hit.stick, hit.drum)] += 1
+                        samples += sum(len(f[1]) for f in stick_frames)
+                dt = now() - t0
+                per_packet.add(dt * 1000.0)
+                for pipe in pipelines.values():
+                    pipe.run_shadows()
+                busy += now() - t0
+                received[0] = reader.datagrams
+                continue
+            try:
+                n = decoder.recv(rx)
+            except socket.timeout:
+                if not sender.is_alive():
+                    break
+                continue
+            except ProtocolError:
+                continue
+            t0 = now()
+            pipe = pipelines.get(decoder.stick)
+            if pipe is not None:
+                for hit in pipe.feed(decoder.seq, decoder.rows[:n], decoder.ticks_ms[:n], t0):
+                    triggers[(hit.stick, hit.drum)] += 1
+            dt = now() - t0
+            per_packet.add(dt * 1000.0)
+            if pipe is not None:
+                pipe.run_shadows()
+            busy += now() - t0
+            received[0] += 1
+            samples += n
+    finally:
+        rx.close()
+    # the last 0.5 s was spent waiting for stragglers
+    elapsed = time.perf_counter() - start - 0.5
+    received = received[0]
+
+    # frames dropped after the last one received leave no seq gap behind
+    print("packets:   %d sent, %d received, %d dropped by the socket" % (
+        len(frames), received, len(frames) - received))
+    print("elapsed:   %.3f s  (%.0f packets/s, %.0f samples/s)" % (
+        elapsed, received / elapsed, samples / elapsed))
+    print("receiver:  %.1f%% busy, per-%s p50 %.3f ms  p95 %.3f ms  p99 %.3f ms  max %.3f ms" % (
+        100.0 * busy / elapsed, "read" if drain else "packet", per_packet.percentile(50), per_packet.percentile(95),
+        per_packet.percentile(99), per_packet.max))
+    for stick, pipe in pipelines.items():
+        print(pipe.report())
+    if drain:
+        print(reader.report())
+    for (stick, drum), c in sorted(triggers.items()):
+        print("triggers:  %s %-9s %d" % (STICKS[stick]["name"], drum, c))
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Replay imu_data recordings over UDP")
+    parser.add_argument("files", nargs="*", help="CSV recordings (default: all of imu_data/)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="keep the recorded 50 Hz cadence instead of sending as fast as possible")
+    parser.add_argument("--send", action="store_true",
+                        help="only send, to a receiver already running on --host/--port")
+    parser.add_argument("--host", default=UDP_IP)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--stick", type=int, default=None,
+                        help="stick id for files whose side is not in the data or name")
+    parser.add_argument("--batch", type=int, default=BATCH, help="samples per frame")
+    parser.add_argument("--text", action="store_true", help="send the legacy text format")
+    parser.add_argument("--loops", type=int, default=1, help="replay the files this many times")
+    parser.add_argument("--gate", choices=GATE_MODES, default=GATE_MODE)
+    parser.add_argument("--flood", action="store_true",
+                        help="bench without flow control: let the socket buffer overflow")
+    parser.add_argument("--model", action="append", choices=REGISTRY.names(),
+                        help="bench: models to run (repeatable, first per stick plays)")
+    parser.add_argument("--ensemble", choices=ENSEMBLE_MODES, default=ENSEMBLE_MODE)
+    parser.add_argument("--shadow", action="store_true",
+                        help="bench: also run the shadow models (scored after each packet)")
+    parser.add_argument("--shadow-log", default=None, help="bench: per-window predictions, JSON lines")
+    parser.add_argument("--drain", action="store_true",
+                        help="bench: read every queued datagram at once, classify only the newest window")
+    args = parser.parse_args()
+
+    paths = args.files or [str(p) for p in recording_paths()]
+    per_stick = {}
+    for p in paths:
+        rec = load_recording(p)
+        if not len(rec):
+            continue
+        stick = rec.side if rec.side is not None else args.stick
+        if stick is None:
+            print("skipping %s: no stick side, pass --stick" % rec.path.name)
+            continue
+        per_stick.setdefault(stick, []).append(rec)
+    if not per_stick:
+        parser.error("nothing to replay")
+
+    # each stick plays its files back to back; the two sticks run side by side
+    streams = []
+    for stick, recs in sorted(per_stick.items()):
+        rows, ticks = concat_recordings(recs, args.loops)
+        streams.append(build_frames(rows, ticks, stick, args.batch, args.text))
+    frames = merge_streams(streams)
+
+    if args.send:
+        elapsed = send(frames, (args.host, args.port or 5005), args.realtime)
+        print("sent %d packets in %.3f s (%.0f packets/s)" % (len(frames), elapsed, len(frames) / elapsed))
+    else:
+        shadow_log = ShadowLog(args.shadow_log) if args.shadow_log else None
+        bench(frames, args.realtime, MotionGate(mode=args.gate), args.port or BENCH_PORT,
+              max_in_flight=0 if args.flood else MAX_IN_FLIGHT, models=args.model,
+              mode=args.ensemble, shadow_log=shadow_log, drain=args.drain, shadows=args.shadow)
+        if shadow_log is not None:
+            shadow_log.close()
+            print("shadow log: %d lines in %s" % (shadow_log.lines, shadow_log.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -----------------------------
+# IMU RING BUFFER (50 x 6 WINDOW)
+# -----------------------------
+# Preallocated, array-backed sliding window for one stick.
+#
+# Every row is written twice: at slot i and at slot i + WINDOW_SIZE of a
+# (2 * WINDOW_SIZE, FEATURES) array. The last WINDOW_SIZE rows are then
+# always one contiguous slice, so the 50 x 6 window and the flattened
+# 300-value model input are both plain views - no per-sample list
+# allocation and no re-flattening.
+
+import numpy as np
+
+WINDOW_SIZE = 50
+FEATURES_PER_ROW = 6
+
+
+class ImuRingBuffer:
+    def __init__(self, size: int = WINDOW_SIZE, features: int = FEATURES_PER_ROW,
+                 dtype=np.float64):
+        self.size = size
+        self.features = features
+        self._buf = np.zeros((2 * size, features), dtype=dtype)
+        # the same memory as one flat array: window cell k is flat[base() + k]
+        self.flat = self._buf.reshape(-1)
+        self._head = 0      # slot the next row is written to
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        return self._count == self.size
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+
+    def push(self, row) -> None:
+        """Append one sample (any length-`features` sequence or array)."""
+        h = self._head
+        self._buf[h] = row
+        self._buf[h + self.size] = row
+        h += 1
+        self._head = 0 if h == self.size else h
+        if self._count < self.size:
+            self._count += 1
+
+    def extend(self, rows) -> None:
+        """Append several samples (an (n, features) array) in order."""
+        for row in rows:
+            self.push(row)
+
+    def window(self) -> np.ndarray:
+        """(n, features) view of the current window, oldest row first."""
+        end = self._head + self.size
+        return self._buf[end - self._count:end]
+
+    def vector(self) -> np.ndarray:
+        """Flat (n * features,) view laid out like the old `input_vector`."""
+        return self.window().reshape(-1)
+
+    def base(self) -> int:
+        """Offset of the window's first cell in `flat` (for sparse tree reads)."""
+        return (self._head + self.size - self._count) * self.features
+
+    def latest(self) -> np.ndarray:
+        """View of the newest row."""
+        return self._buf[self._head + self.size - 1]
+
+    def row(self, offset: int) -> np.ndarray:
+        """View of the row `offset` samples into the window (0 = oldest)."""
+        return self._buf[self._head + self.size - self._count + offset]
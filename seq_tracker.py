@@ -0,0 +1,122 @@
+# -----------------------------
+# SEQUENCE TRACKING / GAP HANDLING
+# -----------------------------
+# One SequenceTracker per stick. Frames carry the u16 sequence number of
+# their first sample (imu_protocol.py), so a gap is measured directly in
+# samples.
+#
+#   in order     -> released immediately, no copy
+#   ahead (gap)  -> held for up to `reorder_depth` frames waiting for the
+#                   missing one; then released with gap = samples lost
+#   behind       -> late or duplicate, dropped (the window has moved on)
+#   far off      -> the stick restarted; tracking resyncs on this frame
+#
+# What to do with a released gap is up to the caller: fill short gaps
+# (interpolate_rows) or invalidate the window.
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SEQ_MOD = 1 << 16
+REORDER_DEPTH = 2
+RESYNC_DISTANCE = 1000   # samples (~20 s at 50 Hz) - larger jumps mean a restart
+
+
+class SequenceTracker:
+    def __init__(self, reorder_depth: int = REORDER_DEPTH):
+        self.reorder_depth = reorder_depth
+        self.expected: Optional[int] = None
+        self._pending = {}      # seq -> (rows, ticks), copies of held frames
+        self.received = 0       # samples released in order or after reordering
+        self.lost = 0
+        self.late = 0           # late or duplicate samples dropped
+        self.reordered = 0      # held frames whose gap was later filled in
+        self.resyncs = 0
+
+    def reset(self) -> None:
+        self.expected = None
+        self._pending.clear()
+
+    @property
+    def loss_rate(self) -> float:
+        total = self.received + self.lost
+        return self.lost / total if total else 0.0
+
+    def report(self) -> str:
+        return ("recv=%d lost=%d (%.2f%%) late=%d reordered=%d resyncs=%d" % (
+            self.received, self.lost, 100.0 * self.loss_rate,
+            self.late, self.reordered, self.resyncs))
+
+    # -------------------------
+    # feed
+    # -------------------------
+    def feed(self, seq: Optional[int], rows, ticks=None) -> List[Tuple[int, object, object]]:
+        """Returns the frames now ready, in order, as (gap_before, rows, ticks).
+
+        `rows`/`ticks` of an in-order frame are passed through untouched;
+        a frame that has to be held is copied first, since the decoder
+        reuses its buffers on the next packet.
+        """
+        n = len(rows)
+        if seq is None:             # legacy text packet, nothing to check
+            self.received += n
+            return [(0, rows, ticks)]
+
+        if self.expected is None:
+            self.expected = seq
+
+        d = (seq - self.expected) % SEQ_MOD
+        if d >= SEQ_MOD // 2:
+            d -= SEQ_MOD            # negative: behind
+
+        if abs(d) > RESYNC_DISTANCE:
+            self.resyncs += 1
+            self._pending.clear()
+            self.expected = seq
+            d = 0
+
+        if d < 0:
+            self.late += n
+            return []
+
+        if d == 0:
+            out = [(0, rows, ticks)]
+            self._advance(n)
+            self.reordered += self._drain(out)
+            return out
+
+        if seq not in self._pending:
+            self._pending[seq] = (np.array(rows), None if ticks is None else np.array(ticks))
+        if len(self._pending) <= self.reorder_depth:
+            return []
+
+        # waited long enough: give up on what is missing before the oldest held frame
+        out = []
+        first = min(self._pending, key=lambda s: (s - self.expected) % SEQ_MOD)
+        gap = (first - self.expected) % SEQ_MOD
+        self.lost += gap
+        self.expected = first
+        self._drain(out, gap)
+        return out
+
+    def _advance(self, n: int) -> None:
+        self.received += n
+        self.expected = (self.expected + n) % SEQ_MOD
+
+    def _drain(self, out, gap: int = 0) -> int:
+        # release held frames that now continue the stream
+        released = 0
+        while self.expected in self._pending:
+            rows, ticks = self._pending.pop(self.expected)
+            out.append((gap, rows, ticks))
+            gap = 0
+            released += 1
+            self._advance(len(rows))
+        return released
+
+
+def interpolate_rows(last, first, gap: int) -> np.ndarray:
+    """`gap` rows linearly interpolated between two real samples."""
+    w = (np.arange(1, gap + 1) / (gap + 1))[:, None]
+    return np.asarray(last) + w * (np.asarray(first) - np.asarray(last))
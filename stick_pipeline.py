@@ -0,0 +1,224 @@
+# -----------------------------
+# PER-STICK PIPELINE
+# -----------------------------
+# Everything that happens to one stick's samples between the decoder and
+# the speaker: sequence/gap handling, ring buffer, motion statistics,
+# motion gate and tree inference. Receivers (basic_drum.py,
+# drum_engine.py) own the sockets and the audio; they feed frames in and
+# get HitTraces (drum name + stage timestamps) back.
+
+from typing import Dict, List, Optional, Sequence
+
+from latency_trace import HitTrace, now
+from motion_stats import MotionStats
+from onset import OnsetDetector
+from ring_buffer import ImuRingBuffer, WINDOW_SIZE, FEATURES_PER_ROW
+from seq_tracker import SequenceTracker, interpolate_rows
+
+# gaps up to MAX_FILL samples are bridged by interpolation; longer ones
+# invalidate the window so the tree never sees a time discontinuity
+MAX_FILL = 2
+
+# "row":    single-frame row_variation of the newest sample (original gate)
+# "window": sliding-window variance summed over the 6 channels
+# "onset":  onset.OnsetDetector per stick, fires once per hit
+GATE_MODES = ("row", "window", "onset")
+GATE_MODE = "onset"
+VARTHRESHOLD = 60
+WINDOW_VARTHRESHOLD = 1000
+
+
+class MotionGate:
+    def __init__(self, mode: str = GATE_MODE, row_threshold: float = VARTHRESHOLD,
+                 window_threshold: float = WINDOW_VARTHRESHOLD):
+        if mode not in GATE_MODES:
+            raise ValueError("unknown gate mode %r" % mode)
+        self.mode = mode
+        self.row_threshold = row_threshold
+        self.window_threshold = window_threshold
+
+    def onset_detector(self) -> Optional[OnsetDetector]:
+        """Fresh per-stick detector in "onset" mode (the gate itself is shared)."""
+        return OnsetDetector() if self.mode == "onset" else None
+
+    def __call__(self, stats: MotionStats) -> bool:
+        if self.mode == "window":
+            return stats.total_variance() > self.window_threshold
+        return stats.row_var > self.row_threshold
+
+
+class StickPipeline:
+    """
+    class_drums: drum name per tree output class (None = no hit)
+    edge_drums:  drum name per class id sent by the edge firmware
+    """
+
+    def __init__(self, stick: int, model, class_drums: Sequence[Optional[str]],
+                 edge_drums: Optional[Dict[int, str]] = None,
+                 gate: Optional[MotionGate] = None, max_fill: int = MAX_FILL):
+        self.stick = stick
+        self.model = model
+        self.class_drums = tuple(class_drums)
+        self.edge_drums = edge_drums or {}
+        self.gate = gate or MotionGate()
+        self.max_fill = max_fill
+
+        self.window = ImuRingBuffer(WINDOW_SIZE, FEATURES_PER_ROW)
+        self.stats = MotionStats(WINDOW_SIZE, FEATURES_PER_ROW)
+        self.onset = self.gate.onset_detector()
+        self.tracker = SequenceTracker()
+        self.gaps_filled = 0
+        self.windows_reset = 0
+        self.backlog_frames = 0     # frames taken in a batch behind a newer one
+        self.fires_coalesced = 0    # gate fires merged into one newest-window inference
+
+    # -------------------------
+    # raw IMU path
+    # -------------------------
+    def feed(self, seq: Optional[int], rows, ticks=None, t_recv: Optional[float] = None,
+             recv_ms: Optional[float] = None) -> List[HitTrace]:
+        """One decoded frame in, hits to play out (usually none).
+
+        ticks: Nicla ticks_ms per row; t_recv/recv_ms: perf_counter() and
+        wall-clock ms at receive. All optional, only used for tracing.
+        """
+        if t_recv is None:
+            t_recv = now()
+        hits = []
+        for gap, ready, ready_ticks in self.tracker.feed(seq, rows, ticks):
+            if gap:
+                self.handle_gap(gap, ready[0])
+            for i, row in enumerate(ready):
+                hit = self.push(row, t_recv)
+                if hit is not None:
+                    if ready_ticks is not None:
+                        hit.sensor_ms = int(ready_ticks[i])
+                        hit.recv_ms = recv_ms
+                    hits.append(hit)
+        return hits
+
+    def push(self, row, t_recv: Optional[float] = None) -> Optional[HitTrace]:
+        t_window = self.update(row)
+        if t_window is None:
+            return None
+        return self.infer(t_window if t_recv is None else t_recv, t_window, now())
+
+    def update(self, row) -> Optional[float]:
+        """Window + stats + gate for one sample; the time it fired, or None."""
+        self.window.push(row)
+        self.stats.push(row)
+        t_window = now()
+        # gate first: a still stick never reaches the tree
+        if self.onset is not None:
+            # the detector sees every sample, full window or not
+            fire = self.onset.update(row)
+        else:
+            fire = self.gate(self.stats)
+        if not (fire and self.window.full):
+            return None
+        return t_window
+
+    def infer(self, t_recv: float, t_window: float, t_gate: float) -> Optional[HitTrace]:
+        # sparse: the tree reads only its cells, straight from the ring buffer
+        drum = self.class_drums[self.model.predict_class_from(self.window.flat, self.window.base())]
+        if drum is None:
+            return None
+        hit = HitTrace(self.stick, drum, t_recv)
+        # the onset sample is only the rising edge; the window max tracks how
+        # hard the swing was and is known when the tree fires
+        base = self.window.base()
+        cells = self.window.flat[base:base + WINDOW_SIZE * FEATURES_PER_ROW]
+        hit.intensity = float(abs(cells.reshape(WINDOW_SIZE, FEATURES_PER_ROW)[:, 3:]).max())
+        hit.t_window = t_window
+        hit.t_gate = t_gate
+        hit.t_infer = now()
+        return hit
+
+    def run_shadows(self) -> None:
+        """Deferred shadow-model work (model_ensemble.py); call after the hits are dispatched."""
+        run = getattr(self.model, "run_shadows", None)
+        if run is not None:
+            run()
+
+    # -------------------------
+    # backlog (drain mode)
+    # -------------------------
+    def feed_backlog(self, frames, t_recv: Optional[float] = None,
+                     recv_ms: Optional[float] = None) -> List[HitTrace]:
+        """Several frames at once, as (seq, rows, ticks), oldest first.
+
+        Window, stats and gate see every sample, but the tree runs at most
+        once: on the newest window, if the gate fired anywhere in the
+        batch. Used when the receiver fell behind, so it catches up in one
+        step instead of classifying every stale window.
+
+        The trade-off: with onset gating the tree sees the newest window,
+        not the one ending at the onset sample it was trained to expect,
+        and two hits inside one drained burst play as a single hit
+        (counted in fires_coalesced).
+        """
+        if t_recv is None:
+            t_recv = now()
+        fired = None
+        fires = 0
+        last_ticks = None
+        for seq, rows, ticks in frames:
+            for gap, ready, ready_ticks in self.tracker.feed(seq, rows, ticks):
+                if gap:
+                    self.handle_gap(gap, ready[0])
+                for row in ready:
+                    t = self.update(row)
+                    if t is not None:
+                        fires += 1
+                        if fired is None:
+                            fired = t
+                if ready_ticks is not None and len(ready_ticks):
+                    last_ticks = int(ready_ticks[-1])
+        if len(frames) > 1:
+            self.backlog_frames += len(frames) - 1
+        if fires > 1:
+            self.fires_coalesced += fires - 1
+        if fired is None or not self.window.full:
+            return []
+        hit = self.infer(t_recv, fired, now())
+        if hit is None:
+            return []
+        hit.sensor_ms = last_ticks
+        hit.recv_ms = recv_ms
+        return [hit]
+
+    def handle_gap(self, gap: int, first_row) -> None:
+        if gap <= self.max_fill and len(self.window):
+            # bridge with synthetic samples; no inference on made-up data
+            for r in interpolate_rows(self.window.latest(), first_row, gap):
+                self.window.push(r)
+                self.stats.push(r)
+            self.gaps_filled += 1
+        else:
+            self.window.clear()
+            self.stats.clear()
+            if self.onset is not None:
+                self.onset.reset()
+            self.windows_reset += 1
+
+    # -------------------------
+    # edge-class path
+    # -------------------------
+    def edge_class(self, cls: int, t_recv: Optional[float] = None) -> Optional[HitTrace]:
+        drum = self.edge_drums.get(cls)
+        if drum is None:
+            return None
+        return HitTrace(self.stick, drum, now() if t_recv is None else t_recv)
+
+    def report(self) -> str:
+        line = "stick %d: %s filled=%d resets=%d" % (
+            self.stick, self.tracker.report(), self.gaps_filled, self.windows_reset)
+        if self.backlog_frames:
+            line += " backlog=%d coalesced=%d" % (self.backlog_frames, self.fires_coalesced)
+        if self.onset is not None:
+            line += " " + self.onset.report()
+        # model_ensemble.ModelEnsemble: agreement of the shadow models
+        extra = self.model.report() if hasattr(self.model, "report") else ""
+        if extra:
+            line += " " + extra
+        return line
@@ -0,0 +1,281 @@
+# ------------------------------------
+# TREE TRAINING PIPELINE
+# ------------------------------------
+# imu_data/*.csv -> 50-sample windows -> compact features -> one 3-class
+# decision tree per stick -> generated source for both targets:
+#
+#   compact_trees.py       score_L_compact / score_R_compact (laptop,
+#                          loaded by window_features.load_feature_models)
+#   compact_trees_edge.py  window_features(buf, start, out) over the
+#                          firmware's flat mirrored buffer + the same
+#                          trees returning lists, MicroPython-safe, used
+#                          by mainL/mainR_inferenceonedge.py (MODEL)
+#
+#   python train_trees.py
+#   python train_trees.py --depth 4 --all-windows
+#
+# Classes follow the edge firmware: 0 = hi-hat/crash, 1 = no hit,
+# 2 = snare/floor tom. Training windows are the ones the live gate
+# (stick_pipeline.GATE_MODE) hands to the tree: with onset gating, the
+# window ending at each detected onset, plus the windows up to
+# ONSET_JITTER samples either side (the live detector's state differs a
+# little from a fresh one per recording); with row gating, every window
+# the row gate lets through. The edge trees (compact_trees_edge.py) are
+# always trained on EDGE_GATE windows, since the Nicla firmware runs the
+# row gate whatever the laptop uses.
+# The last TEST_FRACTION of every recording is held out for the report;
+# the emitted trees are then refit on all windows.
+#
+# Needs scikit-learn (laptop only, not the receivers or the boards).
+
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from evaluate import LABEL_DRUMS, confusion_table, gate_mask, label_drum, sliding_windows
+from imu_dataset import DATA_DIR, load_all
+from ring_buffer import WINDOW_SIZE
+from stick_pipeline import GATE_MODE, GATE_MODES
+from window_features import COMPACT_TREES, FEATURE_NAMES, NUM_FEATURES, window_features
+
+EDGE_TREES = COMPACT_TREES.with_name("compact_trees_edge.py")
+
+SIDES = {
+    0: ("L", ("hihat", None, "snare")),
+    1: ("R", ("crash", None, "floortom")),
+}
+
+STRIDE = 2
+TEST_FRACTION = 0.2
+MAX_DEPTH = 5
+MIN_LEAF = 20
+ONSET_JITTER = 2
+EDGE_GATE = "row"       # the gate in mainL/mainR_inferenceonedge.py
+
+
+# -----------------------------
+# DATASET
+# -----------------------------
+def gated_windows(rows: np.ndarray, gate: Optional[str], stride: int = STRIDE) -> np.ndarray:
+    """Indices of the windows (by first sample) a tree would see under `gate`."""
+    n = len(rows) - WINDOW_SIZE + 1
+    if gate == "onset":
+        onsets = np.flatnonzero(gate_mask(rows, "onset"))
+        idx = (onsets[:, None] + np.arange(-ONSET_JITTER, ONSET_JITTER + 1)).ravel()
+        return np.unique(idx[(idx >= 0) & (idx < n)])
+    idx = np.arange(0, n, stride)
+    if gate is not None:
+        idx = idx[gate_mask(rows, gate)[idx]]
+    return idx
+
+
+def side_windows(recordings, side: int, stride: int = STRIDE,
+                 gate: Optional[str] = GATE_MODE):
+    """(X_train, y_train, X_test, y_test) feature matrices for one stick; gate None = all windows."""
+    _, class_drums = SIDES[side]
+    parts = {True: ([], []), False: ([], [])}
+    for rec in recordings:
+        if rec.side not in (None, side) or len(rec) < WINDOW_SIZE:
+            continue
+        drum = label_drum(rec.label)
+        if drum not in class_drums:
+            print("skipping %s: %s is not a stick %d drum" % (rec.path.name, rec.label, side))
+            continue
+        cls = class_drums.index(drum)
+        idx = gated_windows(rec.rows, gate, stride)
+        # hold out the tail; windows straddling the split are dropped
+        split = int(len(rec) * (1.0 - TEST_FRACTION))
+        train = idx + WINDOW_SIZE <= split
+        test = idx >= split
+        X = window_features(sliding_windows(rec.rows)[idx])
+        for is_train, mask in ((True, train), (False, test)):
+            parts[is_train][0].append(X[mask])
+            parts[is_train][1].append(np.full(int(mask.sum()), cls))
+    out = []
+    for is_train in (True, False):
+        Xs, ys = parts[is_train]
+        out += [np.concatenate(Xs) if Xs else np.empty((0, NUM_FEATURES)),
+                np.concatenate(ys) if ys else np.empty(0, dtype=int)]
+    return tuple(out)
+
+
+def fit(X, y, depth: int, min_leaf: int) -> DecisionTreeClassifier:
+    clf = DecisionTreeClassifier(max_depth=depth, min_samples_leaf=min_leaf,
+                                 random_state=0)
+    return clf.fit(X, y)
+
+
+# -----------------------------
+# CODE GENERATION
+# -----------------------------
+def tree_summary(clf: DecisionTreeClassifier) -> str:
+    used = sorted(set(int(f) for f in clf.tree_.feature if f >= 0))
+    return "depth %d, %d leaves, features %s" % (
+        clf.get_depth(), clf.get_n_leaves(), ", ".join(FEATURE_NAMES[f] for f in used))
+
+
+def leaf_values(clf: DecisionTreeClassifier, node: int, n_classes: int = 3):
+    v = np.zeros(n_classes)
+    # classes absent from the data keep probability 0
+    v[clf.classes_.astype(int)] = clf.tree_.value[node][0]
+    return [float(p) for p in v / v.sum()]
+
+
+def emit_tree(clf: DecisionTreeClassifier, name: str, edge: bool) -> str:
+    """
+    Laptop style matches the existing score_* functions (`var0 = [...]`,
+    one `return var0`); edge style returns the list from every leaf like
+    score_L_stick in mainL_inferenceonedge.py.
+    """
+    t = clf.tree_
+    lines = ["def %s(input):" % name]
+
+    def node(n: int, depth: int) -> None:
+        pad = "    " * depth
+        if t.children_left[n] == t.children_right[n]:
+            values = repr(leaf_values(clf, n))
+            lines.append(pad + ("return %s" if edge else "var0 = %s") % values)
+            return
+        lines.append("%sif input[%d] <= %r:" % (pad, t.feature[n], float(t.threshold[n])))
+        node(t.children_left[n], depth + 1)
+        lines.append(pad + "else:")
+        node(t.children_right[n], depth + 1)
+
+    node(0, 1)
+    if not edge:
+        lines.append("    return var0")
+    return "\n".join(lines) + "\n"
+
+
+EDGE_FEATURES = '''\
+WINDOW = %(window)d
+_best = [0.0] * 6
+
+
+def window_features(buf, start, out):
+    # buf: flat rows of [ax, ay, az, gx, gy, gz], the window's WINDOW rows
+    # contiguous from buf[start] (the firmware's mirrored buffer);
+    # out: list of %(n)d, filled in place
+    c = 0
+    while c < 6:
+        out[c] = 0.0
+        out[6 + c] = 1e30
+        out[12 + c] = -1e30
+        out[18 + c] = 0
+        out[24 + c] = 0.0
+        _best[c] = -1.0
+        c += 1
+    n = 0
+    k = start
+    while n < WINDOW:
+        c = 0
+        while c < 6:
+            v = buf[k + c]
+            out[c] += v * v
+            if v < out[6 + c]:
+                out[6 + c] = v
+            if v > out[12 + c]:
+                out[12 + c] = v
+            a = abs(v)
+            if a > _best[c]:
+                _best[c] = a
+                out[18 + c] = n
+            if n:
+                d = abs(v - buf[k - 6 + c])
+                if d > out[24 + c]:
+                    out[24 + c] = d
+            c += 1
+        k += 6
+        n += 1
+    c = 0
+    while c < 6:
+        out[c] /= WINDOW
+        c += 1
+    return out
+'''
+
+
+def write_sources(trees, edge_trees, laptop_gate: Optional[str], edge_gate: Optional[str],
+                  laptop_path: Path = COMPACT_TREES, edge_path: Path = EDGE_TREES) -> None:
+    def header(title: str, gate: Optional[str]) -> str:
+        return ("# -----------------------------\n# %s\n# -----------------------------\n"
+                "# Generated by train_trees.py, do not edit. Trained on %s windows.\n"
+                "# input[k] is window_features() feature k:\n"
+                % (title, "%s-gated" % gate if gate else "all")
+                + "".join("#   %2d %s\n" % (k, f) for k, f in enumerate(FEATURE_NAMES)))
+
+    laptop = [header("COMPACT-FEATURE TREES (LAPTOP)", laptop_gate)]
+    edge = [header("COMPACT-FEATURE TREES (NICLA, MICROPYTHON)", edge_gate),
+            "\nFEATURES = %d\n\n" % NUM_FEATURES,
+            EDGE_FEATURES % dict(n=NUM_FEATURES, window=WINDOW_SIZE)]
+    for name, clf in trees.items():
+        laptop.append("\n\n" + emit_tree(clf, name, edge=False))
+    for name, clf in edge_trees.items():
+        edge.append("\n\n" + emit_tree(clf, name, edge=True))
+    laptop_path.write_text("".join(laptop))
+    edge_path.write_text("".join(edge))
+
+
+def train(recordings, gate: Optional[str], args):
+    """One compact tree per stick on the windows `gate` passes; prints the held-out report."""
+    trees = {}
+    for side, (suffix, class_drums) in SIDES.items():
+        X, y, Xt, yt = side_windows(recordings, side, args.stride, gate)
+        name = "score_%s_compact" % suffix
+        held_out = fit(X, y, args.depth, args.min_leaf)
+        pred = held_out.predict(Xt)
+        counts = Counter((class_drums[int(t)], class_drums[int(p)]) for t, p in zip(yt, pred))
+
+        clf = fit(np.vstack([X, Xt]), np.concatenate([y, yt]), args.depth, args.min_leaf)
+        trees[name] = clf
+        print("=" * 60)
+        print("%s  %d train / %d held-out windows  held-out accuracy %.1f%%" % (
+            name, len(y), len(yt), 100.0 * float(np.mean(pred == yt)) if len(yt) else 0.0))
+        print(confusion_table(counts))
+        print("scored tree:  %s" % tree_summary(held_out))
+        print("emitted tree: %s (refit on all %d windows, not scored)" % (
+            tree_summary(clf), len(y) + len(yt)))
+    return trees
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Train compact-feature trees from imu_data/")
+    parser.add_argument("--data", default=str(DATA_DIR), help="recordings directory")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--min-leaf", type=int, default=MIN_LEAF)
+    parser.add_argument("--stride", type=int, default=STRIDE, help="samples between windows")
+    parser.add_argument("--gate", choices=GATE_MODES, default=GATE_MODE,
+                        help="train the laptop trees on the windows this gate passes "
+                             "(the edge trees always use EDGE_GATE)")
+    parser.add_argument("--all-windows", action="store_true",
+                        help="also train on windows the motion gate would drop")
+    args = parser.parse_args()
+
+    recordings = load_all(args.data, min_samples=WINDOW_SIZE)
+    unknown = sorted({r.label for r in recordings
+                      if not any(r.label.startswith(p) for p in LABEL_DRUMS)})
+    if unknown:
+        parser.error("no LABEL_DRUMS entry for %s" % ", ".join(unknown))
+
+    gate = None if args.all_windows else args.gate
+    edge_gate = None if args.all_windows else EDGE_GATE
+    print("laptop trees: %s windows" % (gate or "all"))
+    trees = train(recordings, gate, args)
+    if edge_gate == gate:
+        edge_trees = trees
+    else:
+        print("edge trees: %s windows (the firmware's gate)" % edge_gate)
+        edge_trees = train(recordings, edge_gate, args)
+    write_sources(trees, edge_trees, gate, edge_gate)
+    print("wrote %s and %s" % (COMPACT_TREES.name, EDGE_TREES.name))
+
+
+if __name__ == "__main__":
+    main()
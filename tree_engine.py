@@ -0,0 +1,186 @@
+# -----------------------------
+# DECISION TREE ENGINE
+# -----------------------------
+# Compiles the hand-pasted `score_*` functions (nested
+# `if input[i] <= t:` blocks ending in `var0 = [...]` or `return [...]`)
+# into flat node arrays:
+#
+#   feature[n]    input index tested at node n (0 for leaves)
+#   threshold[n]  split value, go left when input[feature] <= threshold
+#   left/right[n] child node ids (a leaf points at itself on both sides)
+#   value[n]      leaf class distribution
+#
+# A tree only ever reads the cells in `used` (score_l_new: 2 of 300).
+# leaf_from()/predict_class_from() evaluate straight against a flat
+# buffer plus window offset (ImuRingBuffer.flat / base()), so the
+# receiver never builds a 300-value input at all.
+#
+# The source files are parsed with `ast`, never imported, so trees can be
+# loaded from basic_drum.py or the MicroPython edge scripts without
+# opening sockets or initialising pygame.
+
+import ast
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class TreeSyntaxError(ValueError):
+    pass
+
+
+class CompiledTree:
+    def __init__(self, name: str, feature, threshold, left, right, value):
+        self.name = name
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.n_nodes, self.n_classes = self.value.shape
+        self.is_leaf = self.left == np.arange(self.n_nodes)
+        self.depth = self._depth(0)
+        # flat input indices the splits test, sorted
+        self.used = np.unique(self.feature[~self.is_leaf])
+
+        # plain-Python mirrors for the single-window path: indexing lists
+        # is cheaper than indexing small numpy arrays element by element
+        self._feature = self.feature.tolist()
+        self._threshold = self.threshold.tolist()
+        self._left = self.left.tolist()
+        self._right = self.right.tolist()
+        self._leaf = self.is_leaf.tolist()
+        # leaf outputs are built once; predict() hands out the same tuple
+        self._dist = [tuple(v) for v in self.value.tolist()]
+        self._cls = [v.index(max(v)) for v in self._dist]
+        self.classes = self.value.argmax(axis=1)
+
+    def __repr__(self) -> str:
+        return "<CompiledTree %s: %d nodes, depth %d, %d classes, reads %d cells>" % (
+            self.name, self.n_nodes, self.depth, self.n_classes, len(self.used))
+
+    def cells(self, features: int = 6) -> List[Tuple[int, int]]:
+        """(time offset, channel) of every window cell the tree reads."""
+        return [divmod(int(k), features) for k in self.used]
+
+    def _depth(self, n: int) -> int:
+        if self.is_leaf[n]:
+            return 0
+        return 1 + max(self._depth(int(self.left[n])), self._depth(int(self.right[n])))
+
+    # -------------------------
+    # single window
+    # -------------------------
+    def leaf(self, x) -> int:
+        feature, threshold = self._feature, self._threshold
+        left, right, is_leaf = self._left, self._right, self._leaf
+        n = 0
+        while not is_leaf[n]:
+            n = left[n] if x[feature[n]] <= threshold[n] else right[n]
+        return n
+
+    def leaf_from(self, buf, base: int) -> int:
+        """leaf() with input[k] read from buf[base + k]; only tested cells are touched."""
+        feature, threshold = self._feature, self._threshold
+        left, right, is_leaf = self._left, self._right, self._leaf
+        n = 0
+        while not is_leaf[n]:
+            n = left[n] if buf[base + feature[n]] <= threshold[n] else right[n]
+        return n
+
+    def predict_from(self, buf, base: int) -> Tuple[float, ...]:
+        return self._dist[self.leaf_from(buf, base)]
+
+    def predict_class_from(self, buf, base: int) -> int:
+        return self._cls[self.leaf_from(buf, base)]
+
+    def predict(self, x) -> Tuple[float, ...]:
+        """Class distribution for one flat window (same values as score_*)."""
+        return self._dist[self.leaf(x)]
+
+    def predict_class(self, x) -> int:
+        """Argmax of predict(x); ties go to the lowest class like list.index."""
+        return self._cls[self.leaf(x)]
+
+    # -------------------------
+    # batch
+    # -------------------------
+    def leaves_batch(self, X) -> np.ndarray:
+        """Leaf id per row of X, shape (n_windows, n_features) - may be a strided view."""
+        X = np.asarray(X)
+        rows = np.arange(X.shape[0])
+        node = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_batch(self, X) -> np.ndarray:
+        return self.value[self.leaves_batch(X)]
+
+    def predict_class_batch(self, X) -> np.ndarray:
+        return self.classes[self.leaves_batch(X)]
+
+
+# -----------------------------
+# SOURCE -> ARRAYS
+# -----------------------------
+def _split(test: ast.expr, arg: str) -> Tuple[int, float]:
+    # input[i] <= threshold, or input[b + i] (edge firmware reading its ring buffer)
+    if not (isinstance(test, ast.Compare) and len(test.ops) == 1
+            and isinstance(test.ops[0], ast.LtE)
+            and isinstance(test.left, ast.Subscript)
+            and isinstance(test.left.value, ast.Name) and test.left.value.id == arg):
+        raise TreeSyntaxError("unsupported split: %s" % ast.unparse(test))
+    index = test.left.slice
+    if isinstance(index, ast.BinOp) and isinstance(index.op, ast.Add) \
+            and isinstance(index.left, ast.Name):
+        index = index.right
+    return int(ast.literal_eval(index)), float(ast.literal_eval(test.comparators[0]))
+
+
+def _leaf(stmt: ast.stmt) -> List[float]:
+    if isinstance(stmt, (ast.Assign, ast.Return)) and stmt.value is not None:
+        return [float(v) for v in ast.literal_eval(stmt.value)]
+    raise TreeSyntaxError("unsupported leaf: %s" % ast.unparse(stmt))
+
+
+def compile_function(fn: ast.FunctionDef) -> CompiledTree:
+    arg = fn.args.args[0].arg
+    feature, threshold, left, right, value = [], [], [], [], []
+
+    def new_node() -> int:
+        feature.append(0)
+        threshold.append(0.0)
+        left.append(0)
+        right.append(0)
+        value.append(None)
+        return len(feature) - 1
+
+    def build(body: List[ast.stmt]) -> int:
+        n = new_node()
+        stmt = body[0]
+        if isinstance(stmt, ast.If):
+            feature[n], threshold[n] = _split(stmt.test, arg)
+            left[n] = build(stmt.body)
+            right[n] = build(stmt.orelse)
+        else:
+            left[n] = right[n] = n
+            value[n] = _leaf(stmt)
+        return n
+
+    build(fn.body)
+    n_classes = max(len(v) for v in value if v is not None)
+    value = [v if v is not None else [0.0] * n_classes for v in value]
+    return CompiledTree(fn.name, feature, threshold, left, right, value)
+
+
+def load_trees(path, prefix: str = "score_") -> Dict[str, CompiledTree]:
+    """Compile every top-level `def <prefix>...` in a Python source file."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    return {
+        node.name: compile_function(node)
+        for node in tree.body
+        if isinstance(node, ast.FunctionDef) and node.name.startswith(prefix)
+    }
@@ -0,0 +1,76 @@
+# -----------------------------
+# COMPACT WINDOW FEATURES
+# -----------------------------
+# Five summary values per IMU channel instead of the 300 raw window cells:
+#
+#   energy   mean of v * v over the window
+#   min/max  extremes over the window
+#   peak     sample index (0..49) of the largest |v|, first one on ties
+#   jerk     largest |v[i] - v[i-1]|
+#
+# Feature k * 6 + c is kind k of channel c (ax, ay, az, gx, gy, gz).
+# train_trees.py emits trees over these 30 values, plus a MicroPython copy
+# of window_features() for the Nicla; the two must stay in step.
+
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from ring_buffer import WINDOW_SIZE, FEATURES_PER_ROW
+from tree_engine import load_trees
+
+CHANNELS = ("ax", "ay", "az", "gx", "gy", "gz")
+KINDS = ("energy", "min", "max", "peak", "jerk")
+FEATURE_NAMES: List[str] = ["%s_%s" % (c, k) for k in KINDS for c in CHANNELS]
+NUM_FEATURES = len(FEATURE_NAMES)
+
+# laptop copy of the trees written by train_trees.py
+COMPACT_TREES = Path(__file__).resolve().parent / "compact_trees.py"
+
+
+def window_features(windows) -> np.ndarray:
+    """(n, 30) features for flat (300,) / (n, 300) or (n, 50, 6) windows."""
+    w = np.asarray(windows, dtype=np.float64).reshape(-1, WINDOW_SIZE, FEATURES_PER_ROW)
+    return np.concatenate([
+        (w * w).mean(axis=1),
+        w.min(axis=1),
+        w.max(axis=1),
+        np.abs(w).argmax(axis=1),
+        np.abs(np.diff(w, axis=1)).max(axis=1),
+    ], axis=1)
+
+
+class FeatureModel:
+    """A tree over window_features(), usable wherever a raw-window CompiledTree is."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.name = tree.name
+        self.classes = tree.classes
+
+    def __repr__(self) -> str:
+        return "<FeatureModel %r>" % self.tree
+
+    def predict(self, x):
+        return self.tree.predict(window_features(x)[0])
+
+    def predict_class(self, x) -> int:
+        return self.tree.predict_class(window_features(x)[0])
+
+    def predict_class_from(self, buf, base: int) -> int:
+        # every feature depends on the whole window, so nothing to skip here
+        return self.predict_class(buf[base:base + WINDOW_SIZE * FEATURES_PER_ROW])
+
+    def predict_batch(self, X) -> np.ndarray:
+        return self.tree.predict_batch(window_features(X))
+
+    def predict_class_batch(self, X) -> np.ndarray:
+        return self.tree.predict_class_batch(window_features(X))
+
+
+def load_feature_models(path=COMPACT_TREES) -> Dict[str, FeatureModel]:
+    """score_* trees generated by train_trees.py, or {} if not trained yet."""
+    if not Path(path).exists():
+        return {}
+    return {name: FeatureModel(tree) for name, tree in load_trees(path).items()}